@@ -221,6 +221,17 @@ class OrbitCamera(CameraObj):
         #    self.radius += velocity
         self.radius = min(max(self.radius, 0.05), FAR+100.0)
         
+    #
+    def set_pose(self, x_angle=None, y_angle=None, radius=None):
+        # place the camera without user input (e.g. for offscreen rendering)
+        if x_angle is not None:
+            self.x_angle = x_angle
+        if y_angle is not None:
+            self.y_angle = min(max(y_angle, 0.1), 179.0)
+        if radius is not None:
+            self.radius = min(max(radius, 0.05), FAR+100.0)
+        self.update_camera_vectors()
+
     #
     def update(self):
         self.on_input()
@@ -0,0 +1,24 @@
+
+import os, functools
+import numpy as np
+#
+from settings import *
+
+
+#
+@functools.lru_cache(maxsize=None)
+def get_colormap_lut(name : str='jet', n : int=256):
+    # (n, 3) float32 lookup table of a matplotlib colormap, for upload as a 1D texture.
+    # Tables are kept in COLORMAP_CACHE_DIR, so matplotlib (slow to import) is only
+    # needed the first time a colormap is used.
+    path = os.path.join(os.path.expanduser(COLORMAP_CACHE_DIR), f'{name}_{n}.npy')
+    if os.path.exists(path):
+        return np.load(path)
+    from matplotlib import colormaps
+    lut = np.array(colormaps[name].resampled(n)(np.arange(n))[:, :3], dtype='f4')
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.save(path, lut)
+    except OSError as e:
+        print(f'WARNING: could not write colormap cache {path}: {e}')
+    return lut
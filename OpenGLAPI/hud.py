@@ -0,0 +1,78 @@
+
+import glm
+import pygame as pg
+import moderngl as mgl
+#
+from settings import *
+
+
+#
+class TextOverlay:
+    # Rows of text drawn over the scene (top left corner), rasterized with pygame.font
+    # into a texture that is only rewritten when the text changes.
+    texture_unit = 4        # clear of the colormap (0) and data textures (1-3)
+    padding = 6             # pixels around the text
+
+    def __init__(self, app, font_size=HUD_FONT_SIZE):
+        self.app = app
+        self.ctx : mgl.Context = app.ctx
+        if not pg.font.get_init():
+            pg.font.init()
+        self.font = pg.font.Font(None, font_size)     # bundled with pygame
+        self.shader = self.app.shader_manager.programs['hud']
+        self.vao = self.ctx.vertex_array(self.shader, [], skip_errors=True)
+        self.texture = None
+        self.rows = []
+        self.visible = True
+        self.position = (0, 0)      # top left corner, pixels from the top left
+
+    #
+    def set_text(self, rows):
+        # rows of cells, laid out in columns (the first left aligned, the others right 
+        # aligned); a row may be a single string. Returns True if the text changed.
+        rows = [(row,) if isinstance(row, str) else tuple(row) for row in rows]
+        if rows == self.rows:
+            return False
+        self.rows = rows
+        line_height, pad = self.font.get_linesize(), self.padding
+        n_cols = max(len(row) for row in rows)
+        widths = [0] * n_cols
+        for row in rows:
+            if len(row) > 1:
+                for i, cell in enumerate(row):
+                    widths[i] = max(widths[i], self.font.size(cell)[0] + (2 * pad if i else 0))
+        w = max([sum(widths)] + [self.font.size(row[0])[0] for row in rows]) + 2 * pad
+        h = line_height * len(rows) + 2 * pad
+        surface = pg.Surface((w, h), pg.SRCALPHA)
+        surface.fill(HUD_BG_COLOR)
+        for i, row in enumerate(rows):
+            x, y = pad, pad + i * line_height
+            for j, cell in enumerate(row):
+                text = self.font.render(cell, True, HUD_COLOR)
+                if j == 0:
+                    surface.blit(text, (x, y))
+                else:
+                    surface.blit(text, (x + widths[j] - text.get_width(), y))
+                x += widths[j]
+        data = pg.image.tobytes(surface, 'RGBA', True)
+        if self.texture is None or self.texture.size != (w, h):
+            if self.texture is not None:
+                self.texture.release()
+            self.texture = self.ctx.texture((w, h), 4, data)
+            self.texture.filter = (mgl.NEAREST, mgl.NEAREST)
+        else:
+            self.texture.write(data)
+        return True
+
+    #
+    def render(self):
+        if not self.visible or self.texture is None:
+            return
+        (w, h), (W, H), (x, y) = self.texture.size, self.app.window_size, self.position
+        rect = glm.vec4(2.0 * x / W - 1.0, 1.0 - 2.0 * y / H, 2.0 * w / W, 2.0 * h / H)
+        self.texture.use(location=self.texture_unit)
+        self.app.shader_manager.set_uniform(self.shader, 'u_texture', self.texture_unit)
+        self.app.shader_manager.set_uniform(self.shader, 'u_rect', rect)
+        self.ctx.disable(mgl.DEPTH_TEST | mgl.CULL_FACE)
+        self.vao.render(mgl.TRIANGLE_STRIP, vertices=4)
+        self.ctx.enable(mgl.DEPTH_TEST | mgl.CULL_FACE)
@@ -1,9 +1,10 @@
 
+import importlib.util
 import numpy as np
 import glm
-from numba import njit
 from settings import *
-from matplotlib import colors, cm
+from resample import resample_linear, ResamplingPyramid
+from expression import Expression
 
 #
 class BaseMesh:
@@ -47,12 +48,27 @@ class DebugCubeMesh(BaseMesh):
 
 #
 class Func3DMesh(BaseMesh):
+    # vertex layout of compact meshes, '2u2 f u4' (see pack_compact())
+    compact_dtype = np.dtype([('xz', '<u2', 2), ('height', '<f4'), ('normal', '<u4')])
+
     def __init__(self, 
                  x : np.ndarray, 
                  y : np.ndarray,        # the data
                  z : np.ndarray,
-                 equal_axes : bool):    # how to treat y (m x n) where m != n
+                 equal_axes : bool,     # how to treat y (m x n) where m != n
+                 backend : str=MESH_BACKEND,
+                 indexed : bool=False,
+                 max_resolution : int=MESH_MAX_RESOLUTION,  # decimate larger data
+                 decimation : str='max',                    # 'max', 'min' or 'mean'
+                 cache=None,                                # MeshCache, or None
+                 progress=None,                             # callback(fraction, stage)
+                 compact : bool=False):                     # 12 byte vertices
         super().__init__()
+        self.backend = backend
+        self.indexed = indexed
+        self.compact = compact
+        self.index_data : np.array = None
+        self.progress = progress
         
         # if x or z is None
         if x.ndim == 0:
@@ -62,6 +78,23 @@ class Func3DMesh(BaseMesh):
             z = np.linspace(-1, 1, y.shape[0])  
             print('updating z to', z.shape)
 
+        # everything below is skipped if an identical mesh is cached
+        self.report_progress(0.0, 'cache lookup')
+        if cache is not None:
+            key = cache.get_key(x, y, z, equal_axes, indexed, max_resolution, decimation,
+                                MESH_SCALE, compact)
+            if cache.load(key, self):
+                print(f'vertices: {self.vertex_data.shape[0]} (cached)')
+                return
+
+        # reduce to display resolution through a min/max/mean pyramid
+        if max_resolution is not None and max(y.shape) > max_resolution:
+            self.report_progress(0.1, 'decimating')
+            print(f'INFO: decimating {y.shape} ({decimation})... ', end='')
+            pyramid = ResamplingPyramid(y, x, z)
+            y, x, z = pyramid.decimate((max_resolution, max_resolution), decimation)
+            print(f'done. {y.shape}')
+
         #
         self.x, self.y, self.z = x.copy(), y.copy(), z.copy()
         # store limits for later access
@@ -70,29 +103,18 @@ class Func3DMesh(BaseMesh):
         self.zlim = (self.z[0], self.z[-1])
         
         (sx, sy, sz) = MESH_SCALE
+        self.report_progress(0.2, 'scaling')
         
         # interpolate the axis of the lowest resolution to match the highest
         if x.shape != z.shape and equal_axes == True:
             print('INFO: interpolating function to new axes... ', end='')
-            # y is of shape (z, x), so will have to be interpolated to fit the new shape
+            # y is of shape (z, x), resampled to (max_dim, max_dim)
             max_dim = max(z.shape[0], x.shape[0])
-            y_interp = np.zeros(shape=(max_dim, max_dim))
-            #
             if x.shape[0] < z.shape[0]:
                 self.x = np.linspace(self.xlim[0], self.xlim[1], max_dim)
-                # y is interpolated over new shape of axis=1 (column-wise)
-                for i in np.arange(self.x.shape[0]):
-                    y_col_i = np.interp(x=self.x, xp=x, fp=self.y[:,i])
-                    y_interp[i,:] = y_col_i
-            #    
             else: # z.shape[0] < x.shape[0]
                 self.z = np.linspace(self.zlim[0], self.zlim[1], max_dim)
-                # y is interpolated over new shape of axis=0 (row-wise)
-                for i in np.arange(self.z.shape[0]):
-                    y_row_i = np.interp(x=self.z, xp=z, fp=self.y[i,:])
-                    y_interp[:,i] = y_row_i
-            #                    
-            self.y = y_interp
+            self.y = resample_linear(self.y, x, z, self.x, self.z)
             print('done.')
         #
         elif x.shape != z.shape and equal_axes == False:
@@ -103,19 +125,71 @@ class Func3DMesh(BaseMesh):
                 sz *= (z.shape[0] / x.shape[0])
             print('done. sx =', sx, ', sy =', sy, ', sz =', sz)
             
-        # rescale everything
+        # rescale everything (y scaling is kept for data appended later, flat data is 
+        # left unscaled)
+        y_abs = np.max(np.abs(self.y))
+        self.sy, self.y_norm = sy, y_abs if y_abs > EPSILON else 1.0
         self.x = sx * (self.x / np.max(np.abs(self.x)))
-        self.y = sy * (self.y / np.max(np.abs(self.y)))
+        self.y = self.scale_y(self.y)
         self.z = sz * (self.z / np.max(np.abs(self.z)))
         
         # find ylim
-        y1d = self.y.flatten()
-        self.ylim = (np.min(y1d), np.max(y1d))
+        self.ylim = (np.min(self.y), np.max(self.y))
             
         self.nx, self.nz = self.x.shape[0], self.z.shape[0]
         assert((self.nx * self.nz) == self.y.size)
-        self.vertex_data = self.get_vertex_data()
-        print(f'vertices: {self.vertex_data.shape[0]}, triangles: {self.vertex_data.shape[0]//3}')
+        self.report_progress(0.3, 'building')
+        self.build()
+        if cache is not None:
+            self.report_progress(0.9, 'caching')
+            cache.store(key, self)
+        self.report_progress(1.0, 'done')
+
+    #
+    def report_progress(self, fraction, stage):
+        # the callback may raise to abort the build (see mesh_builder.BuildCancelled)
+        if self.progress is not None:
+            self.progress(fraction, stage)
+
+    #
+    def scale_y(self, values):
+        return self.sy * (values / self.y_norm)
+
+    #
+    def unscale_y(self, values):
+        # model space heights to data units
+        return values * (self.y_norm / self.sy)
+
+    #
+    def get_backend(self):
+        # 'auto' picks the compiled kernels for grids large enough to repay importing 
+        # numba, if it is installed
+        if self.backend != 'auto':
+            return self.backend
+        if self.nx * self.nz < MESH_NUMBA_MIN_POINTS or importlib.util.find_spec('numba') is None:
+            return 'numpy'
+        return 'numba'
+
+    #
+    def build(self):
+        backend = self.get_backend()
+        if backend == 'numba' and importlib.util.find_spec('numba') is None:
+            print('WARNING: numba is not installed, using the numpy mesh backend.')
+            backend = 'numpy'
+        if self.indexed:
+            if backend == 'numba':
+                self.vertex_data, self.index_data = self.get_indexed_vertex_data_numba()
+            else:
+                self.vertex_data, self.index_data = self.get_indexed_vertex_data()
+            print(f'vertices: {self.vertex_data.shape[0]}, triangles: {self.index_data.shape[0]}')
+        else:
+            if backend == 'legacy' and not self.compact:
+                self.vertex_data = self.get_vertex_data_legacy()
+            elif backend == 'numba':
+                self.vertex_data = self.get_vertex_data_numba()
+            else:
+                self.vertex_data = self.get_vertex_data()
+            print(f'vertices: {self.vertex_data.shape[0]}, triangles: {self.vertex_data.shape[0]//3}')
         
     #
     @staticmethod
@@ -124,8 +198,261 @@ class Func3DMesh(BaseMesh):
         return np.array(data, dtype='f4')
 
     #
-    #@njit
+    @staticmethod
+    def cross(a, b):
+        # component-wise glm.cross() on (..., 3) arrays
+        c = np.empty_like(a)
+        c[..., 0] = a[..., 1] * b[..., 2] - b[..., 1] * a[..., 2]
+        c[..., 1] = a[..., 2] * b[..., 0] - b[..., 2] * a[..., 0]
+        c[..., 2] = a[..., 0] * b[..., 1] - b[..., 0] * a[..., 1]
+        return c
+
+    #
+    @staticmethod
+    def get_grid_indices(nx, nz):
+        # two triangles per quad, same winding as get_vertex_data_legacy()
+        k = (np.arange(nz-1)[:, None] * nx + np.arange(nx-1)[None, :]).ravel()
+        indices = np.empty((k.shape[0], 2, 3), dtype=np.int64)
+        indices[:, 0, 0] = k
+        indices[:, 0, 1] = k + nx
+        indices[:, 0, 2] = k + 1
+        indices[:, 1, 0] = k + 1
+        indices[:, 1, 1] = k + nx
+        indices[:, 1, 2] = k + nx + 1
+        return indices.reshape(-1, 3)
+
+    #
+    @staticmethod
+    def get_grid_normals(x, y, z):
+        # central differences on the (nz, nx) grid, returned as (nz, nx, 3) float32. 
+        # Mirrors the per-vertex glm arithmetic of get_vertex_data_legacy().
+        nz, nx = y.shape
+        f4 = np.float32
+        # L -> P (j >= 1) and P -> R (j <= nx-2)
+        LP = np.zeros((nz, nx, 3), dtype=f4)
+        PR = np.zeros((nz, nx, 3), dtype=f4)
+        dx = (x[1:] - x[:-1]).astype(f4)
+        dyx = (y[:, 1:] - y[:, :-1]).astype(f4)
+        LP[:, 1:, 0] = dx
+        LP[:, 1:, 1] = dyx
+        PR[:, :-1, 0] = dx
+        PR[:, :-1, 1] = dyx
+        # U -> P (i >= 1) and P -> D (i <= nz-2)
+        UP = np.zeros((nz, nx, 3), dtype=f4)
+        PD = np.zeros((nz, nx, 3), dtype=f4)
+        dz = (z[1:] - z[:-1]).astype(f4)
+        dyz = (y[1:, :] - y[:-1, :]).astype(f4)
+        UP[1:, :, 1] = dyz
+        UP[1:, :, 2] = dz[:, None]
+        PD[:-1, :, 1] = dyz
+        PD[:-1, :, 2] = dz[:, None]
+
+        cross = Func3DMesh.cross
+        UP_LP, UP_PR = cross(UP, LP), cross(UP, PR)
+        PD_LP, PD_PR = cross(PD, LP), cross(PD, PR)
+
+        # sum available cross products, in the same order as the legacy path
+        sum = np.empty((nz, nx, 3), dtype=f4)
+        sum[1:-1, 1:-1] = UP_LP[1:-1, 1:-1] + UP_PR[1:-1, 1:-1] + \
+                          PD_LP[1:-1, 1:-1] + PD_PR[1:-1, 1:-1]
+        # z borders, excluding corners
+        sum[1:-1, 0] = UP_PR[1:-1, 0] + PD_PR[1:-1, 0]
+        sum[1:-1,-1] = UP_LP[1:-1,-1] + PD_LP[1:-1,-1]
+        # x borders, excluding corners
+        sum[0, 1:-1] = PD_LP[0, 1:-1] + PD_PR[0, 1:-1]
+        sum[-1,1:-1] = UP_LP[-1,1:-1] + UP_PR[-1,1:-1]
+        # corners
+        sum[ 0, 0] = PD_PR[ 0, 0]
+        sum[ 0,-1] = PD_LP[ 0,-1]
+        sum[-1, 0] = UP_PR[-1, 0]
+        sum[-1,-1] = UP_LP[-1,-1]
+
+        # glm.normalize(v) == v * inversesqrt(dot(v, v))
+        dot = sum[..., 0] * sum[..., 0] + sum[..., 1] * sum[..., 1] + sum[..., 2] * sum[..., 2]
+        sum *= (f4(1.0) / np.sqrt(dot))[..., None]
+        return sum
+
+    #
+    def get_grid_data(self):
+        # per grid point attributes, (nx * nz, 3) float32 each
+        nx, nz = self.nx, self.nz
+        y2d = self.y.reshape(nz, nx)
+
+        vertices = np.empty((nz, nx, 3), dtype='f4')
+        vertices[..., 0] = self.x[None, :]
+        vertices[..., 1] = y2d
+        vertices[..., 2] = self.z[:, None]
+        vertices = vertices.reshape(-1, 3)
+        self.report_progress(0.4, 'normals')
+        normals = self.get_grid_normals(self.x, y2d, self.z).reshape(-1, 3)
+        return vertices, normals
+
+    #
     def get_vertex_data(self):
+        # whole-array version of get_vertex_data_legacy(); all attributes are computed 
+        # once per grid point and gathered through the triangle indices. Colors are 
+        # looked up from the height on the GPU (see func3D.frag).
+        vertices, normals = self.get_grid_data()
+        indices = self.get_grid_indices(self.nx, self.nz).ravel()
+        self.report_progress(0.7, 'packing')
+        if self.compact:
+            return self.pack_compact(vertices, normals)[indices]
+        
+        # pack data for GPU upload
+        vertex_data = np.empty((indices.shape[0], 9), dtype='f4')
+        vertex_data[:, 0:3] = vertices[indices]
+        vertex_data[:, 3:6] = normals[indices]
+        # barycentric coordinates, alternating per triangle (see func3D.vert)
+        barycentric = np.array([(1, 0, 0), (1, 1, 0), (0, 0, 1),
+                                (1, 0, 0), (0, 1, 1), (0, 0, 1)], dtype='f4')
+        vertex_data[:, 6:9].reshape(-1, 6, 3)[:] = barycentric
+
+        return vertex_data
+
+    #
+    def get_indexed_vertex_data(self):
+        # one vertex per grid point (position, normal) plus a triangle index buffer;
+        # the quad wireframe is derived from gl_VertexID in the shader.
+        vertices, normals = self.get_grid_data()
+        if self.compact:
+            vertex_data = self.pack_compact(vertices, normals)
+        else:
+            vertex_data = np.hstack([vertices, normals])
+        index_data = self.get_grid_indices(self.nx, self.nz).astype('u4')
+        return vertex_data, index_data
+
+    #
+    def get_vertex_data_numba(self):
+        # same layout as get_vertex_data(), from parallel kernels over the grid rows
+        from OpenGLAPI import mesh_kernels
+        self.report_progress(0.4, 'building (numba)')
+        y2d = self.y.reshape(self.nz, self.nx)
+        if self.compact:
+            grid = mesh_kernels.get_indexed_vertex_data(self.x, y2d, self.z)
+            indices = self.get_grid_indices(self.nx, self.nz).ravel()
+            return self.pack_compact(grid[:, 0:3], grid[:, 3:6])[indices]
+        return mesh_kernels.get_vertex_data(self.x, y2d, self.z)
+
+    #
+    def get_indexed_vertex_data_numba(self):
+        from OpenGLAPI import mesh_kernels
+        self.report_progress(0.4, 'building (numba)')
+        y2d = self.y.reshape(self.nz, self.nx)
+        vertex_data = mesh_kernels.get_indexed_vertex_data(self.x, y2d, self.z)
+        if self.compact:
+            vertex_data = self.pack_compact(vertex_data[:, 0:3], vertex_data[:, 3:6])
+        return vertex_data, self.get_grid_indices(self.nx, self.nz).astype('u4')
+
+    #
+    def get_xz_range(self):
+        # ((x min, x max), (z min, z max)) as float32, the range of the compact x/z
+        x, z = self.x.astype('f4'), self.z.astype('f4')
+        return (x.min(), x.max()), (z.min(), z.max())
+
+    #
+    @staticmethod
+    def encode_octahedral(normals):
+        # Unit vectors (N, 3) mapped onto an octahedron around the y axis and unfolded
+        # into a square, returned as two 16-bit coordinates per uint32 (x low, z high). 
+        # Decoded in func3D_compact.vert.
+        p = normals[:, (0, 2)] / np.sum(np.abs(normals), axis=1, keepdims=True)
+        below = normals[:, 1] < 0
+        p[below] = (1.0 - np.abs(p[below][:, ::-1])) * np.where(p[below] >= 0, 1.0, -1.0)
+        q = np.round((p * 0.5 + 0.5) * 65535).astype('u4')
+        return q[:, 0] | (q[:, 1] << 16)
+
+    #
+    def pack_compact(self, vertices, normals):
+        # (N,) compact vertices from (N, 3) positions and normals: x/z quantized to 16 bits
+        # over their range, the height as float32 and an octahedral normal
+        (x0, x1), (z0, z1) = self.get_xz_range()
+        vertex_data = np.empty(vertices.shape[0], dtype=self.compact_dtype)
+        xz = vertex_data['xz']
+        xz[:, 0] = np.round((vertices[:, 0] - x0) / (x1 - x0) * 65535)
+        xz[:, 1] = np.round((vertices[:, 2] - z0) / (z1 - z0) * 65535)
+        vertex_data['height'] = vertices[:, 1]
+        vertex_data['normal'] = self.encode_octahedral(normals)
+        return vertex_data
+
+    #
+    def get_region_data(self, r0, r1, c0, c1):
+        # positions and normals of grid rows r0:r1, columns c0:c1, as (rows, cols, 3)
+        # float32. The normals are found on a window grown by the neighbours their
+        # central differences depend on, so they match get_grid_data() exactly.
+        y2d = self.y.reshape(self.nz, self.nx)
+        vertices = np.empty((r1 - r0, c1 - c0, 3), dtype='f4')
+        vertices[..., 0] = self.x[None, c0:c1]
+        vertices[..., 1] = y2d[r0:r1, c0:c1]
+        vertices[..., 2] = self.z[r0:r1, None]
+        a, b = max(r0 - 1, 0), min(r1 + 1, self.nz)
+        c, d = max(c0 - 1, 0), min(c1 + 1, self.nx)
+        normals = self.get_grid_normals(self.x[c:d], y2d[a:b, c:d], self.z[a:b])
+        return vertices, normals[r0-a:r1-a, c0-c:c1-c]
+
+    #
+    def update_region(self, i0, j0, patch):
+        # Replaces the heights of grid rows i0:i0+m, columns j0:j0+n by patch (m x n, in
+        # data units, scaled like the original data) and updates vertex_data in place.
+        # Positions change inside the patch, normals also on the one-cell halo around it.
+        # Returns the touched ranges of vertex_data as (byte offset, array).
+        patch = np.atleast_2d(np.asarray(patch))
+        (m, n), nx, nz = patch.shape, self.nx, self.nz
+        if i0 < 0 or j0 < 0 or i0 + m > nz or j0 + n > nx:
+            raise ValueError(f'patch {patch.shape} at ({i0}, {j0}) exceeds the grid ({nz}, {nx})')
+        # cached meshes are read-only memory maps, copied on the first update
+        if not self.y.flags.writeable:
+            self.y = np.array(self.y)
+        if not self.vertex_data.flags.writeable:
+            self.vertex_data = np.array(self.vertex_data)
+        self.y = self.y.reshape(nz, nx)
+        patch = self.scale_y(patch)
+        self.y[i0:i0+m, j0:j0+n] = patch
+        self.ylim = (min(self.ylim[0], np.min(patch)), max(self.ylim[1], np.max(patch)))
+
+        # grid points whose position or normal changed
+        r0, r1 = max(i0 - 1, 0), min(i0 + m + 1, nz)
+        c0, c1 = max(j0 - 1, 0), min(j0 + n + 1, nx)
+        if self.indexed:
+            # one vertex per grid point, in grid order (k elements per vertex)
+            k = 1 if self.compact else 6
+            vertices, normals = self.get_region_data(r0, r1, c0, c1)
+            rows = self.vertex_data.reshape(nz, nx * k)
+            if self.compact:
+                block = rows[r0:r1, c0:c1]
+                block[...] = self.pack_compact(vertices.reshape(-1, 3), 
+                                               normals.reshape(-1, 3)).reshape(block.shape)
+            else:
+                block = rows.reshape(nz, nx, 6)[r0:r1, c0:c1]
+                block[..., 0:3], block[..., 3:6] = vertices, normals
+            a, b = c0 * k, c1 * k
+        else:
+            # six vertices per quad, every quad with a changed corner is packed again
+            q0, q1 = max(r0 - 1, 0), min(r1, nz - 1)
+            p0, p1 = max(c0 - 1, 0), min(c1, nx - 1)
+            vertices, normals = self.get_region_data(q0, q1 + 1, p0, p1 + 1)
+            indices = self.get_grid_indices(p1 - p0 + 1, q1 - q0 + 1).ravel()
+            vertices, normals = vertices.reshape(-1, 3)[indices], normals.reshape(-1, 3)[indices]
+            k = 1 if self.compact else 9
+            if self.compact:
+                rows = self.vertex_data.reshape(nz - 1, (nx - 1) * 6)
+                block = rows[q0:q1, p0*6:p1*6]
+                block[...] = self.pack_compact(vertices, normals).reshape(block.shape)
+            else:
+                rows = self.vertex_data.reshape(nz - 1, (nx - 1) * 6 * 9)
+                block = rows.reshape(nz - 1, (nx - 1) * 6, 9)[q0:q1, p0*6:p1*6]
+                block[..., 0:3] = vertices.reshape(q1 - q0, -1, 3)
+                block[..., 3:6] = normals.reshape(q1 - q0, -1, 3)
+            r0, r1, a, b = q0, q1, p0 * 6 * k, p1 * 6 * k
+
+        # one range per row, or a single one if whole rows changed
+        row_size, itemsize = rows.shape[1], rows.itemsize
+        if a == 0 and b == row_size:
+            return [(r0 * row_size * itemsize, rows[r0:r1])]
+        return [((r * row_size + a) * itemsize, rows[r, a:b]) for r in range(r0, r1)]
+
+    #
+    def get_vertex_data_legacy(self):
+        # reference implementation (python loops), kept for comparison
         x, z = self.x, self.z
         nx, nz = self.nx, self.nz
         vertices, indices, normals = [], [], []
@@ -247,17 +574,319 @@ class Func3DMesh(BaseMesh):
         vertex_data = np.hstack([vertex_data, normal_data])
         vertex_data = np.hstack([vertex_data, barycentric])
         
-        # add linear color map -- map to cm.jet on y value
-        #crange = np.linspace(self.ylim[0], self.ylim[1], 255)
-        norm_colors = colors.Normalize(vmin=self.ylim[0], vmax=self.ylim[1], clip=True)
-        color_mapper = cm.ScalarMappable(norm=norm_colors, cmap=cm.jet)
-        # get vec3 per vertex y value (currently in vertex_data[:, 1])
-        color_data = np.array(color_mapper.to_rgba(vertex_data[:, 1])[:, :3], dtype='f4')
-        # add color to vertex_data
-        vertex_data = np.hstack([vertex_data, color_data])
-        
         return vertex_data
 
+#
+class HeightFormat:
+    # Storage of the scaled heights of texture meshes: 'f4' (R32F), 'f2' (R16F) or 'u2',
+    # 16-bit unsigned over [ymin, ymax] (R16, normalized). The shaders read heights as 
+    # u_height_range.x + u_height_range.y * texel. Tracks the largest error of the 
+    # encoded heights and the values clipped to the range ('u2').
+    dtypes = {'f4' : ('f4', 'f4'), 'f2' : ('f2', 'f2'), 'u2' : ('u2', 'nu2')}  # (numpy, texture)
+
+    def __init__(self, name, ymin, ymax):
+        if name not in self.dtypes:
+            raise ValueError(f"unknown height format '{name}', expected one of "
+                             f"{list(self.dtypes)}")
+        self.name = name
+        self.dtype, self.texture_dtype = self.dtypes[name]
+        self.ymin, self.ymax = float(ymin), float(ymax)
+        self.span = max(self.ymax - self.ymin, EPSILON)
+        # (offset, scale) from texels to heights
+        self.range = (self.ymin, self.span) if name == 'u2' else (0.0, 1.0)
+        self.max_error = 0.0
+        self.clipped = 0
+
+    #
+    @staticmethod
+    def choose(name, ymin, ymax, max_error=HEIGHT_MAX_ERROR):
+        # the format name, or float32 if its error bound exceeds max_error (a fraction
+        # of the height range)
+        height_format = HeightFormat(name, ymin, ymax)
+        bound = height_format.get_error_bound()
+        if max_error is not None and bound > max_error * height_format.span:
+            print(f"WARNING: '{name}' heights may be off by {bound:.3g}, over the bound of "
+                  f"{max_error * height_format.span:.3g}, stored as 'f4'.")
+            height_format = HeightFormat('f4', ymin, ymax)
+        return height_format
+
+    #
+    def get_error_bound(self):
+        # worst case rounding error over [ymin, ymax] (float32 is the reference)
+        y_abs = max(abs(self.ymin), abs(self.ymax), 2.0**-14)
+        if self.name == 'u2':
+            # half a step, plus the float32 arithmetic of encoding and decoding
+            return 0.5 * self.span / 65535 + float(np.finfo('f4').eps) * y_abs
+        if self.name == 'f2':
+            # half a unit in the last place (10 bit mantissa) at the largest magnitude
+            return 2.0**(np.floor(np.log2(y_abs)) - 11)
+        return 0.0
+
+    #
+    def encode(self, values):
+        # float heights to the storage dtype (contiguous)
+        if self.name == 'f4':
+            return np.ascontiguousarray(values, dtype='f4')
+        values = np.asarray(values, dtype='f4')
+        if self.name == 'f2':
+            data = values.astype('f2')
+        else:
+            # in place, a single float32 temporary
+            q = values - np.float32(self.ymin)
+            q *= np.float32(65535 / self.span)
+            np.rint(q, out=q)
+            clipped = int(np.count_nonzero(q < 0) + np.count_nonzero(q > 65535))
+            if clipped > 0 and self.clipped == 0:
+                print(f'WARNING: heights outside [{self.ymin:.3g}, {self.ymax:.3g}] are '
+                      f"clipped ('u2' format).")
+            self.clipped += clipped
+            data = np.clip(q, 0, 65535, out=q).astype('u2')
+            del q
+        if values.size > 0:
+            error = self.decode(data)
+            error -= values
+            self.max_error = max(self.max_error, float(np.max(np.abs(error, out=error))))
+        return data
+
+    #
+    def decode(self, data):
+        # stored heights to float32, as in the shaders
+        if self.name == 'u2':
+            return np.float32(self.ymin) + data.astype('f4') * np.float32(self.span / 65535)
+        return data.astype('f4')
+
+    #
+    def report(self, n_samples):
+        # memory saved against float32 and float64 heights, and the precision lost
+        MB = 2**20
+        n_bytes = n_samples * np.dtype(self.dtype).itemsize
+        clipped = f', {self.clipped} clipped' if self.clipped > 0 else ''
+        print(f"INFO: heights stored as '{self.name}': {n_bytes / MB:.1f} MB, saved "
+              f'{(n_samples * 4 - n_bytes) / MB:.1f} MB vs float32 and '
+              f'{(n_samples * 8 - n_bytes) / MB:.1f} MB vs float64; max error '
+              f'{self.max_error:.3g} ({100 * self.max_error / self.span:.4f}% of the range, '
+              f'bound {self.get_error_bound():.3g}){clipped}.')
+
+#
+class Func3DTextureMesh(Func3DMesh):
+    # Same scaling as Func3DMesh, but no per-vertex attributes are built: the heights
+    # are kept in the height format (see HeightFormat) and the axis coordinates as 
+    # float32 arrays, for upload as textures.
+    def __init__(self, x, y, z, equal_axes, max_resolution=MESH_MAX_RESOLUTION, 
+                 progress=None, height_format=HEIGHT_FORMAT):
+        self.height_data : np.array = None
+        self.height_format = height_format
+        # scaled in float32, no float64 copies of the data
+        super().__init__(x, np.asarray(y, dtype='f4'), z, equal_axes, 
+                         max_resolution=max_resolution, progress=progress)
+
+    #
+    def build(self):
+        self.heights = HeightFormat.choose(self.height_format, *self.ylim)
+        self.height_data = self.heights.encode(self.y.reshape(self.nz, self.nx))
+        self.y = None           # only the encoded heights are kept
+        self.band_rows = self.nz
+        self.x_data = np.ascontiguousarray(self.x, dtype='f4')
+        self.z_data = np.ascontiguousarray(self.z, dtype='f4')
+        print(f'samples: {self.nx * self.nz}, triangles: {2 * (self.nx-1) * (self.nz-1)}')
+
+    #
+    def iter_bands(self, rows=None, halo=0):
+        # yields (first row, encoded heights) for bands of rows, each extended by up to 
+        # halo rows of the following band
+        rows = self.band_rows if rows is None else rows
+        for i0 in range(0, self.nz, rows):
+            yield i0, self.height_data[i0:i0+rows+halo]
+
+#
+class Func3DStreamMesh(Func3DTextureMesh):
+    # Out-of-core variant of Func3DTextureMesh, for memory-mapped .npy or raw arrays: 
+    # limits and scaling are found in a streaming pass and the scaled heights are only 
+    # produced in bands of rows, bounded by memory_budget (bytes).
+    def __init__(self, 
+                 x : np.ndarray, 
+                 y : np.ndarray,        # the data, typically a np.memmap
+                 z : np.ndarray,
+                 equal_axes : bool,
+                 memory_budget : int=STREAM_MEMORY_BUDGET,
+                 progress=None,
+                 height_format : str=HEIGHT_FORMAT):
+        BaseMesh.__init__(self)
+        self.indexed = False
+        self.progress = progress
+        self.height_data = None
+        self.y_src = y
+        self.nz, self.nx = y.shape
+        if x.ndim == 0:
+            x = np.linspace(-1, 1, self.nx)
+        if z.ndim == 0:
+            z = np.linspace(-1, 1, self.nz)
+        if x.shape != z.shape and equal_axes == True:
+            raise ValueError('streamed data cannot be interpolated to equal axes, '
+                             'use equal_axes=False')
+        # bytes per row: source rows, float64 intermediates and float32 output (plus the
+        # float32 temporaries of encoding to 16 bits)
+        row_bytes = self.nx * (y.dtype.itemsize + 8 + 4 + (0 if height_format == 'f4' else 8))
+        self.band_rows = int(max(1, min(self.nz, memory_budget // row_bytes)))
+
+        # streaming pass for the limits (kept in the source dtype, as in Func3DMesh)
+        ymins, ymaxs, yabss = [], [], []
+        for i0 in range(0, self.nz, self.band_rows):
+            self.report_progress(i0 / self.nz, 'scanning')
+            band = np.array(self.y_src[i0:i0+self.band_rows])
+            ymins.append(np.min(band))
+            ymaxs.append(np.max(band))
+            yabss.append(np.max(np.abs(band)))
+        ymin, ymax, yabs = min(ymins), max(ymaxs), max(yabss)
+
+        self.xlim = (x[0], x[-1])
+        self.ylim = (ymin, ymax)
+        self.zlim = (z[0], z[-1])
+        (sx, sy, sz) = MESH_SCALE
+        if x.shape[0] > z.shape[0]:
+            sx *= (x.shape[0] / z.shape[0])
+        elif z.shape[0] > x.shape[0]:
+            sz *= (z.shape[0] / x.shape[0])
+
+        # rescale everything
+        self.sy, self.y_norm = sy, yabs if yabs > EPSILON else 1.0
+        self.x = sx * (x / np.max(np.abs(x)))
+        self.z = sz * (z / np.max(np.abs(z)))
+        self.ylim = (self.scale_y(ymin), self.scale_y(ymax))
+        self.heights = HeightFormat.choose(height_format, *self.ylim)
+        self.x_data = np.ascontiguousarray(self.x, dtype='f4')
+        self.z_data = np.ascontiguousarray(self.z, dtype='f4')
+        print(f'samples: {self.nx * self.nz}, triangles: {2 * (self.nx-1) * (self.nz-1)}, '
+              f'streamed in bands of {self.band_rows} rows')
+
+    #
+    def iter_bands(self, rows=None, halo=0):
+        rows = self.band_rows if rows is None else rows
+        for i0 in range(0, self.nz, rows):
+            band = np.array(self.y_src[i0:i0+rows+halo])
+            yield i0, self.heights.encode(self.scale_y(band))
+
+#
+class Func3DMultiplesMesh(Func3DTextureMesh):
+    # A stack of same-shaped grids (surfaces, nz, nx) sharing x/z axes, for small 
+    # multiples. All surfaces share one y scaling, so heights remain comparable.
+    def __init__(self, 
+                 x : np.ndarray, 
+                 y : np.ndarray,        # the data, (surfaces, nz, nx)
+                 z : np.ndarray,
+                 equal_axes : bool,
+                 height_format : str=HEIGHT_FORMAT):
+        BaseMesh.__init__(self)
+        self.indexed = False
+        y = np.asarray(y)
+        if y.ndim != 3:
+            raise ValueError(f'expected a (surfaces, nz, nx) array, got shape {y.shape}')
+        self.n_surfaces, self.nz, self.nx = y.shape
+        if x.ndim == 0:
+            x = np.linspace(-1, 1, self.nx)
+        if z.ndim == 0:
+            z = np.linspace(-1, 1, self.nz)
+        if x.shape != z.shape and equal_axes == True:
+            raise ValueError('small multiples cannot be interpolated to equal axes, '
+                             'use equal_axes=False')
+
+        self.xlim = (x[0], x[-1])
+        self.zlim = (z[0], z[-1])
+        (sx, sy, sz) = MESH_SCALE
+        if x.shape[0] > z.shape[0]:
+            sx *= (x.shape[0] / z.shape[0])
+        elif z.shape[0] > x.shape[0]:
+            sz *= (z.shape[0] / x.shape[0])
+
+        # rescale everything
+        y_abs = np.max(np.abs(y))
+        self.sy, self.y_norm = sy, y_abs if y_abs > EPSILON else 1.0
+        self.x = sx * (x / np.max(np.abs(x)))
+        self.z = sz * (z / np.max(np.abs(z)))
+        height_data = np.ascontiguousarray(self.scale_y(y), dtype='f4')
+        self.ylim = (np.min(height_data), np.max(height_data))
+        self.heights = HeightFormat.choose(height_format, *self.ylim)
+        self.height_data = self.heights.encode(height_data)
+        self.x_data = np.ascontiguousarray(self.x, dtype='f4')
+        self.z_data = np.ascontiguousarray(self.z, dtype='f4')
+        print(f'surfaces: {self.n_surfaces}, samples: {self.n_surfaces * self.nx * self.nz}, '
+              f'triangles: {2 * self.n_surfaces * (self.nx-1) * (self.nz-1)}')
+
+#
+class Func3DExpressionMesh(Func3DMesh):
+    # A function of x, z and the time t (see expression.Expression) over a domain. The
+    # heights are computed in the vertex shader, so only the axes and the y scaling are
+    # set up here, from the heights on the grid (over EXPRESSION_RANGE_TIME seconds if
+    # the expression is animated).
+    def __init__(self,
+                 expression,            # source string or Expression
+                 domain : tuple,        # ((x0, x1), (z0, z1))
+                 resolution=EXPRESSION_RESOLUTION,  # grid points along the longest axis,
+                                                    # or (nx, nz)
+                 equal_axes : bool=True):           # same size on screen for x and z
+        BaseMesh.__init__(self)
+        self.indexed = False
+        if not isinstance(expression, Expression):
+            expression = Expression(expression)
+        self.expression = expression
+        (x0, x1), (z0, z1) = domain
+        if x0 == x1 or z0 == z1:
+            raise ValueError(f'empty domain {domain}')
+        if np.ndim(resolution) == 0:
+            # unequal axes keep the aspect of the domain
+            ratio = 1.0 if equal_axes else abs(z1 - z0) / abs(x1 - x0)
+            nx = max(2, int(round(resolution * min(1.0, 1.0 / ratio))))
+            nz = max(2, int(round(resolution * min(1.0, ratio))))
+        else:
+            nx, nz = map(int, resolution)
+        self.nx, self.nz = nx, nz
+        self.xlim, self.zlim = (x0, x1), (z0, z1)
+        # coordinates of the grid in the expression
+        self.x_domain, self.z_domain = np.linspace(x0, x1, nx), np.linspace(z0, z1, nz)
+
+        (sx, sy, sz) = MESH_SCALE
+        if not equal_axes:
+            if nx > nz:
+                sx *= (nx / nz)
+            elif nz > nx:
+                sz *= (nz / nx)
+        self.sy, self.y_norm = sy, 1.0
+        ymin, ymax, peak = self.get_range()
+        self.y_norm = peak if peak > EPSILON else 1.0
+        self.ylim = (self.scale_y(ymin), self.scale_y(ymax))
+        self.x = sx * (self.x_domain / np.max(np.abs(self.x_domain)))
+        self.z = sz * (self.z_domain / np.max(np.abs(self.z_domain)))
+        self.y = None           # evaluated on the GPU, see get_heights() otherwise
+        print(f'expression: {expression.source}, samples: {nx * nz}, '
+              f'triangles: {2 * (nx-1) * (nz-1)}{" (animated)" if expression.animated else ""}')
+
+    #
+    def get_heights(self, t=0.0):
+        # (nz, nx) model space heights at time t, as computed in the vertex shader
+        y = self.expression.evaluate(self.x_domain[None, :], self.z_domain[:, None], t)
+        return self.scale_y(y).astype('f4')
+
+    #
+    def get_range(self):
+        # (min, max, max abs) of the expression on the grid at EXPRESSION_RANGE_SAMPLES
+        # times, or at t = 0 if it does not depend on t
+        times = [0.0]
+        if self.expression.animated:
+            times = np.linspace(0.0, EXPRESSION_RANGE_TIME, EXPRESSION_RANGE_SAMPLES)
+        ymin, ymax, n_invalid = np.inf, -np.inf, 0
+        for t in times:
+            y = self.expression.evaluate(self.x_domain[None, :], self.z_domain[:, None], t)
+            finite = np.isfinite(y)
+            n_invalid += y.size - np.count_nonzero(finite)
+            if finite.any():
+                ymin, ymax = min(ymin, np.min(y[finite])), max(ymax, np.max(y[finite]))
+        if ymin > ymax:
+            raise ValueError(f'{self.expression} is not finite anywhere on the domain')
+        if n_invalid > 0:
+            print(f'WARNING: {self.expression} is not finite at {n_invalid} of '
+                  f'{len(times) * self.nx * self.nz} samples.')
+        return float(ymin), float(ymax), max(abs(float(ymin)), abs(float(ymax)))
+
 #
 class AxesMesh(BaseMesh):
     def __init__(self, xlim, ylim, zlim):
@@ -0,0 +1,114 @@
+
+import threading
+import numpy as np
+from numba import njit, prange
+
+# Compiled (numba) versions of the Func3DMesh array code, used with the 'numba' mesh
+# backend. Imported on first use only, see Func3DMesh.get_backend(). The arithmetic is
+# done in float32 in the same order as the numpy path, so both backends produce the
+# same bytes (and share mesh cache entries).
+
+# the kernels may be called from the main and the mesh builder threads, and not all
+# numba threading layers support concurrent parallel regions
+kernel_lock = threading.Lock()
+
+# (row, column) offsets and barycentric coordinates of the six vertices of a quad, same
+# winding as Func3DMesh.get_grid_indices() (see func3D.vert)
+QUAD_OFFSETS = np.array([(0, 0), (1, 0), (0, 1),
+                         (0, 1), (1, 0), (1, 1)], dtype=np.int64)
+BARYCENTRIC = np.array([(1, 0, 0), (1, 1, 0), (0, 0, 1),
+                        (1, 0, 0), (0, 1, 1), (0, 0, 1)], dtype='f4')
+
+
+#
+@njit(cache=True, inline='always')
+def add_cross(n, first, ax, ay, az, bx, by, bz):
+    # n += cross(a, b), or n = cross(a, b) for the first term
+    cx = ay * bz - by * az
+    cy = az * bx - bz * ax
+    cz = ax * by - bx * ay
+    if first:
+        n[0], n[1], n[2] = cx, cy, cz
+    else:
+        n[0], n[1], n[2] = n[0] + cx, n[1] + cy, n[2] + cz
+
+#
+@njit(cache=True, parallel=True)
+def grid_kernel(x, y, z, out):
+    # positions and central difference normals of the (nz, nx) grid, written to
+    # out[i, j, 0:6] (out may be a strided view)
+    nz, nx = y.shape
+    f4 = np.float32
+    zero = f4(0.0)
+    for i in prange(nz):
+        n = np.empty(3, dtype=np.float32)
+        for j in range(nx):
+            # L -> P, P -> R, U -> P and P -> D, where available
+            has_L, has_R, has_U, has_D = j > 0, j < nx - 1, i > 0, i < nz - 1
+            lpx = lpy = prx = pry = upy = upz = pdy = pdz = zero
+            if has_L:
+                lpx, lpy = f4(x[j] - x[j-1]), f4(y[i, j] - y[i, j-1])
+            if has_R:
+                prx, pry = f4(x[j+1] - x[j]), f4(y[i, j+1] - y[i, j])
+            if has_U:
+                upy, upz = f4(y[i, j] - y[i-1, j]), f4(z[i] - z[i-1])
+            if has_D:
+                pdy, pdz = f4(y[i+1, j] - y[i, j]), f4(z[i+1] - z[i])
+
+            # sum available cross products, in the same order as the numpy path
+            first = True
+            if has_U and has_L:
+                add_cross(n, first, zero, upy, upz, lpx, lpy, zero)
+                first = False
+            if has_U and has_R:
+                add_cross(n, first, zero, upy, upz, prx, pry, zero)
+                first = False
+            if has_D and has_L:
+                add_cross(n, first, zero, pdy, pdz, lpx, lpy, zero)
+                first = False
+            if has_D and has_R:
+                add_cross(n, first, zero, pdy, pdz, prx, pry, zero)
+
+            s = f4(1.0) / np.sqrt(n[0] * n[0] + n[1] * n[1] + n[2] * n[2])
+            out[i, j, 0] = x[j]
+            out[i, j, 1] = y[i, j]
+            out[i, j, 2] = z[i]
+            out[i, j, 3] = n[0] * s
+            out[i, j, 4] = n[1] * s
+            out[i, j, 5] = n[2] * s
+
+#
+@njit(cache=True, parallel=True)
+def unroll_kernel(grid, offsets, barycentric, out):
+    # six vertices (two triangles) per quad, with position, normal and barycentric
+    # coordinates
+    nz, nx = grid.shape[0], grid.shape[1]
+    for i in prange(nz - 1):
+        for j in range(nx - 1):
+            v0 = (i * (nx - 1) + j) * 6
+            for c in range(6):
+                ci, cj = i + offsets[c, 0], j + offsets[c, 1]
+                for k in range(6):
+                    out[v0 + c, k] = grid[ci, cj, k]
+                for k in range(3):
+                    out[v0 + c, 6 + k] = barycentric[c, k]
+
+#
+def get_vertex_data(x, y, z):
+    # (6 * quads, 9) float32, as Func3DMesh.get_vertex_data()
+    nz, nx = y.shape
+    grid = np.empty((nz, nx, 6), dtype='f4')
+    vertex_data = np.empty((6 * (nz - 1) * (nx - 1), 9), dtype='f4')
+    with kernel_lock:
+        grid_kernel(x, y, z, grid)
+        unroll_kernel(grid, QUAD_OFFSETS, BARYCENTRIC, vertex_data)
+    return vertex_data
+
+#
+def get_indexed_vertex_data(x, y, z):
+    # (nz * nx, 6) float32, as the vertex part of Func3DMesh.get_indexed_vertex_data()
+    nz, nx = y.shape
+    vertex_data = np.empty((nz, nx, 6), dtype='f4')
+    with kernel_lock:
+        grid_kernel(x, y, z, vertex_data)
+    return vertex_data.reshape(-1, 6)
@@ -1,8 +1,11 @@
 
+import time
 import moderngl as mgl
 import glm
 #
 from OpenGLAPI.mesh import *
+from OpenGLAPI.colormap import get_colormap_lut
+from resample import ResamplingPyramid
 
 
 class BaseObject:
@@ -14,6 +17,8 @@ class BaseObject:
         self.vao : mgl.Context.vertex_array = None
         self.obj_id = obj_id
         self.primitive = mgl.TRIANGLES
+        self.dirty = True       # changed since last rendered, see Scene.is_dirty()
+        self.animated = False   # changes every frame (e.g. with time), always redrawn
         #
         self.pos = glm.vec3(pos)
         self.rot = glm.vec3(rot)
@@ -33,6 +38,10 @@ class BaseObject:
         #
         return m_model
     #
+    def set_uniform(self, name, value):
+        # skipped if the (shared) program already holds the value, see ShaderManager
+        self.app.shader_manager.set_uniform(self.shader, name, value)
+    #
     def on_init(self): ...
     def update(self, camera): ...
     def render(self, camera):
@@ -58,53 +67,690 @@ class DebugCubeObj(BaseObject):
     def on_init(self): pass
     
     def update(self, camera):
-        self.shader['m_model'].write(self.m_model)
-        self.shader['m_view'].write(camera.m_view)
-        self.shader['m_proj'].write(camera.m_proj)
+        self.set_uniform('m_model', self.m_model)
 
 #
-class Func3DObj(BaseObject):
-    def __init__(self, app, x, y, z, equal_axes, shader, pos=(0, 0, 0), 
-                 rot=(0, 0, 0), scale=(1, 1, 1), obj_id=None):
-        super().__init__(app, pos, rot, scale, obj_id)
+class SurfaceObj(BaseObject):
+    # Common state of the function surfaces: wireframe/lighting toggles and the colormap,
+    # which is sampled from a 1D lookup texture by height in the fragment shader, so
+    # changing colormap or range never touches the geometry.
+    colormap_unit = 0   # texture unit of the colormap lookup texture
+    pickable = True     # values can be read under the cursor (see Func3D.pick())
 
-        self.vbo_format = '3f 3f 3f 3f'
-        self.shader_attrs = ['a_position', 'a_normal', 'a_barycentric', 'a_color']
-        self.mesh = Func3DMesh(x, y, z, equal_axes)
-        self.vbo = self.ctx.buffer(self.mesh.vertex_data)
-        self.shader = self.app.shader_manager.programs[shader]
-        self.vao = self.ctx.vertex_array(self.shader, 
-                                         [(self.vbo, self.vbo_format, *self.shader_attrs)],
-                                         skip_errors=True)
+    def __init__(self, app, pos=(0, 0, 0), rot=(0, 0, 0), scale=(1, 1, 1), obj_id=None):
+        super().__init__(app, pos, rot, scale, obj_id)
         self.wireframe = False
         self.lighting = True
         #self.Ipos = glm.vec3(self.mesh.x[0], self.mesh.ylim[1]+3.0, self.mesh.z[0])
         self.Ipos = glm.vec3(2.5, 5.0, -2.5)
-        #
-        self.on_init()
-        
+        self.colormap = COLORMAPS[0]
+        self.lut_tex = self.ctx.texture((COLORMAP_SIZE, 1), 3, dtype='f4',
+                                        data=get_colormap_lut(self.colormap, COLORMAP_SIZE))
+        self.lut_tex.filter = (mgl.NEAREST, mgl.NEAREST)
+        self.lut_tex.repeat_x, self.lut_tex.repeat_y = False, False
+        self.vmin, self.vmax, self.gamma = 0.0, 1.0, 1.0
+        self.build_time = 0     # ns spent building the mesh
+        self.upload_time = 0    # ns spent creating buffers/textures
+        self.data_version = 0   # incremented when the data changes (see Picker)
+
+    #
+    def get_data_texture(self, size, components, data, dtype='f4'):
+        texture = self.ctx.texture(size, components, data=data, dtype=dtype)
+        texture.filter = (mgl.NEAREST, mgl.NEAREST)
+        texture.repeat_x, texture.repeat_y = False, False
+        return texture
+
+    #
+    def get_height_grid(self):
+        # (nz, nx) model space heights as drawn, or None if not held in memory
+        return None
+
+    #
+    def reset_color_range(self):
+        self.vmin, self.vmax = float(self.mesh.ylim[0]), float(self.mesh.ylim[1])
+        self.gamma = 1.0
+
     #
     def toggle_wireframe(self):
         self.wireframe = not self.wireframe
+        self.dirty = True
         #print(f'wireframe: {str(self.wireframe)}')
         
     #
     def toggle_lights(self):
         self.lighting = not self.lighting
+        self.dirty = True
         #print(f'lighting: {str(self.lighting)}')
-    
+
+    #
+    def set_colormap(self, name):
+        self.colormap = name
+        self.lut_tex.write(get_colormap_lut(name, COLORMAP_SIZE))
+        self.dirty = True
+
+    #
+    def cycle_colormap(self, step=1):
+        i = COLORMAPS.index(self.colormap) if self.colormap in COLORMAPS else -1
+        self.set_colormap(COLORMAPS[(i + step) % len(COLORMAPS)])
+        print(f'colormap: {self.colormap}')
+
+    #
+    def adjust_range(self, dmin=0.0, dmax=0.0):
+        # shift vmin/vmax by fractions of the data range
+        span = float(self.mesh.ylim[1] - self.mesh.ylim[0])
+        vmin, vmax = self.vmin + dmin * span, self.vmax + dmax * span
+        if vmax - vmin > EPSILON:
+            self.vmin, self.vmax = vmin, vmax
+            self.dirty = True
+        print(f'color range: [{self.vmin:.3f}, {self.vmax:.3f}]')
+
+    #
+    def adjust_gamma(self, factor):
+        self.gamma = min(max(self.gamma * factor, 0.05), 20.0)
+        self.dirty = True
+        print(f'color gamma: {self.gamma:.2f}')
+
+    #
+    def update(self, camera):
+        # Objects may share a program, so per-object values are set on every update;
+        # unchanged values are skipped by set_uniform(). The camera is in the 'Camera' 
+        # uniform block, written once per frame.
+        self.lut_tex.use(location=self.colormap_unit)
+        self.set_uniform('u_colormap', self.colormap_unit)
+        self.set_uniform('m_model', self.m_model)
+        self.set_uniform('u_Ipos', self.Ipos)
+        self.set_uniform('u_use_wireframe', self.wireframe)
+        self.set_uniform('u_use_lighting', self.lighting)
+        self.set_uniform('u_vmin', self.vmin)
+        self.set_uniform('u_vmax', self.vmax)
+        self.set_uniform('u_gamma', self.gamma)
+
+#
+class Func3DObj(SurfaceObj):
+    def __init__(self, app, x, y, z, equal_axes, shader, pos=(0, 0, 0), 
+                 rot=(0, 0, 0), scale=(1, 1, 1), obj_id=None, indexed=False,
+                 max_resolution=MESH_MAX_RESOLUTION, mesh=None, compact=False):
+        super().__init__(app, pos, rot, scale, obj_id)
+
+        # mesh: already built (e.g. in the background), x/y/z are then ignored
+        self.indexed = indexed
+        t0 = time.perf_counter_ns()
+        if mesh is None:
+            mesh = Func3DMesh(x, y, z, equal_axes, indexed=indexed, 
+                              max_resolution=max_resolution, cache=self.app.mesh_cache,
+                              compact=compact)
+        self.mesh = mesh
+        self.compact = mesh.compact
+        t1 = time.perf_counter_ns()
+        self.vbo = self.ctx.buffer(self.mesh.vertex_data)
+        self.ibo = self.ctx.buffer(self.mesh.index_data) if self.indexed else None
+        self.build_time, self.upload_time = t1 - t0, time.perf_counter_ns() - t1
+        if self.compact:
+            # 16-bit x/z, float height and an octahedral normal (see Func3DMesh.pack_compact()), 
+            # decoded in func3D_compact.vert; indexed or not
+            self.vbo_format = '2u2 f u4'
+            self.shader_attrs = ['a_xz', 'a_height', 'a_normal']
+            self.shader = self.app.shader_manager.programs[shader + '_compact']
+            self.vao = self.ctx.vertex_array(self.shader, 
+                                             [(self.vbo, self.vbo_format, *self.shader_attrs)],
+                                             index_buffer=self.ibo,
+                                             index_element_size=4,
+                                             skip_errors=True)
+            self.upload_bytes = self.vbo.size + (self.ibo.size if self.indexed else 0)
+            (x0, x1), (z0, z1) = self.mesh.get_xz_range()
+            self.x_range, self.z_range = glm.vec2(x0, x1), glm.vec2(z0, z1)
+        elif self.indexed:
+            # one vertex per grid point, triangles through the index buffer
+            self.vbo_format = '3f 3f'
+            self.shader_attrs = ['a_position', 'a_normal']
+            self.shader = self.app.shader_manager.programs[shader + '_indexed']
+            self.vao = self.ctx.vertex_array(self.shader, 
+                                             [(self.vbo, self.vbo_format, *self.shader_attrs)],
+                                             index_buffer=self.ibo,
+                                             index_element_size=4,
+                                             skip_errors=True)
+            self.upload_bytes = self.vbo.size + self.ibo.size
+        else:
+            self.vbo_format = '3f 3f 3f'
+            self.shader_attrs = ['a_position', 'a_normal', 'a_barycentric']
+            self.shader = self.app.shader_manager.programs[shader]
+            self.vao = self.ctx.vertex_array(self.shader, 
+                                             [(self.vbo, self.vbo_format, *self.shader_attrs)],
+                                             skip_errors=True)
+            self.upload_bytes = self.vbo.size
+        print(f'uploaded {self.upload_bytes} bytes ({"indexed" if self.indexed else "unrolled"}'
+              f'{", compact" if self.compact else ""}).')
+        self.reset_color_range()
+        #
+        self.on_init()
+        
+    #
+    def update_region(self, i0, j0, patch):
+        # replaces part of the data, only the touched vertices are rebuilt and uploaded
+        # (see Func3DMesh.update_region()). Returns the number of bytes uploaded.
+        n_bytes = 0
+        for offset, data in self.mesh.update_region(i0, j0, patch):
+            self.vbo.write(data, offset=offset)
+            n_bytes += data.nbytes
+        self.dirty = True
+        self.data_version += 1
+        return n_bytes
+
+    #
+    def get_height_grid(self):
+        return self.mesh.y.reshape(self.mesh.nz, self.mesh.nx)
+
+    #
+    def update(self, camera):
+        super().update(camera)
+        if self.indexed or self.compact:
+            self.set_uniform('u_grid_nx', int(self.mesh.nx))
+        if self.compact:
+            self.set_uniform('u_x_range', self.x_range)
+            self.set_uniform('u_z_range', self.z_range)
+            self.set_uniform('u_indexed', self.indexed)
+
+
+#
+class Func3DTextureObj(SurfaceObj):
+    # The data is uploaded once as a height texture (R32F, R16F or R16, see HeightFormat)
+    # and the grid is generated in the vertex shader, so no per-vertex attributes are 
+    # built on the CPU.
+    shader_suffix = '_texture'
+
+    def __init__(self, app, x, y, z, equal_axes, shader, pos=(0, 0, 0), 
+                 rot=(0, 0, 0), scale=(1, 1, 1), obj_id=None, stream=False,
+                 max_resolution=MESH_MAX_RESOLUTION, mesh=None, height_format=HEIGHT_FORMAT):
+        super().__init__(app, pos, rot, scale, obj_id)
+
+        # streamed data is never held in memory as a whole
+        t0 = time.perf_counter_ns()
+        if mesh is not None:
+            self.mesh = mesh
+        elif stream:
+            self.mesh = Func3DStreamMesh(x, y, z, equal_axes, height_format=height_format)
+        else:
+            self.mesh = Func3DTextureMesh(x, y, z, equal_axes, max_resolution, 
+                                          height_format=height_format)
+        t1 = time.perf_counter_ns()
+        nx, nz = self.mesh.nx, self.mesh.nz
+        heights = self.mesh.heights
+        self.height_tex = self.get_data_texture(self.get_texture_size(), 1, None,
+                                                heights.texture_dtype)
+        for i0, band in self.mesh.iter_bands():
+            self.height_tex.write(band, viewport=(0, i0, nx, band.shape[0]))
+        self.height_range = glm.vec2(heights.range)
+        self.x_tex = self.get_data_texture((nx, 1), 1, self.mesh.x_data)
+        self.z_tex = self.get_data_texture((nz, 1), 1, self.mesh.z_data)
+        self.build_time, self.upload_time = t1 - t0, time.perf_counter_ns() - t1
+        self.grid_size = glm.ivec2(nx, nz)
+        self.n_vertices = 6 * (nx - 1) * (nz - 1)
+        self.row_offset = 0     # texture row holding the first (oldest) grid row
+        self.shader = self.app.shader_manager.programs[shader + self.shader_suffix]
+        self.vao = self.ctx.vertex_array(self.shader, [], skip_errors=True)
+        self.upload_bytes = nx * nz * np.dtype(heights.dtype).itemsize
+        print(f'uploaded {self.upload_bytes} bytes (texture).')
+        heights.report(nx * nz)
+        self.reset_color_range()
+        #
+        self.on_init()
+
+    #
+    def get_texture_size(self):
+        # (width, height) of the height texture
+        return self.mesh.nx, self.mesh.nz
+
+    #
+    def append_rows(self, rows):
+        # Scroll the surface: the height texture is used as a ring buffer over z, the 
+        # oldest rows are overwritten and the visible origin is shifted by u_row_offset.
+        rows = np.atleast_2d(np.asarray(rows))
+        nx, nz = self.mesh.nx, self.mesh.nz
+        if rows.shape[1] != nx:
+            raise ValueError(f'appended rows must have {nx} columns, got {rows.shape[1]}')
+        rows = rows[-nz:]
+        self.fit_range(rows)
+        rows = self.mesh.heights.encode(self.mesh.scale_y(rows))
+        n = rows.shape[0]
+        # write in (at most) two contiguous bands
+        n0 = min(n, nz - self.row_offset)
+        self.write_rows(self.row_offset, rows[:n0])
+        if n0 < n:
+            self.write_rows(0, rows[n0:])
+        self.row_offset = (self.row_offset + n) % nz
+
+    #
+    def fit_range(self, rows):
+        # Widens the height range to appended rows (data units). Values beyond the y
+        # scaling rescale the surface as if it had been loaded with them (e.g. scrolling 
+        # in from a flat history): the heights are re-encoded and uploaded again, once 
+        # per increase of the peak. The color range follows unless it was adjusted.
+        mesh = self.mesh
+        finite = rows[np.isfinite(rows)]
+        if finite.size == 0:
+            return
+        lo, hi = float(np.min(finite)), float(np.max(finite))
+        y_norm = max(float(mesh.y_norm), abs(lo), abs(hi))
+        if y_norm == mesh.y_norm and mesh.ylim[0] <= mesh.scale_y(lo) and \
+           mesh.scale_y(hi) <= mesh.ylim[1]:
+            return
+        k = float(mesh.y_norm) / y_norm
+        ylim = (min(k * float(mesh.ylim[0]), mesh.sy * lo / y_norm),
+                max(k * float(mesh.ylim[1]), mesh.sy * hi / y_norm))
+        full_range = (self.vmin, self.vmax) == (float(mesh.ylim[0]), float(mesh.ylim[1]))
+        # 16-bit steps are over the height range, which changed
+        if k < 1.0 or mesh.heights.name == 'u2':
+            heights = mesh.heights.decode(self.read_height_data())
+            heights *= np.float32(k)
+            mesh.heights = HeightFormat(mesh.heights.name, *ylim)
+            data = mesh.heights.encode(heights)
+            if mesh.height_data is not None:
+                mesh.height_data = data
+            self.height_tex.write(data)
+            self.height_range = glm.vec2(mesh.heights.range)
+            self.data_version += 1
+        mesh.y_norm, mesh.ylim = y_norm, ylim
+        if full_range:
+            self.vmin, self.vmax = ylim
+        else:
+            self.vmin, self.vmax = k * self.vmin, k * self.vmax
+        self.dirty = True
+
+    #
+    def read_height_data(self):
+        # (nz, nx) encoded heights in texture order, read back if not held (streamed)
+        if self.mesh.height_data is not None:
+            return self.mesh.height_data
+        data = np.frombuffer(self.height_tex.read(), dtype=self.mesh.heights.dtype)
+        return data.reshape(self.mesh.nz, self.mesh.nx)
+
+    #
+    def update_region(self, i0, j0, patch):
+        # replaces part of the data (rows counted from the oldest one if scrolled); the
+        # normals follow in the vertex shader. Returns the number of bytes uploaded.
+        patch = np.atleast_2d(np.asarray(patch))
+        (m, n), nx, nz = patch.shape, self.mesh.nx, self.mesh.nz
+        if i0 < 0 or j0 < 0 or i0 + m > nz or j0 + n > nx:
+            raise ValueError(f'patch {patch.shape} at ({i0}, {j0}) exceeds the grid ({nz}, {nx})')
+        patch = self.mesh.heights.encode(self.mesh.scale_y(patch))
+        # the height texture is a ring buffer over z, write in (at most) two bands
+        row = (self.row_offset + i0) % nz
+        m0 = min(m, nz - row)
+        for r, band in ((row, patch[:m0]), (0, patch[m0:])):
+            if band.shape[0] == 0:
+                continue
+            if self.mesh.height_data is not None:
+                self.mesh.height_data[r:r+band.shape[0], j0:j0+n] = band
+            self.height_tex.write(np.ascontiguousarray(band), viewport=(j0, r, n, band.shape[0]))
+        self.dirty = True
+        self.data_version += 1
+        return patch.nbytes
+
+    #
+    def write_rows(self, row, rows):
+        if self.mesh.height_data is not None:
+            self.mesh.height_data[row:row+rows.shape[0]] = rows
+        self.height_tex.write(rows, viewport=(0, row, self.mesh.nx, rows.shape[0]))
+        self.dirty = True
+        self.data_version += 1
+
+    #
+    def get_height_grid(self):
+        # decoded, in grid order (the texture is a ring buffer over z)
+        if self.mesh.height_data is None:
+            return None
+        return np.roll(self.mesh.heights.decode(self.mesh.height_data), -self.row_offset, 
+                       axis=0)
+
+    #
+    def update(self, camera):
+        super().update(camera)
+        self.height_tex.use(location=1)
+        self.x_tex.use(location=2)
+        self.z_tex.use(location=3)
+        self.set_uniform('u_heights', 1)
+        self.set_uniform('u_xcoords', 2)
+        self.set_uniform('u_zcoords', 3)
+        self.set_uniform('u_grid_size', self.grid_size)
+        self.set_uniform('u_row_offset', self.row_offset)
+        self.set_uniform('u_height_range', self.height_range)
+
+    #
+    def render(self, camera):
+        self.update(camera)
+        self.vao.render(self.primitive, vertices=self.n_vertices)
+
+
+#
+class Func3DTiledObj(Func3DTextureObj):
+    # Terrain-style rendering of the height texture: the grid is split into tiles of 
+    # LOD_TILE_SIZE quads, each drawn with a power-of-two step chosen from its projected
+    # size. Tiles outside the view frustum are culled, and the remaining tiles are drawn
+    # with one instanced call per LOD level. Level l reads the heights decimated by 2^l
+    # (LOD_DECIMATION), stored as mip level l of the height texture.
+    shader_suffix = '_tiled'
+
+    def __init__(self, app, x, y, z, equal_axes, shader, pos=(0, 0, 0), 
+                 rot=(0, 0, 0), scale=(1, 1, 1), obj_id=None, stream=False, 
+                 max_resolution=MESH_MAX_RESOLUTION, tile_size=LOD_TILE_SIZE, mesh=None,
+                 height_format=HEIGHT_FORMAT):
+        assert(tile_size & (tile_size - 1) == 0), 'tile size must be a power of two'
+        self.tile_size = tile_size
+        super().__init__(app, x, y, z, equal_axes, shader, pos, rot, scale, obj_id, stream,
+                         max_resolution, mesh, height_format)
+
+        self.n_levels = int(np.log2(self.tile_size)) + 1
+        self.upload_levels()
+        self.init_tiles()
+        # one instance buffer and vertex array per LOD level
+        self.instance_vbos, self.instance_vaos = [], []
+        for level in range(self.n_levels):
+            vbo = self.ctx.buffer(reserve=self.n_tiles * 12 * 4)
+            vao = self.ctx.vertex_array(self.shader,
+                                        [(vbo, '4i 4i 4i /i', 'a_tile', 'a_neighbour_levels',
+                                          'a_corner_levels')],
+                                        skip_errors=True)
+            self.instance_vbos.append(vbo)
+            self.instance_vaos.append(vao)
+        self.n_visible_tiles = 0
+        self.n_drawn_triangles = 0
+        print(f'tiles: {self.tile_rows} x {self.tile_cols} of {self.tile_size}^2 quads, '
+              f'{self.n_levels} LOD levels.')
+
+    #
+    def get_texture_size(self):
+        # padded to whole tiles, so every mip level holds its decimated grid
+        T = self.tile_size
+        return -(-self.mesh.nx // T) * T, -(-self.mesh.nz // T) * T
+
+    #
+    def upload_levels(self, mode=LOD_DECIMATION):
+        # Mip level l of the height texture holds the heights decimated by 2^l along x
+        # and z (see ResamplingPyramid, 'max' keeps every peak), sample k covering grid
+        # points k*2^l to (k+1)*2^l - 1. Built in bands of whole tile rows.
+        t0 = time.perf_counter_ns()
+        self.height_tex.build_mipmaps(0, self.n_levels - 1)     # allocates the levels
+        self.height_tex.filter = (mgl.NEAREST_MIPMAP_NEAREST, mgl.NEAREST)
+        rows = max(1, self.mesh.band_rows // self.tile_size) * self.tile_size
+        heights = self.mesh.heights
+        for b0, band in self.mesh.iter_bands(rows):
+            pyramid = ResamplingPyramid(heights.decode(band), self.mesh.x_data,
+                                        self.mesh.z_data[b0:b0+rows])
+            for level in range(1, self.n_levels):
+                data = heights.encode(pyramid.get_level(level, level, mode))
+                self.height_tex.write(data, viewport=(0, b0 >> level, *data.shape[::-1]),
+                                      level=level)
+        self.upload_time += time.perf_counter_ns() - t0
+
+    #
+    def init_tiles(self):
+        # tile origins, sizes (in quads) and model space bounding boxes
+        nx, nz, T = self.mesh.nx, self.mesh.nz, self.tile_size
+        j0, i0 = np.arange(0, nx - 1, T), np.arange(0, nz - 1, T)
+        cw, ch = np.minimum(T, nx - 1 - j0), np.minimum(T, nz - 1 - i0)
+        self.tile_rows, self.tile_cols = i0.shape[0], j0.shape[0]
+        self.n_tiles = self.tile_rows * self.tile_cols
+        
+        tiles = np.empty((self.tile_rows, self.tile_cols, 4), dtype='i4')
+        tiles[..., 0], tiles[..., 1] = j0[None, :], i0[:, None]
+        tiles[..., 2], tiles[..., 3] = cw[None, :], ch[:, None]
+        self.tiles = tiles.reshape(-1, 4)
+
+        # height range per tile, including the shared last row/column. Bands hold whole
+        # rows of tiles plus the shared row below.
+        rows = max(1, self.mesh.band_rows // T) * T
+        hmin, hmax = [], []
+        for b0, h in self.mesh.iter_bands(rows, halo=1):
+            s0 = i0[(i0 >= b0) & (i0 < b0 + rows)] - b0
+            s1 = s0 + ch[s0 // T + b0 // T]
+            hmin.append(np.minimum(np.minimum.reduceat(h, s0, axis=0), h[s1, :]))
+            hmax.append(np.maximum(np.maximum.reduceat(h, s0, axis=0), h[s1, :]))
+        # encoding preserves the order of heights, decoded after the reduction
+        hmin = self.mesh.heights.decode(np.vstack(hmin))
+        hmax = self.mesh.heights.decode(np.vstack(hmax))
+        hmin = np.minimum(np.minimum.reduceat(hmin, j0, axis=1), hmin[:, j0 + cw])
+        hmax = np.maximum(np.maximum.reduceat(hmax, j0, axis=1), hmax[:, j0 + cw])
+        x, z = self.mesh.x_data, self.mesh.z_data
+        xa, xb = x[j0], x[j0 + cw]
+        za, zb = z[i0], z[i0 + ch]
+        lo = np.empty((self.tile_rows, self.tile_cols, 3), dtype='f4')
+        hi = np.empty((self.tile_rows, self.tile_cols, 3), dtype='f4')
+        lo[..., 0], hi[..., 0] = np.minimum(xa, xb)[None, :], np.maximum(xa, xb)[None, :]
+        lo[..., 1], hi[..., 1] = hmin, hmax
+        lo[..., 2], hi[..., 2] = np.minimum(za, zb)[:, None], np.maximum(za, zb)[:, None]
+        self.tile_lo, self.tile_hi = lo.reshape(-1, 3), hi.reshape(-1, 3)
+        # culling boxes also span the heights of the next tiles: decimated samples on the
+        # right and bottom edges cover up to a tile beyond
+        cull_lo, cull_hi = lo.copy(), hi.copy()
+        for h, ufunc in ((cull_lo[..., 1], np.minimum), (cull_hi[..., 1], np.maximum)):
+            ufunc(h[:, :-1], h[:, 1:], out=h[:, :-1])
+            ufunc(h[:-1, :], h[1:, :], out=h[:-1, :])
+        self.cull_lo, self.cull_hi = cull_lo.reshape(-1, 3), cull_hi.reshape(-1, 3)
+        # world size of one grid cell per tile, for the projected error
+        self.tile_cell_size = np.max((hi - lo)[..., (0, 2)], axis=-1).reshape(-1) / \
+                              np.maximum(self.tiles[:, 2:], 1).min(axis=1)
+
+    #
+    def get_visible_tiles(self, camera):
+        # frustum planes in model space (Gribb & Hartmann), then the 'positive' corner 
+        # of each bounding box is tested against every plane
+        m = np.array(camera.m_proj * camera.m_view * self.m_model)
+        planes = np.stack([m[3] + m[0], m[3] - m[0],
+                           m[3] + m[1], m[3] - m[1],
+                           m[3] + m[2], m[3] - m[2]])
+        p_corner = np.where(planes[None, :, :3] > 0, 
+                            self.cull_hi[:, None, :], self.cull_lo[:, None, :])
+        dist = np.einsum('tpk,pk->tp', p_corner, planes[:, :3]) + planes[:, 3]
+        return np.all(dist >= 0.0, axis=1)
+
+    #
+    def get_tile_levels(self, camera):
+        # largest power-of-two step whose projected quad size stays below LOD_PIXEL_ERROR
+        cam_pos = np.array(glm.inverse(self.m_model) * camera.position)
+        d = np.maximum(np.maximum(self.tile_lo - cam_pos, cam_pos - self.tile_hi), 0.0)
+        dist = np.maximum(np.sqrt(np.sum(d * d, axis=1)), EPSILON)
+        pixels_per_unit = self.app.window_size[1] / (2.0 * np.tan(np.radians(FOV) / 2.0))
+        steps = LOD_PIXEL_ERROR * dist / (self.tile_cell_size * pixels_per_unit)
+        levels = np.floor(np.log2(np.maximum(steps, 1.0))).astype('i4')
+        return np.clip(levels, 0, self.n_levels - 1)
+
+    #
+    def append_rows(self, rows):
+        raise NotImplementedError('append_rows() is not supported on tiled surfaces')
+
+    #
+    def update_region(self, i0, j0, patch):
+        # the tile height ranges would have to follow
+        raise NotImplementedError('update_region() is not supported on tiled surfaces')
+
+    #
+    def get_instance_data(self, levels):
+        # (tiles, 12) per-tile attributes: the tile, the levels of its neighbours (left,
+        # right, up, down) and the coarsest level of the tiles sharing each corner (up
+        # left, up right, down left, down right), 0 past the grid border
+        padded = np.pad(levels.reshape(self.tile_rows, self.tile_cols), 1)
+        neighbour_levels = np.stack([padded[1:-1, :-2], padded[1:-1, 2:],
+                                     padded[:-2, 1:-1], padded[2:, 1:-1]], axis=-1)
+        corner = np.maximum(np.maximum(padded[:-1, :-1], padded[:-1, 1:]),
+                            np.maximum(padded[1:, :-1], padded[1:, 1:]))
+        corner_levels = np.stack([corner[:-1, :-1], corner[:-1, 1:],
+                                  corner[1:, :-1], corner[1:, 1:]], axis=-1)
+        return np.hstack([self.tiles, neighbour_levels.reshape(-1, 4),
+                          corner_levels.reshape(-1, 4)]).astype('i4')
+
+    #
+    def render(self, camera):
+        visible = self.get_visible_tiles(camera)
+        levels = self.get_tile_levels(camera)
+        instance_data = self.get_instance_data(levels)
+
+        self.update(camera)
+        self.n_visible_tiles, self.n_drawn_triangles = 0, 0
+        for level in range(self.n_levels):
+            mask = visible & (levels == level)
+            n = int(np.count_nonzero(mask))
+            if n == 0:
+                continue
+            self.instance_vbos[level].write(np.ascontiguousarray(instance_data[mask]))
+            quads = -(-self.tile_size // (1 << level))
+            self.set_uniform('u_level', level)
+            self.set_uniform('u_step', 1 << level)
+            self.set_uniform('u_quads', quads)
+            self.instance_vaos[level].render(self.primitive, vertices=6 * quads * quads, 
+                                             instances=n)
+            self.n_visible_tiles += n
+            self.n_drawn_triangles += 2 * quads * quads * n
+
+
+#
+class Func3DMultiplesObj(SurfaceObj):
+    # Small multiples: many same-shaped surfaces drawn with a single instanced call. The
+    # heights are the layers of one texture array (see HeightFormat), the grid is 
+    # generated in the vertex shader and each instance is placed by a model matrix in 
+    # an instance buffer.
+    pickable = False    # the surfaces are placed by instance matrices
+
+    def __init__(self, app, x, y, z, equal_axes, shader, pos=(0, 0, 0), 
+                 rot=(0, 0, 0), scale=(1, 1, 1), obj_id=None, rows=None, cols=None,
+                 spacing=MULTIPLES_SPACING, height_format=HEIGHT_FORMAT):
+        super().__init__(app, pos, rot, scale, obj_id)
+
+        t0 = time.perf_counter_ns()
+        self.mesh = Func3DMultiplesMesh(x, y, z, equal_axes, height_format)
+        t1 = time.perf_counter_ns()
+        n, nx, nz = self.mesh.n_surfaces, self.mesh.nx, self.mesh.nz
+        max_layers = self.ctx.info['GL_MAX_ARRAY_TEXTURE_LAYERS']
+        if n > max_layers:
+            raise ValueError(f'{n} surfaces exceed the {max_layers} texture array layers')
+        heights = self.mesh.heights
+        self.height_tex = self.ctx.texture_array((nx, nz, n), 1, data=self.mesh.height_data,
+                                                 dtype=heights.texture_dtype)
+        self.height_range = glm.vec2(heights.range)
+        self.height_tex.filter = (mgl.NEAREST, mgl.NEAREST)
+        self.height_tex.repeat_x, self.height_tex.repeat_y = False, False
+        self.x_tex = self.get_data_texture((nx, 1), 1, self.mesh.x_data)
+        self.z_tex = self.get_data_texture((nz, 1), 1, self.mesh.z_data)
+        self.instance_vbo = self.ctx.buffer(reserve=n * 16 * 4)
+        self.build_time, self.upload_time = t1 - t0, time.perf_counter_ns() - t1
+        self.grid_size = glm.ivec2(nx, nz)
+        self.n_vertices = 6 * (nx - 1) * (nz - 1)
+        self.shader = self.app.shader_manager.programs[shader + '_multiples']
+        self.vao = self.ctx.vertex_array(self.shader, 
+                                         [(self.instance_vbo, '16f /i', 'a_instance_model')],
+                                         skip_errors=True)
+        self.upload_bytes = self.mesh.height_data.nbytes
+        print(f'uploaded {self.upload_bytes} bytes (texture array).')
+        heights.report(n * nx * nz)
+        self.set_layout(rows, cols, spacing)
+        self.reset_color_range()
+        #
+        self.on_init()
+
     #
-    def on_init(self): 
-        self.shader['u_Ipos'].write(self.Ipos)
-            
+    def set_layout(self, rows=None, cols=None, spacing=MULTIPLES_SPACING):
+        # Places the surfaces row by row on a (rows x cols) grid in the xz plane, with 
+        # gaps of spacing times the surface size. The whole grid is scaled down to the
+        # extent of a single surface. Missing rows/cols are chosen to fit all surfaces.
+        n = self.mesh.n_surfaces
+        if rows is None and cols is None:
+            cols = int(np.ceil(np.sqrt(n)))
+        if rows is None:
+            rows = -(-n // cols)
+        if cols is None:
+            cols = -(-n // rows)
+        if rows * cols < n:
+            raise ValueError(f'a {rows} x {cols} layout cannot hold {n} surfaces')
+        self.rows, self.cols, self.spacing = rows, cols, spacing
+
+        x, z = self.mesh.x, self.mesh.z
+        size = np.array([np.ptp(x), np.ptp(z)])
+        center = np.array([0.5 * (x[0] + x[-1]), 0.5 * (z[0] + z[-1])])
+        pitch = size * (1.0 + spacing)
+        s = np.min(size / (np.array([cols, rows]) * pitch - spacing * size))
+        i = np.arange(n)
+        offsets = np.stack([(i % cols - 0.5 * (cols - 1)) * pitch[0],
+                            (i // cols - 0.5 * (rows - 1)) * pitch[1]], axis=1)
+        # column-major model matrices: scale s about the surface center, then offset
+        models = np.zeros((n, 16), dtype='f4')
+        models[:, 0] = models[:, 5] = models[:, 10] = s
+        models[:, 15] = 1.0
+        models[:, 12] = center[0] * (1.0 - s) + s * offsets[:, 0]
+        models[:, 14] = center[1] * (1.0 - s) + s * offsets[:, 1]
+        self.instance_vbo.write(models)
+        self.dirty = True
+
     #
     def update(self, camera):
-        self.shader['m_model'].write(self.m_model)
-        self.shader['m_view'].write(camera.m_view)
-        self.shader['m_proj'].write(camera.m_proj)
-        self.shader['u_cam_pos'].write(camera.position)
-        self.shader['u_use_wireframe'].write(np.array(self.wireframe, dtype='int32'))
-        self.shader['u_use_lighting'].write(np.array(self.lighting, dtype='int32'))
+        super().update(camera)
+        self.height_tex.use(location=1)
+        self.x_tex.use(location=2)
+        self.z_tex.use(location=3)
+        self.set_uniform('u_heights', 1)
+        self.set_uniform('u_xcoords', 2)
+        self.set_uniform('u_zcoords', 3)
+        self.set_uniform('u_grid_size', self.grid_size)
+        self.set_uniform('u_height_range', self.height_range)
+
+    #
+    def render(self, camera):
+        self.update(camera)
+        self.vao.render(self.primitive, vertices=self.n_vertices, 
+                        instances=self.mesh.n_surfaces)
+
+
+#
+class Func3DExpressionObj(SurfaceObj):
+    # A function of x, z and the time t, evaluated in the vertex shader: the expression
+    # is spliced into a variant of the func3D_expression program, which generates the
+    # grid from gl_VertexID. Nothing is uploaded, animated expressions are redrawn every
+    # frame with t = app.time (seconds).
+    def __init__(self, app, expression, domain, resolution, equal_axes, shader,
+                 pos=(0, 0, 0), rot=(0, 0, 0), scale=(1, 1, 1), obj_id=None):
+        super().__init__(app, pos, rot, scale, obj_id)
+
+        t0 = time.perf_counter_ns()
+        self.mesh = Func3DExpressionMesh(expression, domain, resolution, equal_axes)
+        nx, nz = self.mesh.nx, self.mesh.nz
+        self.shader = self.app.shader_manager.get_variant(
+            shader + '_expression', {'expression' : self.mesh.expression.glsl})
+        self.vao = self.ctx.vertex_array(self.shader, [], skip_errors=True)
+        self.build_time = time.perf_counter_ns() - t0
+        self.grid_size = glm.ivec2(nx, nz)
+        self.n_vertices = 6 * (nx - 1) * (nz - 1)
+        x, z = self.mesh.x, self.mesh.z
+        self.x_model, self.z_model = glm.vec2(x[0], x[-1]), glm.vec2(z[0], z[-1])
+        self.x_domain, self.z_domain = glm.vec2(self.mesh.xlim), glm.vec2(self.mesh.zlim)
+        self.y_scale = float(self.mesh.sy / self.mesh.y_norm)
+        self.animated = self.mesh.expression.animated
+        self.time = 0.0         # t of the last update
+        self.reset_color_range()
+        #
+        self.on_init()
+
+    #
+    def get_height_grid(self):
+        # the heights as last drawn, evaluated with numpy
+        return self.mesh.get_heights(self.time)
+
+    #
+    def update(self, camera):
+        super().update(camera)
+        if self.animated and self.app.time / 1000.0 != self.time:
+            self.time = self.app.time / 1000.0
+            self.data_version += 1
+        self.set_uniform('u_grid_size', self.grid_size)
+        self.set_uniform('u_x_model', self.x_model)
+        self.set_uniform('u_z_model', self.z_model)
+        # unused by some expressions (optimized out)
+        for name, value in (('u_x_domain', self.x_domain), ('u_z_domain', self.z_domain),
+                            ('u_y_scale', self.y_scale), ('u_time', self.time)):
+            if name in self.shader:
+                self.set_uniform(name, value)
+
+    #
+    def render(self, camera):
+        self.update(camera)
+        self.vao.render(self.primitive, vertices=self.n_vertices)
 
 
 #
@@ -133,9 +779,7 @@ class AxesObj(BaseObject):
     
     #
     def update(self, camera):
-        self.shader['m_model'].write(self.m_model)
-        self.shader['m_view'].write(camera.m_view)
-        self.shader['m_proj'].write(camera.m_proj)
+        self.set_uniform('m_model', self.m_model)
 
 
 
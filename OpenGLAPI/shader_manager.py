@@ -1,31 +1,134 @@
 
+import time, string, glob, os
 import moderngl as mgl
 
 
+#
+class ProgramCache(dict):
+    # programs are compiled on first access, e.g. shader_manager.programs['axes']
+    def __init__(self, shader_manager):
+        super().__init__()
+        self.shader_manager = shader_manager
+
+    def __missing__(self, shader_name):
+        program = self.shader_manager.load_program(shader_name)
+        self[shader_name] = program
+        return program
+
+
 class ShaderManager(object):
+    # programs whose shader stages are not all named after the program
+    fragment_shader_names = {'func3D_texture' : 'func3D',
+                             'func3D_tiled' : 'func3D',
+                             'func3D_multiples' : 'func3D',
+                             'func3D_compact' : 'func3D_indexed',
+                             'func3D_expression' : 'func3D'}
+    camera_binding = 0      # uniform block binding of the 'Camera' block
+
     def __init__(self, ctx):
         self.ctx : mgl.Context = ctx
-        self.programs = {}
-        self.programs['func3D'] = self.load_program('func3D')
-        self.programs['axes'] = self.load_program('axes')
-        self.programs['debug'] = self.load_program('debug')
-    
-    def load_program(self, shader_name, geometry_shader=False):
+        self.programs = ProgramCache(self)
+        self.variants = {}          # programs with substitutions, see get_variant()
+        self.snippets = self.load_snippets()
+        self.compile_time = 0       # ns spent compiling programs so far
+        # std140 layout of the Camera block: m_proj, m_view, u_cam_pos (vec3, padded)
+        self.camera_ubo = self.ctx.buffer(reserve=144)
+        self.camera_ubo.bind_to_uniform_block(self.camera_binding)
+        self.camera_data = None
+        # last value written per (program, uniform), see set_uniform()
+        self.uniform_cache = {}
+        # instrumentation, counted per frame (see begin_frame())
+        self.counters = {'uniform writes' : 0, 'uniform skips' : 0, 'ubo writes' : 0, 
+                         'allocations' : 0}
+        self.frame_counters = dict(self.counters)
+
+    #
+    @staticmethod
+    def load_snippets():
+        # GLSL shared between shaders, shaders/<name>.glsl is inserted for $name
+        snippets = {}
+        for path in sorted(glob.glob('shaders/*.glsl')):
+            with open(path) as file:
+                snippets[os.path.splitext(os.path.basename(path))[0]] = file.read()
+        return snippets
+
+    #
+    def expand(self, source, substitutions=None):
+        # replaces the $name placeholders by the snippets and substitutions
+        return string.Template(source).substitute(self.snippets, **(substitutions or {}))
+
+    #
+    def load_program(self, shader_name, geometry_shader=False, fragment_shader_name=None,
+                     substitutions=None):
+        t0 = time.perf_counter_ns()
+        # the fragment shader may be shared with another program
+        if fragment_shader_name is None:
+            fragment_shader_name = self.fragment_shader_names.get(shader_name, shader_name)
         with open(f'shaders/{shader_name}.vert') as file:
-            vertex_shader = file.read()
-        with open(f'shaders/{shader_name}.frag') as file:
-            fragment_shader = file.read()
-        
+            # substitutions: $name placeholders of a variant, see get_variant()
+            vertex_shader = self.expand(file.read(), substitutions)
+        with open(f'shaders/{fragment_shader_name}.frag') as file:
+            fragment_shader = self.expand(file.read())
+
         if geometry_shader:
             with open(f'shaders/{shader_name}.geom') as file:
-                geometry_shader = file.read()
-            program = self.ctx.program(vertex_shader=vertex_shader, 
+                geometry_shader = self.expand(file.read())
+            program = self.ctx.program(vertex_shader=vertex_shader,
                                        geometry_shader=geometry_shader,
                                        fragment_shader=fragment_shader)
         else:
-            program = self.ctx.program(vertex_shader=vertex_shader, 
+            program = self.ctx.program(vertex_shader=vertex_shader,
                                        fragment_shader=fragment_shader)
 
         #print(program.__dict__)
-            
+        if 'Camera' in program:
+            program['Camera'].binding = self.camera_binding
+        self.compile_time += time.perf_counter_ns() - t0
+
         return program
+
+    #
+    def get_variant(self, shader_name, substitutions):
+        # Program of shader_name whose vertex shader has its $name placeholders replaced
+        # by substitutions[name] (e.g. an expression, see Func3DExpressionObj), compiled 
+        # once per distinct set of substitutions.
+        key = (shader_name, tuple(sorted(substitutions.items())))
+        if key not in self.variants:
+            self.variants[key] = self.load_program(shader_name, substitutions=substitutions)
+        return self.variants[key]
+
+    #
+    def begin_frame(self, camera):
+        # keeps the counters of the last frame, then writes the camera block (once)
+        self.frame_counters = dict(self.counters)
+        for name in self.counters:
+            self.counters[name] = 0
+        self.write_camera(camera)
+
+    #
+    def write_camera(self, camera):
+        data = camera.m_proj.to_bytes() + camera.m_view.to_bytes() + \
+               camera.position.to_bytes() + bytes(4)
+        self.counters['allocations'] += 1
+        if data != self.camera_data:
+            self.camera_ubo.write(data)
+            self.camera_data = data
+            self.counters['ubo writes'] += 1
+
+    #
+    def set_uniform(self, program, name, value):
+        # Writes a uniform unless the program already holds the value. value is a
+        # python bool/int/float or a glm type; glm values are copied into the cache.
+        key = (program.glo, name)
+        cached = self.uniform_cache.get(key)
+        if cached is not None and cached == value:
+            self.counters['uniform skips'] += 1
+            return
+        if isinstance(value, (bool, int, float)):
+            program[name].value = value
+        else:
+            program[name].write(value)
+            value = type(value)(value)
+            self.counters['allocations'] += 1
+        self.uniform_cache[key] = value
+        self.counters['uniform writes'] += 1
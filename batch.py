@@ -0,0 +1,91 @@
+#!/usr/bin/python3
+
+import os, sys, time, argparse
+import multiprocessing as mp
+#
+from settings import *
+
+# per worker process, see init_worker()
+worker_app = None
+
+
+#
+def init_worker(window_size, verbose):
+    # one headless app (and GL context) per worker, reused for all of its jobs
+    global worker_app
+    if not verbose:
+        sys.stdout = open(os.devnull, 'w')
+    from func3D import Func3D
+    worker_app = Func3D(window_size, headless=True)
+    # one-off renders, caching their meshes would only evict useful entries
+    worker_app.mesh_cache = None
+
+#
+def render_job(job):
+    # returns (path, out_path, error message or None)
+    from loaders import load_file
+    path, out_path, pose, loader_kwargs, kwargs = job
+    try:
+        worker_app.scene.clear()
+        worker_app.load_data(load_file(path, **loader_kwargs), **kwargs)
+        worker_app.render_image(out_path, pose)
+        return path, out_path, None
+    except Exception as e:
+        return path, out_path, f'{type(e).__name__}: {e}'
+
+#
+def render_batch(paths : list,                      # data files, any registered loader
+                 out_dir : str,
+                 pose : dict=None,                  # orbit camera pose, see OrbitCamera.set_pose()
+                 window_size : tuple=BATCH_WINDOW_SIZE,
+                 workers : int=BATCH_WORKERS,
+                 loader_kwargs : dict={},
+                 verbose : bool=False,
+                 **kwargs):                         # passed on to Func3D.load_data()
+    # Renders a '<name>.png' thumbnail per data file into out_dir, spreading the files
+    # over a pool of processes with a headless Func3D each. Returns a list of
+    # (path, out_path, error) tuples, where error is None on success.
+    kwargs.setdefault('max_resolution', BATCH_MAX_RESOLUTION)
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = []
+    for path in paths:
+        name = os.path.splitext(os.path.basename(path))[0]
+        jobs.append((path, os.path.join(out_dir, name + '.png'), pose, loader_kwargs, kwargs))
+    workers = min(workers or os.cpu_count(), max(len(jobs), 1))
+
+    t0 = time.perf_counter()
+    results = []
+    # spawn: GL drivers do not survive fork()
+    with mp.get_context('spawn').Pool(workers, initializer=init_worker,
+                                      initargs=(tuple(window_size), verbose)) as pool:
+        for result in pool.imap_unordered(render_job, jobs):
+            if result[2] is not None:
+                print(f'WARNING: could not render {result[0]}: {result[2]}')
+            results.append(result)
+    dt = time.perf_counter() - t0
+    n_ok = sum(1 for result in results if result[2] is None)
+    print(f'rendered {n_ok}/{len(jobs)} images in {dt:.1f} s with {workers} workers '
+          f'({3600.0 * n_ok / max(dt, EPSILON):.0f} images/hour).')
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='headless batch rendering of surfaces')
+    parser.add_argument('paths', nargs='+', help='data files')
+    parser.add_argument('-o', '--out-dir', default='./thumbnails')
+    parser.add_argument('-s', '--size', type=int, nargs=2, default=BATCH_WINDOW_SIZE,
+                        metavar=('W', 'H'))
+    parser.add_argument('-j', '--workers', type=int, default=BATCH_WORKERS)
+    parser.add_argument('--x-angle', type=float, default=None)
+    parser.add_argument('--y-angle', type=float, default=None)
+    parser.add_argument('--radius', type=float, default=None)
+    parser.add_argument('--max-resolution', type=int, default=BATCH_MAX_RESOLUTION)
+    parser.add_argument('--equal-axes', action='store_true')
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args()
+
+    pose = {'x_angle' : args.x_angle, 'y_angle' : args.y_angle, 'radius' : args.radius}
+    results = render_batch(args.paths, args.out_dir, pose, args.size, args.workers,
+                           verbose=args.verbose, equal_axes=args.equal_axes,
+                           max_resolution=args.max_resolution)
+    sys.exit(0 if all(result[2] is None for result in results) else 1)
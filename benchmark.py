@@ -0,0 +1,231 @@
+#!/usr/bin/python3
+
+import os, sys, io, time, json, argparse, platform, contextlib, tracemalloc
+import numpy as np
+#
+from settings import *
+
+
+#
+@contextlib.contextmanager
+def quiet():
+    # the mesh and object constructors report their progress on stdout
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+#
+def median_time(func, repeat):
+    # median wall time (ms) of repeat calls, and the last result
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter_ns()
+        result = func()
+        times.append(time.perf_counter_ns() - t0)
+    return float(np.median(times)) / 1e6, result
+
+#
+def get_test_data(nz, nx):
+    # smooth surface with some noise, the same for every run
+    x = np.linspace(-3.0, 3.0, nx)
+    z = np.linspace(-2.0, 2.0, nz)
+    y = np.sin(x[None, :]) * np.cos(1.5 * z[:, None])
+    y += 0.05 * np.random.default_rng(0).standard_normal((nz, nx))
+    return x, y, z
+
+#
+def get_vertex_bytes(nz, nx, indexed):
+    # size of the vertex (and index) data of a (nz, nx) grid
+    if indexed:
+        return nz * nx * 6 * 4 + (nz - 1) * (nx - 1) * 6 * 4
+    return (nz - 1) * (nx - 1) * 6 * 9 * 4
+
+#
+def get_case_name(nz, nx, equal_axes, indexed):
+    return f'mesh {nz}x{nx} {"indexed" if indexed else "unrolled"}' + \
+           (' equal_axes' if equal_axes and nz != nx else '')
+
+#
+def get_cases(sizes, max_bytes):
+    # (nz, nx, equal_axes, indexed), square grids once, non-square with and without
+    # equal_axes (which resamples them to square)
+    cases = []
+    for n in sizes:
+        for nz, nx, equal_axes in ((n, n, True), (n // 2, n, False), (n // 2, n, True)):
+            for indexed in (False, True):
+                m = max(nz, nx) if equal_axes else nz
+                if get_vertex_bytes(m, nx, indexed) > max_bytes:
+                    print(f'INFO: skipping {get_case_name(nz, nx, equal_axes, indexed)} '
+                          f'(vertex data over {max_bytes >> 20} MB)')
+                    continue
+                cases.append((nz, nx, equal_axes, indexed))
+    return cases
+
+#
+def bench_mesh(ctx, nz, nx, equal_axes, indexed, backend, repeat):
+    # mesh construction, normals alone, buffer upload and peak (python heap) memory
+    from OpenGLAPI.mesh import Func3DMesh
+    x, y, z = get_test_data(nz, nx)
+    build = lambda: Func3DMesh(x, y, z, equal_axes, backend=backend, indexed=indexed,
+                               max_resolution=None)
+    with quiet():
+        build_ms, mesh = median_time(build, repeat)
+    # the numba kernel computes positions and normals in one pass
+    y2d = mesh.y.reshape(mesh.nz, mesh.nx)
+    if mesh.get_backend() == 'numba':
+        from OpenGLAPI import mesh_kernels
+        normals = lambda: mesh_kernels.get_indexed_vertex_data(mesh.x, y2d, mesh.z)
+    else:
+        normals = lambda: Func3DMesh.get_grid_normals(mesh.x, y2d, mesh.z)
+    normals_ms, _ = median_time(normals, repeat)
+
+    #
+    def upload():
+        buffers = [ctx.buffer(mesh.vertex_data)]
+        if mesh.index_data is not None:
+            buffers.append(ctx.buffer(mesh.index_data))
+        ctx.finish()
+        for buffer in buffers:
+            buffer.release()
+    upload_ms, _ = median_time(upload, repeat)
+    upload_bytes = mesh.vertex_data.nbytes + (0 if mesh.index_data is None else
+                                              mesh.index_data.nbytes)
+    del mesh
+
+    # separate run, tracing slows down allocations
+    tracemalloc.start()
+    with quiet():
+        build()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'build_ms' : build_ms, 'normals_ms' : normals_ms, 'upload_ms' : upload_ms,
+            'upload_mb' : upload_bytes / 2**20, 'peak_mb' : peak / 2**20}
+
+#
+def bench_colormaps(ctx, repeat):
+    # lookup table load (from the on-disk cache after the first run) and texture upload
+    from OpenGLAPI.colormap import get_colormap_lut
+    results = {}
+    for name in COLORMAPS:
+        #
+        def load():
+            lut = get_colormap_lut.__wrapped__(name, COLORMAP_SIZE)
+            texture = ctx.texture((COLORMAP_SIZE, 1), 3, data=lut, dtype='f4')
+            ctx.finish()
+            texture.release()
+        with quiet():
+            load_ms, _ = median_time(load, repeat)
+        results[f'colormap {name}'] = {'load_ms' : load_ms}
+    return results
+
+#
+def bench_frames(sizes, window_size, max_bytes, n_frames, max_seconds):
+    # steady-state frame time of a square surface per layout, in a standalone context
+    from func3D import Func3D
+    with quiet():
+        app = Func3D(window_size, headless=True)
+    app.mesh_cache = None
+    results = {}
+    for n in sizes:
+        for layout in ('unrolled', 'indexed', 'texture'):
+            if layout != 'texture' and get_vertex_bytes(n, n, layout == 'indexed') > max_bytes:
+                continue
+            x, y, z = get_test_data(n, n)
+            with quiet():
+                app.scene.clear()
+                app.load_data(y, x, z, equal_axes=True, indexed=(layout == 'indexed'),
+                              as_texture=(layout == 'texture'), max_resolution=None)
+                # first frame compiles shaders and uploads the colormap
+                app.render()
+                app.ctx.finish()
+            times, t_end = [], time.perf_counter() + max_seconds
+            while len(times) < n_frames and (len(times) < 3 or time.perf_counter() < t_end):
+                t0 = time.perf_counter_ns()
+                app.render()
+                app.ctx.finish()
+                times.append(time.perf_counter_ns() - t0)
+            times = np.array(times) / 1e6
+            results[f'frame {n}x{n} {layout}'] = {'median_ms' : float(np.median(times)),
+                                                  'p95_ms' : float(np.percentile(times, 95)),
+                                                  'frames' : len(times)}
+            print(f'frame {n}x{n} {layout}: {np.median(times):.2f} ms')
+    app.scene.clear()
+    return results
+
+#
+def run_benchmarks(sizes : tuple=BENCH_SIZES,
+                   backend : str=MESH_BACKEND,
+                   repeat : int=BENCH_REPEAT,
+                   max_bytes : int=BENCH_MAX_BYTES,
+                   window_size : tuple=tuple(WIN_RES),
+                   n_frames : int=BENCH_FRAMES,
+                   frames : bool=True):
+    # Runs all benchmarks without a display, returns {'meta' : .., 'results' : ..},
+    # where results maps case names to {metric : value}.
+    import moderngl as mgl
+    ctx = mgl.create_standalone_context(require=330, backend=HEADLESS_BACKEND)
+    meta = {'date' : time.strftime('%Y-%m-%d %H:%M:%S'), 'platform' : platform.platform(),
+            'python' : platform.python_version(), 'numpy' : np.__version__,
+            'cpus' : os.cpu_count(), 'backend' : backend, 'renderer' : ctx.info['GL_RENDERER'],
+            'repeat' : repeat}
+    results = {}
+    for nz, nx, equal_axes, indexed in get_cases(sizes, max_bytes):
+        name = get_case_name(nz, nx, equal_axes, indexed)
+        results[name] = bench_mesh(ctx, nz, nx, equal_axes, indexed, backend, repeat)
+        r = results[name]
+        print(f'{name}: build {r["build_ms"]:.1f} ms, normals {r["normals_ms"]:.1f} ms, '
+              f'upload {r["upload_ms"]:.1f} ms, peak {r["peak_mb"]:.0f} MB')
+    results.update(bench_colormaps(ctx, repeat))
+    ctx.release()
+    if frames:
+        results.update(bench_frames(sizes, window_size, max_bytes, n_frames,
+                                    BENCH_FRAME_SECONDS))
+    return {'meta' : meta, 'results' : results}
+
+#
+def compare(results : dict, baseline : dict, threshold : float=BENCH_THRESHOLD,
+            noise_floor : float=BENCH_NOISE_FLOOR):
+    # Compares every metric present in both runs; larger values are worse for all of
+    # them. Returns a list of (case, metric, baseline, value) regressions.
+    regressions = []
+    for name, metrics in results['results'].items():
+        base_metrics = baseline['results'].get(name)
+        if base_metrics is None:
+            continue
+        for metric, value in metrics.items():
+            base = base_metrics.get(metric)
+            if base is None or metric == 'frames' or metric == 'upload_mb':
+                continue
+            change = (value - base) / max(base, EPSILON)
+            if change > threshold and value - base > noise_floor:
+                regressions.append((name, metric, base, value))
+                print(f'REGRESSION: {name} {metric}: {base:.2f} -> {value:.2f} '
+                      f'({100 * change:+.0f}%)')
+    n = len(regressions)
+    print(f'compared against baseline from {baseline["meta"]["date"]}: '
+          f'{n} regression{"" if n == 1 else "s"} (threshold {100 * threshold:.0f}%).')
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='mesh, upload and frame time benchmarks')
+    parser.add_argument('-o', '--out', default='benchmark.json', help='JSON results')
+    parser.add_argument('-b', '--baseline', default=None, help='JSON results to compare to')
+    parser.add_argument('-s', '--sizes', type=int, nargs='+', default=BENCH_SIZES)
+    parser.add_argument('-r', '--repeat', type=int, default=BENCH_REPEAT)
+    parser.add_argument('--backend', default=MESH_BACKEND)
+    parser.add_argument('--max-mb', type=int, default=BENCH_MAX_BYTES >> 20,
+                        help='skip layouts with more vertex data (MB)')
+    parser.add_argument('--frames', type=int, default=BENCH_FRAMES)
+    parser.add_argument('--no-frames', action='store_true', help='skip frame times')
+    parser.add_argument('--threshold', type=float, default=BENCH_THRESHOLD)
+    args = parser.parse_args()
+
+    results = run_benchmarks(tuple(args.sizes), args.backend, args.repeat, args.max_mb << 20,
+                             n_frames=args.frames, frames=not args.no_frames)
+    with open(args.out, 'w') as file:
+        json.dump(results, file, indent=2)
+    print(f'results written to {args.out}.')
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        sys.exit(1 if compare(results, baseline, args.threshold) else 0)
@@ -0,0 +1,162 @@
+
+import ast
+import numpy as np
+
+
+# function name -> (GLSL, numpy, number of arguments)
+FUNCTIONS = {'sin' : ('sin', 'np.sin', 1),
+             'cos' : ('cos', 'np.cos', 1),
+             'tan' : ('tan', 'np.tan', 1),
+             'asin' : ('asin', 'np.arcsin', 1),
+             'acos' : ('acos', 'np.arccos', 1),
+             'atan' : ('atan', 'np.arctan', 1),
+             'atan2' : ('atan', 'np.arctan2', 2),      # atan2(y, x)
+             'sinh' : ('sinh', 'np.sinh', 1),
+             'cosh' : ('cosh', 'np.cosh', 1),
+             'tanh' : ('tanh', 'np.tanh', 1),
+             'exp' : ('exp', 'np.exp', 1),
+             'log' : ('log', 'np.log', 1),
+             'log2' : ('log2', 'np.log2', 1),
+             'sqrt' : ('sqrt', 'np.sqrt', 1),
+             'abs' : ('abs', 'np.abs', 1),
+             'sign' : ('sign', 'np.sign', 1),
+             'floor' : ('floor', 'np.floor', 1),
+             'ceil' : ('ceil', 'np.ceil', 1),
+             'min' : ('min', 'np.minimum', 2),
+             'max' : ('max', 'np.maximum', 2),
+             'pow' : ('pow', 'np.power', 2),
+             'mod' : ('mod', 'np.mod', 2)}       # floored, the sign of the divisor
+CONSTANTS = {'pi' : np.pi, 'e' : np.e}
+VARIABLES = ('x', 'z', 't')
+
+
+#
+class Expression:
+    # A height function of x, z and the time t (seconds) in python syntax, e.g.
+    # 'sin(x) * cos(0.4*z + t)'. The source is parsed once and checked against the
+    # names, functions (see FUNCTIONS) and operators above; the same tree is then
+    # written out as GLSL (spliced into func3D_expression.vert) and as numpy code, so
+    # both evaluate the same function.
+    binary_ops = {ast.Add : '+', ast.Sub : '-', ast.Mult : '*', ast.Div : '/'}
+
+    def __init__(self, source : str):
+        self.source = source.strip()
+        try:
+            self.tree = ast.parse(self.source, mode='eval').body
+        except SyntaxError as error:
+            raise ValueError(f'invalid expression {source!r}: {error.msg}') from None
+        self.names = set()      # variables used
+        self.glsl = self.to_glsl(self.tree)
+        self.numpy_source = self.to_numpy(self.tree)
+        self.code = compile(self.numpy_source, '<expression>', 'eval')
+        # time-dependent, redrawn every frame
+        self.animated = 't' in self.names
+
+    #
+    def __repr__(self):
+        return f'Expression({self.source!r})'
+
+    #
+    def error(self, node, message):
+        raise ValueError(f'{message} in expression {self.source!r} (column '
+                         f'{node.col_offset + 1})')
+
+    #
+    def get_constant(self, node):
+        # number literal (possibly negated) or None
+        sign = 1.0
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            sign = -1.0 if isinstance(node.op, ast.USub) else 1.0
+            node = node.operand
+        if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+            return sign * float(node.value)
+        return None
+
+    #
+    def to_glsl(self, node):
+        if isinstance(node, ast.Constant):
+            value = self.get_constant(node)
+            if value is None or not np.isfinite(value):
+                self.error(node, f'unsupported constant {node.value!r}')
+            return repr(value)      # always has a '.' or an exponent
+        if isinstance(node, ast.Name):
+            if node.id in CONSTANTS:
+                return repr(CONSTANTS[node.id])
+            if node.id not in VARIABLES:
+                self.error(node, f'unknown name {node.id!r} (variables are x, z and t)')
+            self.names.add(node.id)
+            return node.id
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            sign = '-' if isinstance(node.op, ast.USub) else '+'
+            return f'({sign}{self.to_glsl(node.operand)})'
+        if isinstance(node, ast.BinOp):
+            a = self.to_glsl(node.left)
+            if isinstance(node.op, ast.Pow):
+                return self.get_glsl_power(a, node.right)
+            b = self.to_glsl(node.right)
+            if isinstance(node.op, ast.Mod):
+                return f'mod({a}, {b})'
+            if type(node.op) not in self.binary_ops:
+                hint = ' (use ** for powers)' if isinstance(node.op, ast.BitXor) else ''
+                self.error(node, f'unsupported operator{hint}')
+            return f'({a} {self.binary_ops[type(node.op)]} {b})'
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS:
+                self.error(node, 'unknown function')
+            name, _, n_args = FUNCTIONS[node.func.id]
+            if len(node.args) != n_args or node.keywords:
+                self.error(node, f'{node.func.id}() takes {n_args} argument'
+                                 f'{"" if n_args == 1 else "s"}')
+            if node.func.id == 'pow':
+                return self.get_glsl_power(self.to_glsl(node.args[0]), node.args[1])
+            return f'{name}({", ".join(self.to_glsl(arg) for arg in node.args)})'
+        self.error(node, f'unsupported syntax ({type(node).__name__})')
+
+    #
+    def get_glsl_power(self, a, exponent):
+        # a ** exponent and pow(a, exponent): GLSL pow() is undefined for negative bases,
+        # integer powers are written out (small ones as products)
+        n = self.get_constant(exponent)
+        if n is None or not n.is_integer():
+            return f'pow({a}, {self.to_glsl(exponent)})'
+        n = int(n)
+        if n == 0:
+            return '1.0'
+        if abs(n) <= 4:
+            power = '(' + ' * '.join([a] * abs(n)) + ')'
+        else:
+            power = f'pow(abs({a}), {float(abs(n))!r})'
+            if abs(n) % 2 == 1:
+                power = f'(sign({a}) * {power})'
+        return power if n > 0 else f'(1.0 / {power})'
+
+    #
+    def to_numpy(self, node):
+        # called after to_glsl(), which has validated the tree
+        if isinstance(node, ast.Constant):
+            return repr(float(node.value))
+        if isinstance(node, ast.Name):
+            return repr(CONSTANTS[node.id]) if node.id in CONSTANTS else node.id
+        if isinstance(node, ast.UnaryOp):
+            sign = '-' if isinstance(node.op, ast.USub) else '+'
+            return f'({sign}{self.to_numpy(node.operand)})'
+        if isinstance(node, ast.BinOp):
+            a, b = self.to_numpy(node.left), self.to_numpy(node.right)
+            if isinstance(node.op, ast.Pow):
+                return f'np.power({a}, {b})'
+            if isinstance(node.op, ast.Mod):
+                return f'np.mod({a}, {b})'
+            return f'({a} {self.binary_ops[type(node.op)]} {b})'
+        # ast.Call
+        name = FUNCTIONS[node.func.id][1]
+        return f'{name}({", ".join(self.to_numpy(arg) for arg in node.args)})'
+
+    #
+    def evaluate(self, x, z, t=0.0):
+        # vectorized, x and z broadcast against each other (e.g. x[None, :], z[:, None]),
+        # invalid values give nan as on the GPU
+        with np.errstate(all='ignore'):
+            y = eval(self.code, {'__builtins__' : {}, 'np' : np},
+                     {'x' : np.asarray(x, dtype='f8'), 'z' : np.asarray(z, dtype='f8'),
+                      't' : float(t)})
+        return np.broadcast_to(y, np.broadcast_shapes(np.shape(x), np.shape(z)))
@@ -1,6 +1,7 @@
 #!/usr/bin/python3
 
 import os, time, sys
+start_time = time.perf_counter_ns()     # for the startup breakdown, see Func3D.run()
 os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = 'hide'   # hide pygame welcome message
 import pygame as pg
 import moderngl as mgl
@@ -10,26 +11,50 @@ from settings import *
 from OpenGLAPI.shader_manager import ShaderManager
 from OpenGLAPI.camera import OrbitCamera, PerspectiveCamera
 from scene import Scene
+from mesh_cache import MeshCache
+from loaders import load_file, load_array, load_text, load_image
+from mesh_builder import BackgroundMeshBuilder
+from profiler import FrameProfiler, load_camera_path, get_camera_path_poses
+from OpenGLAPI.hud import TextOverlay
+from picking import Picker
+import_time = time.perf_counter_ns() - start_time
 
 
 #
 class Func3D:
-    def __init__(self, window_size=WIN_RES):
+    def __init__(self, window_size=WIN_RES, headless=False):
         t0 = time.perf_counter_ns()
-        self.window_size = window_size
-        # init PyGame and set OpenGL attributes
-        pg.init()
-        pg.display.gl_set_attribute(pg.GL_CONTEXT_MAJOR_VERSION, 3)
-        pg.display.gl_set_attribute(pg.GL_CONTEXT_MINOR_VERSION, 3)
-        pg.display.gl_set_attribute(pg.GL_CONTEXT_PROFILE_MASK, pg.GL_CONTEXT_PROFILE_CORE)
-        pg.display.gl_set_attribute(pg.GL_DEPTH_SIZE, 24)
-        self.surface = pg.display.set_mode(WIN_RES, flags=pg.OPENGL | pg.DOUBLEBUF)
-        
-        # OpenGL context and settings
-        self.ctx = mgl.create_context()
+        # startup phases (ns), shaders are compiled and meshes built on first use
+        self.startup_times = {'imports' : import_time, 'context' : 0, 'shaders' : 0,
+                              'mesh build' : 0, 'upload' : 0, 'first frame' : 0}
+        self.window_size = tuple(window_size)
+        self.headless = headless    # no window, render into an offscreen framebuffer
+        if self.headless:
+            # standalone context (EGL, i.e. GPU or software rendering without a display)
+            self.surface = None
+            self.ctx = mgl.create_standalone_context(require=330, backend=HEADLESS_BACKEND)
+            self.fbo = self.ctx.framebuffer(
+                color_attachments=[self.ctx.renderbuffer(self.window_size)],
+                depth_attachment=self.ctx.depth_renderbuffer(self.window_size))
+            self.fbo.use()
+        else:
+            # init PyGame and set OpenGL attributes
+            pg.init()
+            pg.display.gl_set_attribute(pg.GL_CONTEXT_MAJOR_VERSION, 3)
+            pg.display.gl_set_attribute(pg.GL_CONTEXT_MINOR_VERSION, 3)
+            pg.display.gl_set_attribute(pg.GL_CONTEXT_PROFILE_MASK, pg.GL_CONTEXT_PROFILE_CORE)
+            pg.display.gl_set_attribute(pg.GL_DEPTH_SIZE, 24)
+            self.surface = pg.display.set_mode(self.window_size, 
+                                               flags=pg.OPENGL | pg.DOUBLEBUF)
+            self.fbo = None
+            # OpenGL context
+            self.ctx = mgl.create_context()
+
+        # OpenGL settings
         self.ctx.enable(flags=mgl.DEPTH_TEST | mgl.CULL_FACE | mgl.BLEND)
         self.ctx.blend_func = mgl.SRC_ALPHA, mgl.ONE_MINUS_SRC_ALPHA
         self.ctx.gc_mode = 'auto'
+        self.startup_times['context'] = time.perf_counter_ns() - t0
 
         # framerate-related
         self.clock = pg.time.Clock()
@@ -37,21 +62,81 @@ class Func3D:
         self.time = 0
         self.fps = 0
         self.frame_count = 0
+        self.caption_time = 0
+        self.render_on_demand = RENDER_ON_DEMAND
+        self.fps_cap = FPS_CAP
+        self.dirty = True           # app-level changes (camera, events), see needs_render()
 
-        pg.event.set_grab(True)
-        pg.mouse.set_visible(False)
+        if not self.headless:
+            pg.event.set_grab(True)
+            pg.mouse.set_visible(False)
         self.mousewheel_event :pg.event = None
+        self.update_callback = None     # called with the app once per frame, if set
         
         self.is_running = True
         self.is_loaded = False
         
         self.on_init()
         
-        print(f'Core modules initialized in {(time.perf_counter_ns() - t0)/1e6} ms.')
+        print(f'Core modules initialized in {(time.perf_counter_ns() - t0)/1e6} ms '
+              f'(imports {import_time/1e6:.1f} ms, '
+              f'context {self.startup_times["context"]/1e6:.1f} ms).')
     
+    # loading options: each creates the app and loads the data, keyword arguments are 
+    # passed on to load_data()
+    @classmethod
+    def from_array(cls, data : np.ndarray, window_size=WIN_RES, **kwargs):
+        app = cls(window_size)
+        app.load_data(data, **kwargs)
+        return app
+
+    #
+    @classmethod
+    def from_file(cls, path : str, loader_kwargs : dict={}, window_size=WIN_RES, **kwargs):
+        # any file type with a registered loader (see loaders.LOADERS)
+        return cls.from_array(load_file(path, **loader_kwargs), window_size, **kwargs)
+
+    #
+    @classmethod
+    def from_text(cls, path : str, window_size=WIN_RES, **kwargs):
+        return cls.from_array(load_text(path), window_size, **kwargs)
+
+    #
+    @classmethod
+    def from_npy(cls, path : str, window_size=WIN_RES, **kwargs):
+        return cls.from_array(load_array(path), window_size, **kwargs)
+
+    #
+    @classmethod
+    def from_raw(cls, path : str, shape : tuple, dtype : str='f4', window_size=WIN_RES, 
+                 **kwargs):
+        return cls.from_array(load_array(path, shape, dtype), window_size, **kwargs)
+
+    #
+    @classmethod
+    def from_image(cls, path : str, window_size=WIN_RES, **kwargs):
+        return cls.from_array(load_image(path), window_size, **kwargs)
+
+    #
+    @classmethod
+    def from_expression(cls, expression : str, domain : tuple, window_size=WIN_RES, **kwargs):
+        # e.g. Func3D.from_expression('sin(x) * cos(0.4*z + t)', ((-6, 6), (-10, 10))),
+        # keyword arguments are passed on to load_expression()
+        app = cls(window_size)
+        app.load_expression(expression, domain, **kwargs)
+        return app
+
     #
     def on_init(self):
         self.shader_manager = ShaderManager(self.ctx)
+        self.mesh_cache = MeshCache() if MESH_CACHE else None
+        self.mesh_builder = BackgroundMeshBuilder()
+        self.profiler = FrameProfiler(self.ctx)
+        self.hud = None                         # profiler overlay, created on first use
+        self.picker = Picker(self)
+        self.picking = False                    # cursor released, values read under it
+        self.tooltip = None                     # value readout, created on first use
+        self.pick_pos = None                    # cursor moved while picking
         self.camera_orbit = OrbitCamera(self, position=(-3.6, 0.5, -4.4), x_angle=230, 
                                         y_angle=85)
         self.camera_perspective = PerspectiveCamera(self, x_angle=0, y_angle=0)
@@ -66,21 +151,168 @@ class Func3D:
                   y : np.ndarray =np.array(None), 
                   equal_axes : bool=True,   # if true, the data array is shrunk to 
                                             # (m x m), where m is min(dim(x), dim(y))
-                  func_id : str=None):
+                  func_id : str=None,
+                  indexed : bool=MESH_INDEXED,    # upload one vertex per grid point + IBO
+                  compact : bool=MESH_COMPACT,    # 12 byte vertices (quantized x/z, normal)
+                  as_texture : bool=False,        # upload data as a height texture
+                  tiled : bool=False,             # as_texture, with LOD tiles and culling
+                  stream : bool=None,             # read data in bands (as_texture), 
+                                                  # default for memory-mapped data over
+                                                  # STREAM_MEMORY_BUDGET bytes
+                  max_resolution : int=MESH_MAX_RESOLUTION,   # decimate larger data
+                  height_format : str=HEIGHT_FORMAT,  # 'f4', 'f2' or 'u2' (as_texture)
+                  background : bool=False):       # build the mesh in a worker thread, 
+                                                  # the current surface is shown meanwhile
+        t0 = time.perf_counter_ns()
+        if stream is None:
+            stream = isinstance(data, np.memmap) and data.nbytes > STREAM_MEMORY_BUDGET
+        if stream:
+            equal_axes, indexed, compact, max_resolution = self.get_stream_options(
+                data, equal_axes, indexed, compact, max_resolution)
+        elif isinstance(data, np.memmap):
+            # small enough to be read at once
+            data = np.array(data)
+        as_texture = as_texture or tiled or stream
+        if background:
+            # replaces the current surface (unless func_id is given) once built, a newer 
+            # load for the same surface cancels this one
+            if func_id is None:
+                func_id = self.func3D_obj_id or 'func' + str(self.scene.object_count)
+            def build(progress):
+                return self.scene.build_mesh(x, data, y, equal_axes, indexed, as_texture, 
+                                             stream, max_resolution, progress, compact,
+                                             height_format)
+            def on_done(mesh, build_time):
+                self.add_surface(x, data, y, equal_axes, func_id, indexed, as_texture, tiled,
+                                 stream, max_resolution, mesh, compact, height_format)
+                self.startup_times['mesh build'] += build_time
+                print(f'Mesh {func_id} built in the background in {build_time/1e6} ms.')
+            self.mesh_builder.submit(func_id, build, on_done)
+            self.is_loaded = True
+            return
+        self.add_surface(x, data, y, equal_axes, func_id, indexed, as_texture, tiled, stream,
+                         max_resolution, compact=compact, height_format=height_format)
+        cache_info = ''
+        if self.mesh_cache is not None:
+            cache_info = f' (mesh cache: {self.mesh_cache.hits} hits, ' \
+                         f'{self.mesh_cache.misses} misses)'
+        print(f'Meshes created in {(time.perf_counter_ns() - t0)/1e6} ms{cache_info}.')
+    
+    #
+    @staticmethod
+    def get_stream_options(data, equal_axes, indexed, compact, max_resolution):
+        # streamed data is uploaded as a height texture in bands, as is: options needing
+        # the whole array (or vertex buffers) are turned off
+        if equal_axes and data.shape[0] != data.shape[1]:
+            print(f'WARNING: streamed data {data.shape} cannot be interpolated to equal '
+                  f'axes, using equal_axes=False.')
+            equal_axes = False
+        for name, value in (('indexed', indexed), ('compact', compact)):
+            if value:
+                print(f'WARNING: {name}=True does not apply to streamed data (height '
+                      f'texture), ignored.')
+        if max_resolution is not None:
+            print(f'WARNING: streamed data is not decimated, max_resolution '
+                  f'{max_resolution} ignored.')
+        return equal_axes, False, False, None
+
+    #
+    def add_surface(self, x, data, y, equal_axes, func_id, indexed, as_texture, tiled, stream,
+                    max_resolution, mesh=None, compact=False, height_format=HEIGHT_FORMAT):
+        # creates (or replaces) the surface and its axes, on the main thread
+        if as_texture:
+            self.func3D_obj_id = self.scene.add_texture_data(x, data, y, equal_axes, func_id,
+                                                             tiled, stream, max_resolution,
+                                                             mesh, height_format)
+        else:
+            self.func3D_obj_id = self.scene.add_data(x, data, y, equal_axes, func_id, indexed,
+                                                     max_resolution, mesh, compact)
+        self.scene.add_axes(self.func3D_obj_id)
+        func3D_obj = self.scene.objects[self.func3D_obj_id]
+        self.startup_times['mesh build'] += func3D_obj.build_time
+        self.startup_times['upload'] += func3D_obj.upload_time
+        self.is_loaded = True
+
+    #
+    def load_expression(self,
+                        expression : str,       # of x, z and the time t (seconds), see 
+                                                # expression.Expression
+                        domain : tuple,         # ((x0, x1), (z0, z1))
+                        resolution=EXPRESSION_RESOLUTION,   # grid points along the 
+                                                            # longest axis, or (nx, nz)
+                        equal_axes : bool=True,
+                        func_id : str=None):
+        # Surface computed in the vertex shader every frame, so expressions of t are 
+        # animated without rebuilding or uploading anything.
         t0 = time.perf_counter_ns()
-        self.func3D_obj_id = self.scene.add_data(x, data, y, equal_axes, func_id)
+        self.func3D_obj_id = self.scene.add_expression(expression, domain, resolution,
+                                                       equal_axes, func_id)
         self.scene.add_axes(self.func3D_obj_id)
+        self.startup_times['mesh build'] += self.scene.objects[self.func3D_obj_id].build_time
         self.is_loaded = True
         print(f'Meshes created in {(time.perf_counter_ns() - t0)/1e6} ms.')
-    
+
     #
-    def handle_events(self):
+    def load_multiples(self,
+                       data : np.ndarray,         # (surfaces, nz, nx), e.g. one per channel
+                       x : np.ndarray =np.array(None),
+                       y : np.ndarray =np.array(None),
+                       equal_axes : bool=False,
+                       func_id : str=None,
+                       rows : int=None,           # layout, see Scene.set_layout()
+                       cols : int=None,
+                       spacing : float=MULTIPLES_SPACING,
+                       height_format : str=HEIGHT_FORMAT):
+        # small multiples of same-shaped surfaces, all drawn in a single instanced call
+        t0 = time.perf_counter_ns()
+        self.func3D_obj_id = self.scene.add_multiples(x, data, y, equal_axes, func_id, rows,
+                                                      cols, spacing, height_format)
+        func3D_obj = self.scene.objects[self.func3D_obj_id]
+        self.startup_times['mesh build'] += func3D_obj.build_time
+        self.startup_times['upload'] += func3D_obj.upload_time
+        self.is_loaded = True
+        print(f'Meshes created in {(time.perf_counter_ns() - t0)/1e6} ms.')
+
+    #
+    def append_rows(self, rows, func_id : str=None):
+        # scroll new rows into a surface loaded with as_texture=True
+        if func_id is None:
+            func_id = self.func3D_obj_id
+        obj = self.scene.objects[func_id]
+        if not hasattr(obj, 'append_rows'):
+            raise ValueError(f"cannot append rows to '{func_id}' ({type(obj).__name__}), load "
+                             f'it with as_texture=True')
+        ylim = obj.mesh.ylim
+        obj.append_rows(rows)
+        if obj.mesh.ylim != ylim and func_id == self.func3D_obj_id:
+            # the height range was widened
+            self.scene.add_axes(func_id)
+
+    #
+    def update_region(self, i0 : int, j0 : int, patch : np.ndarray, func_id : str=None):
+        # replace the data of rows i0:i0+m, columns j0:j0+n by the (m x n) patch, at a
+        # cost proportional to the patch size
+        if func_id is None:
+            func_id = self.func3D_obj_id
+        return self.scene.objects[func_id].update_region(i0, j0, patch)
+
+    #
+    def handle_events(self, events=[]):
+        # events: already taken from the queue (by pg.event.wait())
         self.mousewheel_event = None
-        for event in pg.event.get():
+        for event in events + pg.event.get():
+            # mouse motion only matters if it moves the camera, see update()
+            if event.type not in (pg.MOUSEMOTION, pg.NOEVENT):
+                self.dirty = True
             if event.type == pg.QUIT: 
                 self.is_running = False
             elif event.type == pg.MOUSEWHEEL:
                 self.mousewheel_event = event
+            elif event.type == pg.MOUSEMOTION and self.picking:
+                self.pick_pos = event.pos       # picked once per frame, see update()
+            elif event.type == pg.MOUSEBUTTONDOWN and self.picking and event.button == 1:
+                result = self.pick(event.pos)
+                print('pick: ' + ('nothing' if result is None else Picker.format(result)))
             elif event.type == pg.KEYDOWN:
                 if event.key == pg.K_ESCAPE:
                     self.is_running = False
@@ -93,6 +325,28 @@ class Func3D:
                     self.scene.objects[self.func3D_obj_id].toggle_wireframe()
                 if event.key == pg.K_F4:
                     self.scene.objects[self.func3D_obj_id].toggle_lights()
+                # colormap: cycle, range (shift: vmin, else vmax) and gamma
+                if event.key == pg.K_F5:
+                    self.scene.objects[self.func3D_obj_id].cycle_colormap()
+                if event.key in (pg.K_F6, pg.K_F7):
+                    d = 0.05 if event.key == pg.K_F7 else -0.05
+                    if event.mod & pg.KMOD_SHIFT:
+                        self.scene.objects[self.func3D_obj_id].adjust_range(dmin=d)
+                    else:
+                        self.scene.objects[self.func3D_obj_id].adjust_range(dmax=d)
+                if event.key == pg.K_F8:
+                    self.scene.objects[self.func3D_obj_id].adjust_gamma(1.0 / 1.25)
+                if event.key == pg.K_F9:
+                    self.scene.objects[self.func3D_obj_id].adjust_gamma(1.25)
+                # profiler overlay, and export of the profiled frames
+                if event.key == pg.K_F10:
+                    self.toggle_hud()
+                if event.key == pg.K_F11:
+                    self.profiler.export_csv('./profile.csv')
+                    self.profiler.export_trace('./profile_trace.json')
+                # value readout under the cursor (the camera holds still meanwhile)
+                if event.key == pg.K_p:
+                    self.toggle_picking()
                 # DEBUG : camera state
                 if event.key == pg.K_c:
                     self.camera.print_state_debug()
@@ -109,32 +363,234 @@ class Func3D:
                     #self.camera.print_state_debug()
                     self.camera_orbit_current = not self.camera_orbit_current
     #
+    def toggle_hud(self):
+        # frame profiler percentiles drawn over the scene, profiling while shown
+        if self.hud is None:
+            self.hud = TextOverlay(self)
+            self.hud.visible = False
+        self.hud.visible = not self.hud.visible
+        self.profiler.enabled = self.hud.visible or PROFILER_ENABLED
+        if self.hud.visible:
+            self.update_hud()
+
+    #
+    def update_hud(self):
+        # redraws (on demand) when the text changed
+        rows = [f'{self.fps:.1f} fps, frame {self.profiler.frame_index}']
+        if self.hud.set_text(rows + self.profiler.get_rows()):
+            self.dirty = True
+
+    #
+    def pick(self, pos : tuple, func_id : str=None):
+        # (x, z, value) of the surface under the pixel pos (top left origin), see 
+        # Picker.pick(); None if the pixel misses the surface
+        if func_id is None:
+            func_id = self.func3D_obj_id
+        obj = self.scene.objects[func_id]
+        if not obj.pickable:
+            print(f'WARNING: picking is not supported on {type(obj).__name__}')
+            return None
+        return self.picker.pick(pos, obj)
+
+    #
+    def toggle_picking(self):
+        # releases the mouse from the camera and shows the value under the cursor
+        obj = self.scene.objects.get(self.func3D_obj_id)
+        if not self.picking and obj is not None and not obj.pickable:
+            print(f'WARNING: picking is not supported on {type(obj).__name__}')
+            return
+        self.picking = not self.picking
+        if not self.headless:
+            pg.event.set_grab(not self.picking)
+            pg.mouse.set_visible(self.picking)
+            pg.mouse.get_rel()      # motion while picking does not move the camera
+        if self.tooltip is None:
+            self.tooltip = TextOverlay(self)
+        self.tooltip.visible = False
+        if self.picking and not self.headless:
+            self.update_tooltip(pg.mouse.get_pos())
+
+    #
+    def update_tooltip(self, pos):
+        result = self.pick(pos)
+        self.tooltip.visible = result is not None
+        if result is not None:
+            self.tooltip.set_text([Picker.format(result)])
+            (w, h), (W, H) = self.tooltip.texture.size, self.window_size
+            (dx, dy) = PICK_TOOLTIP_OFFSET
+            # next to the cursor, kept inside the window
+            self.tooltip.position = (min(pos[0] + dx, W - w), min(pos[1] + dy, H - h))
+        self.dirty = True
+
+    #
     def update(self):
-        self.camera.update()
+        m_view = glm.mat4(self.camera.m_view)
+        if not self.picking and not self.headless:
+            # no input devices when headless, the camera is posed with set_pose()
+            self.camera.update()
+        elif self.picking and self.pick_pos is not None:
+            self.update_tooltip(self.pick_pos)
+            self.pick_pos = None
+        if self.camera.m_view != m_view:
+            self.dirty = True
+        # swap in surfaces built in the background (at a frame boundary)
+        self.mesh_builder.poll()
+        if self.update_callback is not None:
+            self.update_callback(self)
     
+    #
+    def needs_render(self):
+        return not self.render_on_demand or self.dirty or self.scene.is_dirty()
+
     #
     def render(self):
         self.ctx.clear(color=BG_COLOR)
         self.scene.render(self.camera)
-        pg.display.flip()
+        if self.hud is not None:
+            self.hud.render()
+        if self.tooltip is not None:
+            self.tooltip.render()
+        self.dirty = False
+        if not self.headless:
+            pg.display.flip()
+
+    #
+    def read_image(self):
+        # (h, w, 3) uint8 RGB of the last rendered frame, top row first
+        fbo = self.fbo if self.headless else self.ctx.screen
+        data = np.frombuffer(fbo.read(viewport=(0, 0, *self.window_size), components=3), 
+                             dtype='u1')
+        return np.flipud(data.reshape(self.window_size[1], self.window_size[0], 3))
+
+    #
+    def render_image(self, path : str, pose : dict=None):
+        # Renders a single frame and saves it (PNG, or any format pygame can write). 
+        # pose sets the orbit camera: {'x_angle' : .., 'y_angle' : .., 'radius' : ..}.
+        if pose is not None:
+            self.camera.set_pose(**pose)
+        # swap in surfaces built in the background (update() is not called by scripts)
+        self.mesh_builder.poll()
+        self.render()
+        image = np.ascontiguousarray(self.read_image())
+        pg.image.save(pg.image.frombuffer(image.tobytes(), self.window_size, 'RGB'), path)
     
     #
     def run(self):
         if not self.is_loaded:
             self.shutdown(error_msg='no data loaded')
             
+        first_frame = True
+        idle = False
         while self.is_running:
-            self.handle_events()
+            # Nothing changed in the last iteration: sleep until an event arrives (or
+            # the update callback is due). Held keys keep changing the camera, so the
+            # loop only waits once they are released.
+            events = []
+            if idle:
+                busy = self.update_callback is not None or self.mesh_builder.is_busy()
+                timeout = CALLBACK_INTERVAL if busy else IDLE_TIMEOUT
+                events = [pg.event.wait(timeout)]
+                self.clock.tick()       # idle time does not count as frame time
+            t0 = time.perf_counter_ns()
+            self.profiler.begin_frame()
+            self.handle_events(events)
+            self.profiler.mark('events')
             self.update()
+            self.update_caption()
+            self.profiler.mark('update')
+            idle = not self.needs_render()
+            if idle:
+                self.profiler.cancel_frame()
+                continue
             self.render()
+            self.profiler.mark('render')
+            self.profiler.end_frame()
+            self.frame_count += 1
+            if first_frame:
+                self.startup_times['first frame'] = time.perf_counter_ns() - t0
+                self.print_startup_times()
+                first_frame = False
 
-            #
-            self.dt = self.clock.tick()
+            # dt is the duration of the last rendered frame (camera speeds depend on it)
+            self.dt = max(self.clock.tick(self.fps_cap), 1)
             self.fps = 1000.0 / self.dt
-            pg.display.set_caption(f'{self.fps:.2f} fps')
+            self.time += self.dt
+        self.mesh_builder.shutdown()
+
+    #
+    def update_caption(self):
+        # fps and the progress of background builds, at most every CAPTION_INTERVAL ms
+        ticks = pg.time.get_ticks()
+        if self.headless or ticks - self.caption_time < CAPTION_INTERVAL:
+            return
+        self.caption_time = ticks
+        if self.hud is not None and self.hud.visible:
+            self.update_hud()
+        caption = f'{self.fps:.2f} fps'
+        for key, fraction, stage in self.mesh_builder.get_progress():
+            caption += f' | building {key}: {100.0 * fraction:.0f}% ({stage})'
+        pg.display.set_caption(caption)
+
+    #
+    def replay(self, 
+               camera_path,                                 # keyframes, or a JSON file
+               frames_per_key : int=PROFILER_REPLAY_FRAMES,
+               warmup : int=PROFILER_REPLAY_WARMUP):
+        # Renders an orbit camera path with the profiler on and a fixed time step, so 
+        # runs can be compared (see profiler.load_camera_path() for the format). Every 
+        # pose is rendered, the on-demand loop is bypassed. Returns the profiler stats.
+        if isinstance(camera_path, str):
+            camera_path, file_frames = load_camera_path(camera_path)
+            frames_per_key = file_frames or frames_per_key
+        if not self.camera_orbit_current:
+            self.camera = self.camera_orbit
+            self.camera.copy_state(self.camera_perspective)
+            self.camera_orbit_current = True
+        start_pose = {'x_angle' : self.camera.x_angle, 'y_angle' : self.camera.y_angle,
+                      'radius' : self.camera.radius}
+        poses = get_camera_path_poses(camera_path, frames_per_key, start_pose)
+        enabled, self.profiler.enabled = self.profiler.enabled, True
+        self.dt = PROFILER_REPLAY_DT
+        for i, pose in enumerate([poses[0]] * warmup + poses):
+            if i == warmup:
+                self.profiler.reset()
+            self.profiler.begin_frame()
+            if not self.headless:
+                self.handle_events()
+                if not self.is_running:
+                    break
+            self.profiler.mark('events')
+            self.mesh_builder.poll()
+            if self.update_callback is not None:
+                self.update_callback(self)
+            self.camera.set_pose(**pose)
+            self.profiler.mark('update')
+            self.render()
+            self.time += self.dt    # animated surfaces advance by the fixed step too
+            if self.headless:
+                # nothing else throttles offscreen frames
+                self.ctx.finish()
+            self.profiler.mark('render')
+            self.profiler.end_frame()
+        self.profiler.flush()
+        self.profiler.enabled = enabled
+        stats = self.profiler.get_stats()
+        print(f'replayed {len(poses)} frames:')
+        print('\n'.join(self.profiler.get_summary()))
+        return stats
+
+    #
+    def print_startup_times(self):
+        # per-phase breakdown of the time from the first import to the first frame
+        self.startup_times['shaders'] = self.shader_manager.compile_time
+        total = time.perf_counter_ns() - start_time
+        phases = ', '.join(f'{name} {t/1e6:.1f} ms' for name, t in self.startup_times.items())
+        other = total - sum(self.startup_times.values())
+        print(f'Startup: {phases}, other {other/1e6:.1f} ms (total {total/1e6:.1f} ms).')
 
     #
     def shutdown(self, error_msg=None):
+        self.mesh_builder.shutdown()
         pg.quit()
         if error_msg is not None:
             raise Exception(error_msg)
@@ -147,22 +603,15 @@ if __name__ == '__main__':
     #
     app = Func3D()
 
-    #examples = ['mp3', 'sine_func', 'eeg', 'essw']
+    #examples = ['mp3', 'mp3_live', 'sine_func', 'sine_expression', 'eeg', 'essw']
     ex = 'essw'
     
     # -----------------------------------------------------------------------------------
     # use spectrum from ~/source/misc/music_visualizer (fft on music)
     # -----------------------------------------------------------------------------------
     if ex == 'mp3':
-        with open('./data/mp3_spectrum.txt') as f:
-            data = f.read()
-        data = data.split('\n')[2:-2] # skip file headers etc
         # list in the form of 'step: x y z w ...'
-        freqs = []
-        for row in data:
-            step = [float(val) for val in row.split(' ') if val != 'step:']
-            freqs.append(step)
-        freqs = np.array(freqs, dtype=np.float32)
+        freqs = load_text('./data/mp3_spectrum.txt')
         # remove data when FFT buffer not full
         freqs = freqs[40:,:]
         print(freqs.shape)
@@ -180,6 +629,22 @@ if __name__ == '__main__':
                       equal_axes=False, 
                       func_id='mp3')
 
+    # -----------------------------------------------------------------------------------
+    # same spectrum, scrolled in one FFT frame per rendered frame
+    # -----------------------------------------------------------------------------------
+    elif ex == 'mp3_live':
+        freqs = load_text('./data/mp3_spectrum.txt')[40:,:]
+        history = 150
+        app.load_data(freqs[:history],
+                      equal_axes=False,
+                      func_id='mp3_live',
+                      as_texture=True)
+        
+        def feed_frame(app, step=[history]):
+            app.append_rows(freqs[step[0] % freqs.shape[0]])
+            step[0] += 1
+        app.update_callback = feed_frame
+
     # -----------------------------------------------------------------------------------
     # make up a function
     # -----------------------------------------------------------------------------------
@@ -192,11 +657,18 @@ if __name__ == '__main__':
         y = (scale * np.sin(1.0 * xx) * scale * np.cos(0.4 * zz) / 2.0)
         app.load_data(y, x, z, equal_axes=False, func_id='sine_func')
     
+    # -----------------------------------------------------------------------------------
+    # the same function, evaluated on the GPU and animated (t in seconds)
+    # -----------------------------------------------------------------------------------
+    elif ex == 'sine_expression':
+        app.load_expression('200 * sin(x) * cos(0.4*z + t)', ((-6.0, 6.0), (-10.0, 10.0)),
+                            equal_axes=False, func_id='sine_expression')
+
     # -----------------------------------------------------------------------------------
     # using saved numpy data
     # -----------------------------------------------------------------------------------
     elif ex == 'eeg':
-        data = np.load('./data/spect_data.npy')
+        data = load_array('./data/spect_data.npy')
         data = np.load('/home/iomanip/documents/_BIOINFO--ML/_EXP/spectral_analysis/'
                        'dpss_test/spect_data.npy')
         # flip y axis
@@ -211,48 +683,9 @@ if __name__ == '__main__':
     # load from image (cm.jet)
     # -----------------------------------------------------------------------------------
     elif ex == 'essw':
-        import cv2
-        from matplotlib import colormaps # colormaps['jet'], colormaps['turbo']
-        from matplotlib.colors import LinearSegmentedColormap
-        from matplotlib._cm import _jet_data
-        
-        def convert_jet_to_grey(img):
-            """
-            (for lossy compression (JPG), interpolates values to 'nearest' gray scale).
-            """
-            (height, width) = img.shape[:2]
-        
-            cm = LinearSegmentedColormap("jet", _jet_data, N=2**8)
-            # cm = colormaps['turbo'] swap with jet if you use turbo colormap instead
-        
-            cm._init()  # Must be called first. cm._lut data field created here
-        
-            FLANN_INDEX_KDTREE = 1
-            index_params = dict(algorithm=FLANN_INDEX_KDTREE, trees=5)
-            search_params = dict(checks=50)
-            fm = cv2.FlannBasedMatcher(index_params, search_params)
-        
-            # JET, BGR order, excluding special palette values (>= 256)
-            fm.add(255 * np.float32([cm._lut[:256, (2, 1, 0)]]))  # jet
-            fm.train()
-        
-            # look up all pixels
-            query = img.reshape((-1, 3)).astype(np.float32)
-            matches = fm.match(query)
-        
-            # statistics: `result` is palette indices ("grayscale image")
-            output = np.uint16([m.trainIdx for m in matches]).reshape(height, width)
-            result = np.where(output < 256, output, 0).astype(np.uint8)
-            # dist = np.uint8([m.distance for m in matches]).reshape(height, width)
-        
-            return result  # , dist uncomment if you wish accuracy image
-        
-        #
-        data = cv2.imread('./data/essw.jpg', cv2.IMREAD_COLOR)
+        # decode the jet colored heatmap back to scalars in [0, 1]
+        data = load_image('./data/essw.jpg', colormap='jet')
         data = data[10:-10:, 10:-10]
-        
-        data = convert_jet_to_grey(data).astype(dtype='f4')
-        data /= 255.0
         print(data.shape)
         
         app.load_data(data, equal_axes=False, func_id='essw')
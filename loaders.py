@@ -0,0 +1,162 @@
+
+import os, functools
+import numpy as np
+#
+from settings import *
+
+# file extension -> loader function, see register_loader()
+LOADERS = {}
+
+
+#
+def register_loader(*extensions):
+    # decorator registering a loader function(path, **kwargs) -> np.ndarray
+    def decorator(func):
+        for ext in extensions:
+            LOADERS[ext.lower()] = func
+        return func
+    return decorator
+
+#
+def load_file(path : str, **kwargs):
+    # loads a data array using the loader registered for the file extension
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in LOADERS:
+        raise ValueError(f'no loader registered for {ext} files ({path})')
+    return LOADERS[ext](path, **kwargs)
+
+#
+@register_loader('.npy', '.raw', '.bin')
+def load_array(path : str,
+               shape : tuple=None,      # required for raw binary files
+               dtype : str='f4',        # dtype of raw binary files
+               offset : int=0):         # header bytes to skip in raw binary files
+    # Memory-maps a .npy file or a raw binary file (read-only), so that data larger than
+    # memory can be streamed to the GPU (see Func3DStreamMesh); smaller data is read
+    # into memory by Func3D.load_data().
+    if path.endswith('.npy'):
+        return np.load(path, mmap_mode='r')
+    if shape is None:
+        raise ValueError(f'shape is required for raw binary file {path}')
+    return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=tuple(shape))
+
+#
+def get_row_values(line : bytes):
+    # values of a data row, optionally labelled ('step: 0.1 0.2 ...'), or None for
+    # header lines ('(BEGIN)', 'dim 105', ...)
+    line = line.strip()
+    if not line:
+        return None
+    label = line.split(maxsplit=1)[0]
+    if label.endswith(b':'):
+        line = line[len(label):].lstrip()
+    if not line or line[0] not in b'0123456789+-.':
+        return None
+    return line
+
+#
+@register_loader('.txt', '.dat')
+def load_text(path : str,
+              chunk_rows : int=LOADER_CHUNK_ROWS,   # rows converted per chunk
+              cache : bool=LOADER_CACHE):           # use/write a .npy sidecar cache
+    # Height text file, one row of whitespace separated values per line. The rows are
+    # converted in chunks straight into a preallocated float32 array, and the result is
+    # cached as '<path>.npy' next to the file for as long as the file is unchanged.
+    cache_path = path + '.npy'
+    if cache and os.path.exists(cache_path) and \
+       os.path.getmtime(cache_path) >= os.path.getmtime(path):
+        return np.load(cache_path)
+
+    # first pass: shape
+    n_rows, n_cols = 0, 0
+    with open(path, 'rb') as file:
+        for line in file:
+            values = get_row_values(line)
+            if values is not None:
+                if n_rows == 0:
+                    n_cols = len(values.split())
+                n_rows += 1
+    data = np.empty((n_rows, n_cols), dtype='f4')
+
+    # second pass: convert chunks of rows
+    row, chunk = 0, []
+    with open(path, 'rb') as file:
+        for line in file:
+            values = get_row_values(line)
+            if values is not None:
+                chunk.append(values)
+            if len(chunk) == chunk_rows:
+                data[row:row+len(chunk)] = np.array(b' '.join(chunk).split(),
+                                                    dtype='f4').reshape(len(chunk), n_cols)
+                row, chunk = row + len(chunk), []
+    if chunk:
+        data[row:] = np.array(b' '.join(chunk).split(), dtype='f4').reshape(len(chunk), n_cols)
+
+    if cache:
+        try:
+            np.save(cache_path, data)
+        except OSError as e:
+            print(f'WARNING: could not write cache {cache_path}: {e}')
+    return data
+
+#
+@functools.lru_cache(maxsize=None)
+def get_colormap_cube(colormap : str='jet', bits : int=COLORMAP_CUBE_BITS):
+    # Quantised RGB -> colormap index lookup cube of (2^bits)^3 entries, cached per
+    # colormap. Cells hold the nearest of the 256 colormap entries to the cell centre, 
+    # and are resolved on first use (-1 until then, see resolve_cells()).
+    from matplotlib import colormaps
+    lut = np.float32(255 * colormaps[colormap].resampled(256)(np.arange(256))[:, :3])
+    cube = np.full(1 << (3 * bits), -1, dtype='i2')
+    return cube, lut
+
+#
+def resolve_cells(cube, lut, cells, bits, chunk=2**16):
+    width = 256 >> bits
+    mask = (1 << bits) - 1
+    lut_sq = np.sum(lut * lut, axis=1)
+    for i in range(0, cells.shape[0], chunk):
+        c = cells[i:i+chunk]
+        centres = np.stack([(c >> (2 * bits)) & mask, (c >> bits) & mask, c & mask], axis=1)
+        centres = centres.astype('f4') * width + 0.5 * (width - 1)
+        # squared distances up to the per-cell constant |centre|^2
+        dist = lut_sq[None, :] - 2.0 * (centres @ lut.T)
+        cube[c] = np.argmin(dist, axis=1)
+
+#
+def decode_colormap_image(img : np.ndarray,             # (h, w, 3) uint8, RGB
+                          colormap : str='jet',
+                          bits : int=COLORMAP_CUBE_BITS,
+                          return_distance : bool=False):
+    # Inverts a colormap: returns the (h, w) uint8 colormap index of every pixel, and
+    # optionally the RGB distance between the pixel and that colormap entry.
+    cube, lut = get_colormap_cube(colormap, bits)
+    q = (img >> (8 - bits)).astype(np.int32)
+    cells = (q[..., 0] << (2 * bits)) | (q[..., 1] << bits) | q[..., 2]
+    index = cube[cells]
+    missing = index < 0
+    if missing.any():
+        resolve_cells(cube, lut, np.unique(cells[missing]), bits)
+        index = cube[cells]
+    index = index.astype('u1')
+    if return_distance:
+        diff = img.astype('f4') - lut[index]
+        return index, np.sqrt(np.sum(diff * diff, axis=-1))
+    return index
+
+#
+@register_loader('.png', '.jpg', '.jpeg', '.bmp')
+def load_image(path : str, colormap : str=None):
+    # Grayscale image, or a heatmap rendered with a (matplotlib) colormap which is
+    # decoded back to scalars. Values are float32 in [0, 1].
+    import cv2
+    if colormap is None:
+        data = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    else:
+        data = cv2.imread(path, cv2.IMREAD_COLOR)
+    if data is None:
+        raise ValueError(f'could not read image {path}')
+    if colormap is not None:
+        data = decode_colormap_image(data[..., ::-1], colormap)     # BGR -> RGB
+    return data.astype('f4') / 255.0
+
@@ -0,0 +1,96 @@
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+#
+class BuildCancelled(Exception):
+    # raised inside a build superseded by a newer one for the same surface
+    pass
+
+
+#
+class MeshBuildJob:
+    def __init__(self, key, build, on_done):
+        self.key = key
+        self.build = build          # build(progress) -> mesh, run in the worker thread
+        self.on_done = on_done      # on_done(mesh, build_time), run in the main thread
+        self.fraction = 0.0
+        self.stage = 'queued'
+        self.cancelled = False
+        self.build_time = 0
+        self.future = None
+
+    #
+    def run(self):
+        t0 = time.perf_counter_ns()
+        mesh = self.build(self.report_progress)
+        self.build_time = time.perf_counter_ns() - t0
+        return mesh
+
+    #
+    def report_progress(self, fraction, stage):
+        # called by the mesh at stage boundaries, aborts stale builds
+        if self.cancelled:
+            raise BuildCancelled(self.key)
+        self.fraction, self.stage = fraction, stage
+
+
+#
+class BackgroundMeshBuilder:
+    # Builds meshes in a worker thread while the current surfaces keep rendering (the
+    # heavy numpy work releases the GIL). Only the latest job per key is kept: a newer
+    # submission cancels a queued job and aborts a running one at its next progress
+    # report. Finished meshes are handed back in poll(), on the main thread, where the
+    # GL objects can be created.
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='mesh_builder')
+        self.jobs = {}      # key -> latest MeshBuildJob
+
+    #
+    def submit(self, key, build, on_done):
+        if key in self.jobs:
+            self.cancel(key)
+        job = MeshBuildJob(key, build, on_done)
+        job.future = self.executor.submit(job.run)
+        self.jobs[key] = job
+        return job
+
+    #
+    def cancel(self, key):
+        job = self.jobs.pop(key)
+        job.cancelled = True
+        job.future.cancel()
+
+    #
+    def is_busy(self):
+        return len(self.jobs) > 0
+
+    #
+    def get_progress(self):
+        # (key, fraction, stage) of the jobs in flight
+        return [(job.key, job.fraction, job.stage) for job in self.jobs.values()]
+
+    #
+    def poll(self):
+        # calls on_done() for finished jobs, returns the number of meshes handed back
+        n_done = 0
+        for key, job in list(self.jobs.items()):
+            if not job.future.done():
+                continue
+            del self.jobs[key]
+            error = job.future.exception()
+            if isinstance(error, BuildCancelled):
+                continue
+            if error is not None:
+                print(f'WARNING: background build of {key} failed: {error!r}')
+                continue
+            job.on_done(job.future.result(), job.build_time)
+            n_done += 1
+        return n_done
+
+    #
+    def shutdown(self):
+        for key in list(self.jobs.keys()):
+            self.cancel(key)
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,94 @@
+
+import os, shutil, hashlib
+import numpy as np
+#
+from settings import *
+
+# bump when the cached mesh layout changes
+MESH_CACHE_VERSION = 2
+
+
+#
+class MeshCache:
+    # Content-addressed cache of finished Func3DMesh arrays. Entries are directories
+    # named by a hash of the input arrays and of every setting affecting the mesh; the
+    # arrays are stored as .npy files and memory-mapped on a hit, so they can be uploaded
+    # without any mesh work. Least recently used entries are evicted beyond max_bytes.
+    arrays = ['vertex_data', 'index_data', 'x', 'y', 'z']
+    scalars = ['nx', 'nz', 'xlim', 'ylim', 'zlim', 'sy', 'y_norm']
+
+    def __init__(self, cache_dir : str=MESH_CACHE_DIR, max_bytes : int=MESH_CACHE_SIZE):
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    #
+    @staticmethod
+    def get_key(*items):
+        # hash of arrays (dtype, shape and contents) and plain values
+        h = hashlib.blake2b(digest_size=20)
+        h.update(str(MESH_CACHE_VERSION).encode())
+        for item in items:
+            if isinstance(item, np.ndarray) and item.dtype != object:
+                h.update(f'{item.dtype.str}{item.shape}'.encode())
+                h.update(np.ascontiguousarray(item).data)
+            else:
+                h.update(repr(item).encode())
+            h.update(b'|')
+        return h.hexdigest()
+
+    #
+    def load(self, key, mesh):
+        # fills mesh from the cache entry, returns False on a miss
+        path = os.path.join(self.cache_dir, key)
+        if not os.path.isdir(path):
+            self.misses += 1
+            return False
+        for name in self.arrays:
+            file = os.path.join(path, name + '.npy')
+            setattr(mesh, name, np.load(file, mmap_mode='r') if os.path.exists(file) else None)
+        with np.load(os.path.join(path, 'meta.npz')) as meta:
+            for name in self.scalars:
+                value = meta[name]
+                setattr(mesh, name, tuple(value) if value.ndim else value[()])
+        os.utime(path)      # mark as recently used
+        self.hits += 1
+        return True
+
+    #
+    def store(self, key, mesh):
+        path = os.path.join(self.cache_dir, key)
+        tmp_path = path + '.tmp'
+        try:
+            os.makedirs(tmp_path, exist_ok=True)
+            for name in self.arrays:
+                value = getattr(mesh, name, None)
+                if value is not None:
+                    np.save(os.path.join(tmp_path, name + '.npy'), value)
+            np.savez(os.path.join(tmp_path, 'meta.npz'),
+                     **{name : np.asarray(getattr(mesh, name)) for name in self.scalars})
+            os.replace(tmp_path, path)
+        except OSError as e:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            print(f'WARNING: could not write mesh cache entry {path}: {e}')
+            return
+        self.evict()
+
+    #
+    def evict(self):
+        # removes least recently used entries until the cache fits in max_bytes
+        entries = []
+        for key in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, key)
+            if not os.path.isdir(path) or key.endswith('.tmp'):
+                continue
+            size = sum(entry.stat().st_size for entry in os.scandir(path))
+            entries.append((os.path.getmtime(path), size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
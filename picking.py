@@ -0,0 +1,233 @@
+
+import heapq
+import numpy as np
+import glm
+#
+from settings import *
+from resample import reduce_pairs
+
+
+#
+def get_ray(camera, m_model, pos, window_size):
+    # ray through the pixel pos = (x, y) (top left origin) as (origin, direction) in
+    # the model space of an object, from the camera matrices (orbit or perspective)
+    (px, py), (w, h) = pos, window_size
+    ndc_x, ndc_y = 2.0 * (px + 0.5) / w - 1.0, 1.0 - 2.0 * (py + 0.5) / h
+    m_inv = glm.inverse(camera.m_proj * camera.m_view * m_model)
+    near = m_inv * glm.vec4(ndc_x, ndc_y, -1.0, 1.0)
+    far = m_inv * glm.vec4(ndc_x, ndc_y, 1.0, 1.0)
+    near, far = glm.vec3(near) / near.w, glm.vec3(far) / far.w
+    return near, glm.normalize(far - near)
+
+#
+def unproject(camera, m_model, pos, depth, window_size):
+    # model space point of the pixel pos at the depth buffer value depth
+    (px, py), (w, h) = pos, window_size
+    ndc = glm.vec4(2.0 * (px + 0.5) / w - 1.0, 1.0 - 2.0 * (py + 0.5) / h,
+                   2.0 * depth - 1.0, 1.0)
+    p = glm.inverse(camera.m_proj * camera.m_view * m_model) * ndc
+    return glm.vec3(p) / p.w
+
+
+#
+class HeightPyramid:
+    # Max-height mip pyramid (an implicit quadtree) over the cells of a (nz, nx) height
+    # grid: level 0 holds the highest corner of every cell, each further level the max
+    # of 2 x 2 nodes of the level below (an odd last row/column is carried over), up to
+    # a single node. A min pyramid alongside bounds every node by a box from its lowest
+    # to its highest height, so a ray only descends into the nodes whose boxes it enters
+    # (tight boxes matter for grazing rays, which pass over many nodes).
+    def __init__(self, x, y, z):
+        # x (nx,), z (nz,) and the heights y (nz, nx), in model space (as drawn)
+        if y.shape[0] < 2 or y.shape[1] < 2:
+            raise ValueError(f'picking needs at least 2 x 2 grid points, got {y.shape}')
+        self.x, self.y, self.z = x, y, z
+        self.levels = self.get_levels(y, np.maximum)
+        self.min_levels = self.get_levels(y, np.minimum)
+        self.n_visited = 0      # nodes visited by the last intersect()
+
+    #
+    @staticmethod
+    def get_levels(y, ufunc):
+        # cell corners reduced by ufunc, then 2 x 2 nodes per level
+        cells = ufunc(ufunc(y[:-1, :-1], y[:-1, 1:]), ufunc(y[1:, :-1], y[1:, 1:]))
+        levels = [cells]
+        while levels[-1].shape != (1, 1):
+            level = levels[-1]
+            if level.shape[0] > 1:
+                level = reduce_pairs(level, 0, ufunc)
+            if level.shape[1] > 1:
+                level = reduce_pairs(level, 1, ufunc)
+            levels.append(level)
+        return levels
+
+    #
+    def get_box(self, level, i, j):
+        # (lo, hi) corners of the box of node (i, j)
+        n_rows, n_cols = self.levels[0].shape
+        i0, i1 = i << level, min((i + 1) << level, n_rows)
+        j0, j1 = j << level, min((j + 1) << level, n_cols)
+        xa, xb = float(self.x[j0]), float(self.x[j1])
+        za, zb = float(self.z[i0]), float(self.z[i1])
+        return ((min(xa, xb), float(self.min_levels[level][i, j]), min(za, zb)),
+                (max(xa, xb), float(self.levels[level][i, j]), max(za, zb)))
+
+    #
+    @staticmethod
+    def intersect_box(o, d, lo, hi):
+        # slab test, distance at which the ray enters the box (0 if inside) or None
+        t0, t1 = 0.0, float('inf')
+        for k in range(3):
+            if abs(d[k]) < EPSILON:
+                if o[k] < lo[k] or o[k] > hi[k]:
+                    return None
+                continue
+            ta, tb = (lo[k] - o[k]) / d[k], (hi[k] - o[k]) / d[k]
+            t0, t1 = max(t0, min(ta, tb)), min(t1, max(ta, tb))
+            if t0 > t1:
+                return None
+        return t0
+
+    #
+    @staticmethod
+    def intersect_triangle(o, d, a, b, c):
+        # Moller-Trumbore (both sides), distance or None
+        e1 = (b[0] - a[0], b[1] - a[1], b[2] - a[2])
+        e2 = (c[0] - a[0], c[1] - a[1], c[2] - a[2])
+        p = (d[1] * e2[2] - d[2] * e2[1], d[2] * e2[0] - d[0] * e2[2], d[0] * e2[1] - d[1] * e2[0])
+        det = e1[0] * p[0] + e1[1] * p[1] + e1[2] * p[2]
+        if abs(det) < 1e-12:
+            return None
+        s = (o[0] - a[0], o[1] - a[1], o[2] - a[2])
+        u = (s[0] * p[0] + s[1] * p[1] + s[2] * p[2]) / det
+        if u < 0.0 or u > 1.0:
+            return None
+        q = (s[1] * e1[2] - s[2] * e1[1], s[2] * e1[0] - s[0] * e1[2], s[0] * e1[1] - s[1] * e1[0])
+        v = (d[0] * q[0] + d[1] * q[1] + d[2] * q[2]) / det
+        if v < 0.0 or u + v > 1.0:
+            return None
+        t = (e2[0] * q[0] + e2[1] * q[1] + e2[2] * q[2]) / det
+        return t if t >= 0.0 else None
+
+    #
+    def intersect_cell(self, o, d, i, j):
+        # the two triangles of cell (i, j), same split as Func3DMesh.get_grid_indices()
+        x, y, z = self.x, self.y, self.z
+        p00 = (float(x[j]), float(y[i, j]), float(z[i]))
+        p01 = (float(x[j+1]), float(y[i, j+1]), float(z[i]))
+        p10 = (float(x[j]), float(y[i+1, j]), float(z[i+1]))
+        p11 = (float(x[j+1]), float(y[i+1, j+1]), float(z[i+1]))
+        hits = [t for t in (self.intersect_triangle(o, d, p00, p10, p01),
+                            self.intersect_triangle(o, d, p01, p10, p11)) if t is not None]
+        return min(hits) if hits else None
+
+    #
+    def intersect(self, origin, direction):
+        # First hit of the ray origin + t * direction (t >= 0) with the surface, as (t,
+        # row, column) of the cell, or None. Nodes are visited in the order the ray
+        # enters their boxes, the search ends once a hit is closer than the next box.
+        o, d = tuple(map(float, origin)), tuple(map(float, direction))
+        heap, best = [], None
+        self.n_visited = 0
+        self.push(heap, o, d, len(self.levels) - 1, 0, 0)
+        while heap and (best is None or heap[0][0] < best[0]):
+            _, level, i, j = heapq.heappop(heap)
+            self.n_visited += 1
+            if level == 0:
+                t = self.intersect_cell(o, d, i, j)
+                if t is not None and (best is None or t < best[0]):
+                    best = (t, i, j)
+                continue
+            n_rows, n_cols = self.levels[level - 1].shape
+            for ci in (2 * i, 2 * i + 1):
+                for cj in (2 * j, 2 * j + 1):
+                    if ci < n_rows and cj < n_cols:
+                        self.push(heap, o, d, level - 1, ci, cj)
+        return best
+
+    #
+    def push(self, heap, o, d, level, i, j):
+        t = self.intersect_box(o, d, *self.get_box(level, i, j))
+        if t is not None:
+            heapq.heappush(heap, (t, level, i, j))
+
+
+#
+class Picker:
+    # The (x, z, value) under the cursor on a surface: a ray cast against a height
+    # pyramid of the surface ('cpu'), or the depth buffer read back at the pixel after
+    # drawing the surface alone ('gpu', also for surfaces whose heights are not in
+    # memory, e.g. streamed). The pyramid is rebuilt when the surface data changes.
+    def __init__(self, app, method=PICK_METHOD):
+        self.app = app
+        self.method = method
+        self.cached = (None, None, None)    # (object, data version, pyramid)
+
+    #
+    def get_pyramid(self, obj):
+        # None if the heights are not in memory
+        if self.cached[0] is obj and self.cached[1] == obj.data_version:
+            return self.cached[2]
+        heights = obj.get_height_grid()
+        pyramid = None if heights is None else HeightPyramid(obj.mesh.x, heights, obj.mesh.z)
+        self.cached = (obj, obj.data_version, pyramid)
+        return pyramid
+
+    #
+    def pick(self, pos, obj):
+        # {'row', 'col' : nearest grid point, 'x', 'z', 'value' : in data units (at the
+        # grid point), 'position' : model space hit} or None if the cursor misses
+        pyramid = None if self.method == 'gpu' else self.get_pyramid(obj)
+        if pyramid is None:
+            return self.pick_depth(pos, obj)
+        origin, direction = get_ray(self.app.camera, obj.m_model, pos, self.app.window_size)
+        hit = pyramid.intersect(origin, direction)
+        if hit is None:
+            return None
+        t, i, j = hit
+        p = origin + t * direction
+        x, z = obj.mesh.x, obj.mesh.z
+        # nearest corner of the cell
+        i += int(abs(p.z - z[i+1]) < abs(p.z - z[i]))
+        j += int(abs(p.x - x[j+1]) < abs(p.x - x[j]))
+        return self.get_result(obj, i, j, pyramid.y[i, j], p)
+
+    #
+    def pick_depth(self, pos, obj):
+        # the surface is drawn alone (no axes), then the depth at the pixel is read back
+        app, (w, h) = self.app, self.app.window_size
+        fbo = app.fbo if app.headless else app.ctx.screen
+        fbo.use()
+        app.ctx.clear(depth=1.0)
+        app.shader_manager.write_camera(app.camera)
+        obj.render(app.camera)
+        data = fbo.read(viewport=(int(pos[0]), h - 1 - int(pos[1]), 1, 1), attachment=-1,
+                        dtype='f4')
+        depth = float(np.frombuffer(data, dtype='f4')[0])
+        app.dirty = True                    # the frame was overwritten
+        if depth >= 1.0:
+            return None
+        p = unproject(app.camera, obj.m_model, pos, depth, app.window_size)
+        x, z = obj.mesh.x, obj.mesh.z
+        i, j = int(np.argmin(np.abs(z - p.z))), int(np.argmin(np.abs(x - p.x)))
+        heights = obj.get_height_grid()
+        return self.get_result(obj, i, j, p.y if heights is None else heights[i, j], p)
+
+    #
+    @staticmethod
+    def get_result(obj, i, j, height, position):
+        mesh = obj.mesh
+        (x0, x1), (z0, z1) = mesh.xlim, mesh.zlim
+        x, z = mesh.x, mesh.z
+        # the model space axes are linear in the data axes
+        return {'row' : i, 'col' : j,
+                'x' : float(x0 + (x[j] - x[0]) / (x[-1] - x[0]) * (x1 - x0)),
+                'z' : float(z0 + (z[i] - z[0]) / (z[-1] - z[0]) * (z1 - z0)),
+                'value' : float(mesh.unscale_y(height)),
+                'position' : position}
+
+    #
+    @staticmethod
+    def format(result):
+        return f'x {result["x"]:.6g}  z {result["z"]:.6g}  value {result["value"]:.6g}  ' \
+               f'[{result["row"]}, {result["col"]}]'
@@ -0,0 +1,198 @@
+
+import time, json, csv, contextlib
+from collections import deque
+import numpy as np
+#
+from settings import *
+
+
+#
+class FrameProfiler:
+    # Per-frame CPU time of the main loop phases (see Func3D.run()) and GPU time per
+    # scene object, through timer queries around their draw calls. Query results are
+    # read PROFILER_QUERY_LATENCY frames later, so reading them does not stall the
+    # pipeline. Keeps the last PROFILER_WINDOW frames for rolling percentiles and the
+    # last PROFILER_MAX_FRAMES for export (CSV or Chrome trace JSON).
+    def __init__(self, ctx, enabled=PROFILER_ENABLED):
+        self.ctx = ctx
+        self.enabled = enabled
+        self.frame_index = 0
+        self.frame = None           # record of the frame being profiled
+        self.t_mark = 0
+        self.records = deque(maxlen=PROFILER_MAX_FRAMES)
+        self.series = {}            # 'cpu <phase>'/'gpu <obj_id>' -> recent times (ms)
+        self.queries = {}           # obj_id -> [[query, record or None]] ring
+
+    #
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        self.t_mark = time.perf_counter_ns()
+        self.frame = {'frame' : self.frame_index, 'start' : self.t_mark, 'cpu' : {},
+                      'gpu' : {}}
+
+    #
+    def mark(self, phase):
+        # CPU time since begin_frame() or the previous mark
+        if self.frame is None:
+            return
+        t = time.perf_counter_ns()
+        self.frame['cpu'][phase] = (self.t_mark, t - self.t_mark)
+        self.t_mark = t
+
+    #
+    def cancel_frame(self):
+        # nothing was rendered (idle iteration of the on-demand loop)
+        self.frame = None
+
+    #
+    def end_frame(self):
+        if self.frame is None:
+            return
+        frame, self.frame = self.frame, None
+        total = sum(dt for _, dt in frame['cpu'].values())
+        frame['cpu']['frame'] = (frame['start'], total)
+        for phase, (_, dt) in frame['cpu'].items():
+            self.add_sample('cpu ' + phase, dt)
+        self.records.append(frame)
+        self.frame_index += 1
+
+    #
+    def add_sample(self, name, dt):
+        if name not in self.series:
+            self.series[name] = deque(maxlen=PROFILER_WINDOW)
+        self.series[name].append(dt / 1e6)
+
+    #
+    def gpu_timer(self, obj_id):
+        # context manager timing the draw calls of an object on the GPU (queries cannot
+        # nest, one object at a time)
+        if self.frame is None:
+            return contextlib.nullcontext()
+        ring = self.queries.get(obj_id)
+        if ring is None:
+            ring = self.queries[obj_id] = [[self.ctx.query(time=True), None]
+                                           for _ in range(PROFILER_QUERY_LATENCY)]
+        slot = ring[self.frame_index % PROFILER_QUERY_LATENCY]
+        # the slot was last used PROFILER_QUERY_LATENCY frames ago, its result is ready
+        self.read_query(obj_id, slot)
+        slot[1] = self.frame
+        return slot[0]
+
+    #
+    def read_query(self, obj_id, slot):
+        query, record = slot
+        if record is None:
+            return
+        dt = query.elapsed
+        record['gpu'][obj_id] = dt
+        self.add_sample('gpu ' + obj_id, dt)
+        slot[1] = None
+
+    #
+    def flush(self):
+        # reads all pending query results (blocks until the GPU is done)
+        for obj_id, ring in self.queries.items():
+            for slot in ring:
+                self.read_query(obj_id, slot)
+
+    #
+    def reset(self):
+        self.flush()
+        self.records.clear()
+        self.series = {}
+
+    #
+    def get_stats(self):
+        # {series name : (p50, p95, p99)} in ms over the last PROFILER_WINDOW frames
+        return {name : tuple(np.percentile(values, (50, 95, 99)))
+                for name, values in sorted(self.series.items()) if len(values) > 0}
+
+    #
+    def get_rows(self):
+        # percentile table (strings), header first
+        rows = [('(ms)', 'p50', 'p95', 'p99')]
+        for name, values in self.get_stats().items():
+            rows.append((name,) + tuple(f'{value:.2f}' for value in values))
+        return rows
+
+    #
+    def get_summary(self):
+        # the percentile table as text lines, for the console
+        return [f'{row[0][:24]:24s}' + ''.join(f'{cell:>8s}' for cell in row[1:])
+                for row in self.get_rows()]
+
+    #
+    def export_csv(self, path):
+        # one row per frame, CPU phases and GPU objects as columns (ms)
+        self.flush()
+        phases = sorted({phase for record in self.records for phase in record['cpu']})
+        objects = sorted({obj_id for record in self.records for obj_id in record['gpu']})
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['frame', 'start_ms'] + [f'cpu {phase}' for phase in phases] +
+                            [f'gpu {obj_id}' for obj_id in objects])
+            t0 = self.records[0]['start'] if self.records else 0
+            for record in self.records:
+                cpu, gpu = record['cpu'], record['gpu']
+                writer.writerow([record['frame'], f'{(record["start"] - t0)/1e6:.3f}'] +
+                                [f'{cpu[p][1]/1e6:.3f}' if p in cpu else '' for p in phases] +
+                                [f'{gpu[o]/1e6:.3f}' if o in gpu else '' for o in objects])
+        print(f'profile of {len(self.records)} frames written to {path}.')
+
+    #
+    def export_trace(self, path):
+        # Chrome trace format (chrome://tracing, Perfetto): CPU phases on one track, GPU
+        # times on another. Only GPU durations are known, they are laid out one after
+        # the other from the start of the render phase.
+        self.flush()
+        events = [{'name' : 'process_name', 'ph' : 'M', 'pid' : 0,
+                   'args' : {'name' : 'pyFunc3D'}},
+                  {'name' : 'thread_name', 'ph' : 'M', 'pid' : 0, 'tid' : 0,
+                   'args' : {'name' : 'CPU'}},
+                  {'name' : 'thread_name', 'ph' : 'M', 'pid' : 0, 'tid' : 1,
+                   'args' : {'name' : 'GPU'}}]
+        t0 = self.records[0]['start'] if self.records else 0
+        for record in self.records:
+            for phase, (start, dt) in record['cpu'].items():
+                if phase == 'frame':
+                    continue
+                events.append({'name' : phase, 'ph' : 'X', 'pid' : 0, 'tid' : 0,
+                               'ts' : (start - t0) / 1e3, 'dur' : dt / 1e3,
+                               'args' : {'frame' : record['frame']}})
+            start = record['cpu'].get('render', (record['start'], 0))[0]
+            for obj_id, dt in record['gpu'].items():
+                events.append({'name' : obj_id, 'ph' : 'X', 'pid' : 0, 'tid' : 1,
+                               'ts' : (start - t0) / 1e3, 'dur' : dt / 1e3,
+                               'args' : {'frame' : record['frame']}})
+                start += dt
+        with open(path, 'w') as file:
+            json.dump({'traceEvents' : events, 'displayTimeUnit' : 'ms'}, file)
+        print(f'trace of {len(self.records)} frames written to {path}.')
+
+
+#
+def load_camera_path(path):
+    # JSON camera path: a list of orbit camera keyframes ({'x_angle', 'y_angle', 
+    # 'radius'}, missing keys keep the previous value), or {'keyframes' : [...], 
+    # 'frames_per_key' : n}. Returns (keyframes, frames_per_key or None).
+    with open(path) as file:
+        data = json.load(file)
+    if isinstance(data, list):
+        return data, None
+    return data['keyframes'], data.get('frames_per_key')
+
+#
+def get_camera_path_poses(keyframes, frames_per_key, start_pose):
+    # one pose per frame, linearly interpolated between the keyframes
+    poses = [dict(start_pose)]
+    for keyframe in keyframes:
+        poses.append(dict(poses[-1], **keyframe))
+    poses = poses[1:]
+    frames = []
+    for a, b in zip(poses[:-1], poses[1:]):
+        for i in range(frames_per_key):
+            t = i / frames_per_key
+            frames.append({key : a[key] + t * (b[key] - a[key]) for key in a})
+    frames.append(poses[-1])
+    return frames
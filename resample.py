@@ -0,0 +1,100 @@
+
+import numpy as np
+
+
+#
+def get_interp_weights(xp, x):
+    # indices and weights for linear interpolation of samples at xp (increasing) to x,
+    # clamped at the ends like np.interp
+    i1 = np.clip(np.searchsorted(xp, x, side='right'), 1, xp.shape[0] - 1)
+    i0 = i1 - 1
+    t = np.clip((x - xp[i0]) / (xp[i1] - xp[i0]), 0.0, 1.0)
+    return i0, i1, t
+
+#
+def resample_axis(y, xp, x, axis):
+    # linear resampling of all rows (or columns) of y at once
+    if xp.shape == x.shape and np.array_equal(xp, x):
+        return y
+    if xp[0] > xp[-1]:
+        xp, y = xp[::-1], np.flip(y, axis=axis)
+    i0, i1, t = get_interp_weights(xp, x)
+    shape = [1] * y.ndim
+    shape[axis] = -1
+    t = t.reshape(shape)
+    return np.take(y, i0, axis=axis) * (1.0 - t) + np.take(y, i1, axis=axis) * t
+
+#
+def resample_linear(y : np.ndarray,         # (nz, nx) data
+                    x : np.ndarray,         # (nx,) current x coordinates
+                    z : np.ndarray,         # (nz,) current z coordinates
+                    x_new : np.ndarray,
+                    z_new : np.ndarray):
+    # separable bilinear resampling of the whole grid to (z_new, x_new)
+    y = resample_axis(y, x, x_new, axis=1)
+    return resample_axis(y, z, z_new, axis=0)
+
+#
+def reduce_pairs(y, axis, ufunc):
+    # reduces neighbouring pairs along axis, an odd last sample is kept as is
+    n = y.shape[axis]
+    even = np.take(y, np.arange(0, n - 1, 2), axis=axis)
+    odd = np.take(y, np.arange(1, n, 2), axis=axis)
+    reduced = ufunc(even, odd)
+    if n % 2:
+        reduced = np.concatenate([reduced, np.take(y, [n - 1], axis=axis)], axis=axis)
+    return reduced
+
+#
+def mean_pairs(a, b):
+    return 0.5 * (a + b)
+
+
+#
+class ResamplingPyramid:
+    # Min/max/mean pyramid over a (nz, nx) grid. Levels halve the z and x resolution
+    # independently, level (lz, lx) has (~nz/2^lz, ~nx/2^lx) samples, and are built on
+    # demand. Decimating with 'max' (or 'min') keeps every peak of the input.
+    modes = {'min' : np.minimum, 'max' : np.maximum, 'mean' : mean_pairs}
+
+    def __init__(self, y, x, z):
+        self.levels = {(0, 0) : {'min' : y, 'max' : y, 'mean' : y}}
+        self.x = {0 : x}
+        self.z = {0 : z}
+
+    #
+    def get_x(self, lx):
+        if lx not in self.x:
+            self.x[lx] = reduce_pairs(self.get_x(lx - 1), 0, mean_pairs)
+        return self.x[lx]
+
+    #
+    def get_z(self, lz):
+        if lz not in self.z:
+            self.z[lz] = reduce_pairs(self.get_z(lz - 1), 0, mean_pairs)
+        return self.z[lz]
+
+    #
+    def get_level(self, lz, lx, mode='max'):
+        if (lz, lx) not in self.levels:
+            self.levels[(lz, lx)] = {}
+        level = self.levels[(lz, lx)]
+        if mode not in level:
+            if lx > 0:
+                level[mode] = reduce_pairs(self.get_level(lz, lx - 1, mode), 1,
+                                           self.modes[mode])
+            else:
+                level[mode] = reduce_pairs(self.get_level(lz - 1, lx, mode), 0,
+                                           self.modes[mode])
+        return level[mode]
+
+    #
+    def decimate(self, max_shape, mode='max'):
+        # finest level with at most max_shape = (nz, nx) samples, returns (y, x, z)
+        lz, lx = 0, 0
+        while self.get_z(lz).shape[0] > max_shape[0]:
+            lz += 1
+        while self.get_x(lx).shape[0] > max_shape[1]:
+            lx += 1
+        return self.get_level(lz, lx, mode), self.get_x(lx), self.get_z(lz)
+
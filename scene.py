@@ -17,16 +17,87 @@ class Scene:
                                             obj_id=axes_obj_id)
         self.object_count += 1
         
-    def add_data(self, x, y, z, equal_axes, func_id=None):
+    def add_data(self, x, y, z, equal_axes, func_id=None, indexed=False, 
+                 max_resolution=MESH_MAX_RESOLUTION, mesh=None, compact=False):
         obj_id = func_id
         if func_id is None:
             obj_id = 'func' + str(self.object_count)    
         self.objects[obj_id] = Func3DObj(self.app, x, y, z, equal_axes=equal_axes,
-                                         shader='func3D')
+                                         shader='func3D', indexed=indexed,
+                                         max_resolution=max_resolution, mesh=mesh,
+                                         compact=compact)
         self.object_count += 1
         return obj_id
         
+    def build_mesh(self, x, y, z, equal_axes, indexed=False, as_texture=False, stream=False,
+                   max_resolution=MESH_MAX_RESOLUTION, progress=None, compact=False,
+                   height_format=HEIGHT_FORMAT):
+        # the CPU part of add_data()/add_texture_data(), no GL calls (may run in a thread)
+        if stream:
+            return Func3DStreamMesh(x, y, z, equal_axes, progress=progress,
+                                    height_format=height_format)
+        if as_texture:
+            return Func3DTextureMesh(x, y, z, equal_axes, max_resolution, progress=progress,
+                                     height_format=height_format)
+        return Func3DMesh(x, y, z, equal_axes, indexed=indexed, max_resolution=max_resolution,
+                          cache=self.app.mesh_cache, progress=progress, compact=compact)
+
+    def add_texture_data(self, x, y, z, equal_axes, func_id=None, tiled=False, stream=False,
+                         max_resolution=MESH_MAX_RESOLUTION, mesh=None, 
+                         height_format=HEIGHT_FORMAT):
+        obj_id = func_id
+        if func_id is None:
+            obj_id = 'func' + str(self.object_count)    
+        obj_type = Func3DTiledObj if tiled else Func3DTextureObj
+        self.objects[obj_id] = obj_type(self.app, x, y, z, equal_axes=equal_axes,
+                                        shader='func3D', stream=stream,
+                                        max_resolution=max_resolution, mesh=mesh,
+                                        height_format=height_format)
+        self.object_count += 1
+        return obj_id
+
+    def add_multiples(self, x, y, z, equal_axes, func_id=None, rows=None, cols=None, 
+                      spacing=MULTIPLES_SPACING, height_format=HEIGHT_FORMAT):
+        # y is a (surfaces, nz, nx) stack, drawn as one instanced small multiples object
+        obj_id = func_id
+        if func_id is None:
+            obj_id = 'func' + str(self.object_count)    
+        self.objects[obj_id] = Func3DMultiplesObj(self.app, x, y, z, equal_axes=equal_axes,
+                                                  shader='func3D', rows=rows, cols=cols,
+                                                  spacing=spacing, 
+                                                  height_format=height_format)
+        self.object_count += 1
+        return obj_id
+
+    def add_expression(self, expression, domain, resolution=EXPRESSION_RESOLUTION,
+                       equal_axes=True, func_id=None):
+        # surface of an expression of x, z and t, evaluated in the vertex shader
+        obj_id = func_id
+        if func_id is None:
+            obj_id = 'func' + str(self.object_count)    
+        self.objects[obj_id] = Func3DExpressionObj(self.app, expression, domain, resolution,
+                                                   equal_axes=equal_axes, shader='func3D')
+        self.object_count += 1
+        return obj_id
+
+    def set_layout(self, obj_id, rows=None, cols=None, spacing=MULTIPLES_SPACING):
+        # (rows x cols) arrangement of a small multiples object
+        self.objects[obj_id].set_layout(rows, cols, spacing)
+
+    def clear(self):
+        # GL resources are released when the objects are collected (gc_mode 'auto')
+        self.objects = {}
+        self.object_count = 0
+
+    def is_dirty(self):
+        # true if any object changed since it was last rendered, or is animated
+        return any(obj.dirty or obj.animated for obj in self.objects.values())
+
     def render(self, camera):
+        self.app.shader_manager.begin_frame(camera)
         for obj_id in self.objects.keys():
-            self.objects[obj_id].render(camera)
+            # GPU time per object, if profiling (see FrameProfiler)
+            with self.app.profiler.gpu_timer(obj_id):
+                self.objects[obj_id].render(camera)
+            self.objects[obj_id].dirty = False
 
@@ -6,6 +6,13 @@ WIN_RES = glm.ivec2(1440, 900)
 #BG_COLOR = glm.vec3(0.10, 0.16, 0.25)
 BG_COLOR = glm.vec3(0.9)
 
+# rendering loop
+RENDER_ON_DEMAND = True         # redraw only when the camera, objects or data change
+FPS_CAP = 0                     # max frames per second, 0 for no cap
+IDLE_TIMEOUT = 500              # ms, max wait for events while nothing changes
+CALLBACK_INTERVAL = 10          # ms, max wait while nothing changes, with an update callback
+CAPTION_INTERVAL = 500          # ms between fps updates in the window caption
+
 # camera
 FOV = 60
 NEAR = 0.01
@@ -20,6 +27,68 @@ EPSILON = 1e-7
 MESH_SCALE = (5.0, 1.5, 5.0)    # scale of (x, y, z) axes in mesh, rescaled in Func3DMesh 
                                 # constructor. If x/z dimensions are unequal, a flag in
                                 # the mesh constructor dictates the behaviour.
+MESH_BACKEND = 'auto'           # 'numpy' (vectorized), 'numba' (compiled parallel kernels,
+                                # see mesh_kernels.py), 'auto' (numba for large grids if 
+                                # installed, else numpy) or 'legacy' (reference python 
+                                # loops, for comparison)
+MESH_NUMBA_MIN_POINTS = 2**20   # grid points from which 'auto' uses numba (import cost)
+MESH_MAX_RESOLUTION = None      # if set, larger data is decimated (min/max pyramid)
+MESH_INDEXED = False            # indexed geometry (one vertex per grid point + IBO)
+MESH_COMPACT = False            # 12 byte vertices (16-bit x/z, float height, packed normal)
+MESH_CACHE = True               # on-disk cache of finished meshes (see mesh_cache.py)
+MESH_CACHE_DIR = '~/.cache/pyFunc3D/meshes'
+MESH_CACHE_SIZE = 2**30         # bytes, least recently used meshes are evicted beyond
+STREAM_MEMORY_BUDGET = 2**28    # bytes per band when streaming out-of-core data
+LOD_TILE_SIZE = 64              # quads per tile side in tiled rendering (power of two)
+LOD_PIXEL_ERROR = 4.0           # max projected quad size (pixels) when choosing tile LOD
+LOD_DECIMATION = 'max'          # heights of coarser LOD levels: 'max', 'min' or 'mean'
+HEIGHT_FORMAT = 'f4'            # height textures: 'f4' (R32F), 'f2' (R16F) or 'u2' (R16,
+                                # 16-bit over the height range), see HeightFormat
+HEIGHT_MAX_ERROR = 1e-3         # max height error of 'f2'/'u2' as a fraction of the height
+                                # range, else float32 is kept (None for no bound)
+MULTIPLES_SPACING = 0.1         # gap between small multiples, relative to the surface size
+EXPRESSION_RESOLUTION = 256     # grid points along the longest axis of expression surfaces
+EXPRESSION_RANGE_TIME = 10.0    # s, animated expressions are sampled over [0, this] to
+EXPRESSION_RANGE_SAMPLES = 16   # scale their heights (times sampled)
+COLORMAPS = ['jet', 'turbo', 'viridis', 'magma', 'gray']   # cycled at runtime (F5)
+COLORMAP_SIZE = 256             # entries of the colormap lookup texture
+COLORMAP_CACHE_DIR = '~/.cache/pyFunc3D/colormaps'   # lookup tables, saves matplotlib import
+
+# offscreen rendering
+HEADLESS_BACKEND = 'egl'        # moderngl standalone backend, None for the platform default
+BATCH_WINDOW_SIZE = (256, 256)  # thumbnail size of batch renders (see batch.py)
+BATCH_MAX_RESOLUTION = 512      # data is decimated to this for batch renders
+BATCH_WORKERS = None            # processes (one GL context each), None for all cores
+
+# profiling (see profiler.py)
+PROFILER_ENABLED = False        # profile from the start, else with the overlay (F10)
+PROFILER_WINDOW = 600           # frames of the rolling percentiles
+PROFILER_MAX_FRAMES = 100000    # frames kept for export (F11, CSV and Chrome trace)
+PROFILER_QUERY_LATENCY = 3      # frames before GPU timer results are read (no stalls)
+PROFILER_REPLAY_FRAMES = 60     # frames between two keyframes of a camera path replay
+PROFILER_REPLAY_WARMUP = 10     # frames rendered before a replay is profiled
+PROFILER_REPLAY_DT = 1000 / 60  # ms, fixed time step of replays
+PICK_METHOD = 'cpu'             # cursor picking (P): 'cpu' (ray against a max-height pyramid,
+                                # falls back to 'gpu' for streamed data) or 'gpu' (depth 
+                                # buffer readback), see picking.py
+PICK_TOOLTIP_OFFSET = (16, 16)  # pixels from the cursor to the value readout
+HUD_FONT_SIZE = 18
+HUD_COLOR = (20, 20, 20)
+HUD_BG_COLOR = (255, 255, 255, 200)
+
+# benchmarks (see benchmark.py)
+BENCH_SIZES = (100, 256, 512, 1024, 2048, 4096)   # grid sizes, n x n and n/2 x n
+BENCH_REPEAT = 5                # runs per timing, the median is reported
+BENCH_MAX_BYTES = 2**30         # skip layouts whose vertex data would be larger
+BENCH_FRAMES = 60               # frames per steady-state frame time measurement
+BENCH_FRAME_SECONDS = 5.0       # ... or fewer, if they take longer than this
+BENCH_THRESHOLD = 0.15          # relative slowdown (or memory growth) flagged as regression
+BENCH_NOISE_FLOOR = 0.5         # ms (or MB), smaller absolute differences are ignored
+
+# data loading
+LOADER_CHUNK_ROWS = 4096        # rows per chunk when parsing height text files
+LOADER_CACHE = True             # cache parsed text files as '<file>.npy' sidecars
+COLORMAP_CUBE_BITS = 8          # bits per channel of the RGB -> colormap index cube
 
 
 
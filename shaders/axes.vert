@@ -5,8 +5,12 @@ layout (location=1) in float a_color_index;
 
 out vec3 v_color;
 
-uniform mat4 m_proj;
-uniform mat4 m_view;
+// per-frame camera state, shared by all programs (see ShaderManager.write_camera())
+layout (std140) uniform Camera {
+    mat4 m_proj;
+    mat4 m_view;
+    vec3 u_cam_pos;
+};
 uniform mat4 m_model;
 
 const vec3 colors[3] = vec3[3](
@@ -5,8 +5,12 @@ layout (location=1) in vec3 a_normal;
 
 out vec3 v_normal;
 
-uniform mat4 m_proj;
-uniform mat4 m_view;
+// per-frame camera state, shared by all programs (see ShaderManager.write_camera())
+layout (std140) uniform Camera {
+    mat4 m_proj;
+    mat4 m_view;
+    vec3 u_cam_pos;
+};
 uniform mat4 m_model;
 
 void main()
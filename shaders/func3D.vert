@@ -3,15 +3,18 @@
 layout (location=0) in vec3 a_position;
 layout (location=1) in vec3 a_normal;
 layout (location=2) in vec3 a_barycentric;
-layout (location=3) in vec3 a_color;
 
 out vec3 v_normal;
 out vec3 v_frag_pos;
 out vec3 v_barycentric;
-out vec3 v_color;
-
-uniform mat4 m_proj;
-uniform mat4 m_view;
+out float v_height;
+
+// per-frame camera state, shared by all programs (see ShaderManager.write_camera())
+layout (std140) uniform Camera {
+    mat4 m_proj;
+    mat4 m_view;
+    vec3 u_cam_pos;
+};
 uniform mat4 m_model;
 
 const vec3 barycentric_coords[6] = vec3[6](
@@ -28,7 +31,7 @@ void main()
     v_normal = mat3(transpose(inverse(m_model))) * normalize(a_normal);
     v_frag_pos = vec3(m_model * vec4(a_position, 1.0));
     v_barycentric = a_barycentric;
-    v_color = a_color;
+    v_height = a_position.y;
     
     gl_Position = m_proj * m_view * m_model * vec4(a_position, 1.0);
 
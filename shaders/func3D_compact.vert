@@ -0,0 +1,59 @@
+#version 330 core
+
+// compact vertices (see Func3DMesh.pack_compact()): x/z quantized to 16 bits over 
+// their range, the height as float and the normal as two 16-bit octahedral coordinates
+layout (location=0) in uvec2 a_xz;
+layout (location=1) in float a_height;
+layout (location=2) in uint a_normal;
+
+out vec3 v_normal;
+out vec3 v_frag_pos;
+out vec2 v_grid;
+out float v_height;
+
+// per-frame camera state, shared by all programs (see ShaderManager.write_camera())
+layout (std140) uniform Camera {
+    mat4 m_proj;
+    mat4 m_view;
+    vec3 u_cam_pos;
+};
+uniform mat4 m_model;
+uniform vec2 u_x_range;
+uniform vec2 u_z_range;
+uniform int u_grid_nx;
+uniform bool u_indexed;
+
+// (column, row) offsets of the six vertices of a quad (see Func3DMesh.get_grid_indices())
+const ivec2 quad_offsets[6] = ivec2[6](ivec2(0, 0), ivec2(0, 1), ivec2(1, 0),
+                                       ivec2(1, 0), ivec2(0, 1), ivec2(1, 1));
+
+vec3 decode_normal(uint n)
+{
+    // inverse of Func3DMesh.encode_octahedral()
+    vec2 p = vec2(n & 0xFFFFu, n >> 16u) / 65535.0 * 2.0 - 1.0;
+    float y = 1.0 - abs(p.x) - abs(p.y);
+    if (y < 0.0)
+        p = (1.0 - abs(p.yx)) * vec2(p.x >= 0.0 ? 1.0 : -1.0, p.y >= 0.0 ? 1.0 : -1.0);
+    return normalize(vec3(p.x, y, p.y));
+}
+
+void main()
+{
+    vec2 xz = vec2(a_xz) / 65535.0;
+    vec3 position = vec3(mix(u_x_range.x, u_x_range.y, xz.x), a_height,
+                         mix(u_z_range.x, u_z_range.y, xz.y));
+    v_normal = mat3(transpose(inverse(m_model))) * decode_normal(a_normal);
+    v_frag_pos = vec3(m_model * vec4(position, 1.0));
+    // grid coordinates (column, row) of the vertex, recovered from the index
+    if (u_indexed) {
+        v_grid = vec2(gl_VertexID % u_grid_nx, gl_VertexID / u_grid_nx);
+    } else {
+        int quad = gl_VertexID / 6;
+        v_grid = vec2(ivec2(quad % (u_grid_nx - 1), quad / (u_grid_nx - 1)) + 
+                      quad_offsets[gl_VertexID % 6]);
+    }
+    v_height = a_height;
+    
+    gl_Position = m_proj * m_view * m_model * vec4(position, 1.0);
+
+}
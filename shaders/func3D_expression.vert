@@ -0,0 +1,62 @@
+#version 330 core
+
+// no vertex attributes: the grid is generated from gl_VertexID, 6 vertices per quad, the
+// heights are computed from an expression spliced in by ShaderManager.get_variant()
+
+out vec3 v_normal;
+out vec3 v_frag_pos;
+out vec3 v_barycentric;
+out float v_height;
+
+// per-frame camera state, shared by all programs (see ShaderManager.write_camera())
+layout (std140) uniform Camera {
+    mat4 m_proj;
+    mat4 m_view;
+    vec3 u_cam_pos;
+};
+uniform mat4 m_model;
+
+uniform ivec2 u_grid_size;      // (nx, nz)
+uniform vec2 u_x_model;         // model space x of the first and last columns
+uniform vec2 u_z_model;         // model space z of the first and last rows
+uniform vec2 u_x_domain;        // expression x of the first and last columns
+uniform vec2 u_z_domain;        // expression z of the first and last rows
+uniform float u_y_scale;        // model space heights per expression unit
+uniform float u_time;           // t of the expression (seconds)
+
+$grid
+
+// the expression of x, z and t (see expression.Expression)
+float get_height(float x, float z, float t)
+{
+    return $expression;
+}
+//
+vec3 get_position(ivec2 p)
+{
+    vec2 f = vec2(p) / vec2(u_grid_size - 1);
+    float x = mix(u_x_domain.x, u_x_domain.y, f.x);
+    float z = mix(u_z_domain.x, u_z_domain.y, f.y);
+    return vec3(mix(u_x_model.x, u_x_model.y, f.x),
+                u_y_scale * get_height(x, z, u_time),
+                mix(u_z_model.x, u_z_model.y, f.y));
+}
+
+void main()
+{
+    int quad = gl_VertexID / 6;
+    int corner = gl_VertexID % 6;
+    ivec2 p = ivec2(quad % (u_grid_size.x - 1), quad / (u_grid_size.x - 1)) + quad_offsets[corner];
+
+    vec3 position = get_position(p);
+    vec3 normal = get_normal(p, position);
+
+    v_normal = mat3(transpose(inverse(m_model))) * normal;
+    v_frag_pos = vec3(m_model * vec4(position, 1.0));
+    v_barycentric = barycentric_coords[corner];
+    v_height = position.y;
+    
+    gl_Position = m_proj * m_view * m_model * vec4(position, 1.0);
+
+}
+
@@ -0,0 +1,24 @@
+#version 330 core
+
+layout (location=0) out vec4 frag_color;
+
+in vec3 v_normal;
+in vec3 v_frag_pos;
+in vec2 v_grid;
+in float v_height;
+
+// per-frame camera state, shared by all programs (see ShaderManager.write_camera())
+layout (std140) uniform Camera {
+    mat4 m_proj;
+    mat4 m_view;
+    vec3 u_cam_pos;
+};
+
+$shading
+
+void main()
+{
+    // distance to the closest quad edge, in grid cells, for the wireframe
+    vec2 dist = abs(fract(v_grid - 0.5) - 0.5);
+    frag_color = shade(v_height, min(dist.x, dist.y));
+}
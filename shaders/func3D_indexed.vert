@@ -0,0 +1,31 @@
+#version 330 core
+
+layout (location=0) in vec3 a_position;
+layout (location=1) in vec3 a_normal;
+
+out vec3 v_normal;
+out vec3 v_frag_pos;
+out vec2 v_grid;
+out float v_height;
+
+// per-frame camera state, shared by all programs (see ShaderManager.write_camera())
+layout (std140) uniform Camera {
+    mat4 m_proj;
+    mat4 m_view;
+    vec3 u_cam_pos;
+};
+uniform mat4 m_model;
+uniform int u_grid_nx;
+
+void main()
+{
+    v_normal = mat3(transpose(inverse(m_model))) * normalize(a_normal);
+    v_frag_pos = vec3(m_model * vec4(a_position, 1.0));
+    // grid coordinates (column, row) of the vertex, recovered from the index
+    v_grid = vec2(gl_VertexID % u_grid_nx, gl_VertexID / u_grid_nx);
+    v_height = a_position.y;
+    
+    gl_Position = m_proj * m_view * m_model * vec4(a_position, 1.0);
+
+}
+
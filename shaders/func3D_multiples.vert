@@ -0,0 +1,54 @@
+#version 330 core
+
+// one instance per surface (layer of the height array), 6 vertices per quad generated
+// from gl_VertexID
+layout (location=0) in mat4 a_instance_model;   // placement of the surface in the layout
+
+out vec3 v_normal;
+out vec3 v_frag_pos;
+out vec3 v_barycentric;
+out float v_height;
+
+// per-frame camera state, shared by all programs (see ShaderManager.write_camera())
+layout (std140) uniform Camera {
+    mat4 m_proj;
+    mat4 m_view;
+    vec3 u_cam_pos;
+};
+uniform mat4 m_model;
+
+uniform sampler2DArray u_heights;   // (nx, nz, surfaces) R32F, R16F or R16
+uniform vec2 u_height_range;        // (offset, scale) from texels to heights
+uniform sampler2D u_xcoords;        // (nx, 1) R32F
+uniform sampler2D u_zcoords;        // (nz, 1) R32F
+uniform ivec2 u_grid_size;          // (nx, nz)
+
+$grid
+
+//
+vec3 get_position(ivec2 p)
+{
+    return vec3(texelFetch(u_xcoords, ivec2(p.x, 0), 0).r,
+                u_height_range.x + u_height_range.y * 
+                texelFetch(u_heights, ivec3(p, gl_InstanceID), 0).r,
+                texelFetch(u_zcoords, ivec2(p.y, 0), 0).r);
+}
+
+void main()
+{
+    int quad = gl_VertexID / 6;
+    int corner = gl_VertexID % 6;
+    ivec2 p = ivec2(quad % (u_grid_size.x - 1), quad / (u_grid_size.x - 1)) + quad_offsets[corner];
+
+    vec3 position = get_position(p);
+    vec3 normal = get_normal(p, position);
+
+    mat4 model = m_model * a_instance_model;
+    v_normal = mat3(transpose(inverse(model))) * normal;
+    v_frag_pos = vec3(model * vec4(position, 1.0));
+    v_barycentric = barycentric_coords[corner];
+    v_height = position.y;
+
+    gl_Position = m_proj * m_view * model * vec4(position, 1.0);
+
+}
@@ -0,0 +1,38 @@
+#version 330 core
+
+// no vertex attributes: the grid is generated from gl_VertexID, 6 vertices per quad
+
+out vec3 v_normal;
+out vec3 v_frag_pos;
+out vec3 v_barycentric;
+out float v_height;
+
+// per-frame camera state, shared by all programs (see ShaderManager.write_camera())
+layout (std140) uniform Camera {
+    mat4 m_proj;
+    mat4 m_view;
+    vec3 u_cam_pos;
+};
+uniform mat4 m_model;
+
+$height_texture
+$grid
+
+void main()
+{
+    int quad = gl_VertexID / 6;
+    int corner = gl_VertexID % 6;
+    ivec2 p = ivec2(quad % (u_grid_size.x - 1), quad / (u_grid_size.x - 1)) + quad_offsets[corner];
+
+    vec3 position = get_position(p);
+    vec3 normal = get_normal(p, position);
+
+    v_normal = mat3(transpose(inverse(m_model))) * normal;
+    v_frag_pos = vec3(m_model * vec4(position, 1.0));
+    v_barycentric = barycentric_coords[corner];
+    v_height = position.y;
+    
+    gl_Position = m_proj * m_view * m_model * vec4(position, 1.0);
+
+}
+
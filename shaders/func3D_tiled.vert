@@ -0,0 +1,112 @@
+#version 330 core
+
+// one instance per visible tile, 6 vertices per quad generated from gl_VertexID
+layout (location=0) in ivec4 a_tile;              // (j0, i0, quads in x, quads in z)
+layout (location=1) in ivec4 a_neighbour_levels;  // LOD levels of the (left, right, up, down)
+                                                  // tiles, 0 past the grid border
+layout (location=2) in ivec4 a_corner_levels;     // coarsest level of the tiles sharing the
+                                                  // (up left, up right, down left, down right)
+                                                  // corners
+
+out vec3 v_normal;
+out vec3 v_frag_pos;
+out vec3 v_barycentric;
+out float v_height;
+
+// per-frame camera state, shared by all programs (see ShaderManager.write_camera())
+layout (std140) uniform Camera {
+    mat4 m_proj;
+    mat4 m_view;
+    vec3 u_cam_pos;
+};
+uniform mat4 m_model;
+
+$height_texture
+
+uniform int u_level;            // LOD level of the tiles drawn, heights read from the mip
+                                // level of decimated heights
+uniform int u_step;             // grid points per quad at the current LOD level
+uniform int u_quads;            // quads per tile side at the current LOD level
+
+$grid
+
+// level a point of the tile border is read at: the coarsest of the tiles sharing it, so
+// neighbouring tiles agree on the heights of their common edges and corners
+int get_level(ivec2 local)
+{
+    bool left = local.x == 0, right = local.x == a_tile.z;
+    bool up = local.y == 0, down = local.y == a_tile.w;
+    if (up && left) return a_corner_levels.x;
+    if (up && right) return a_corner_levels.y;
+    if (down && left) return a_corner_levels.z;
+    if (down && right) return a_corner_levels.w;
+    int level = u_level;
+    if (left) level = max(level, a_neighbour_levels.x);
+    if (right) level = max(level, a_neighbour_levels.y);
+    if (up) level = max(level, a_neighbour_levels.z);
+    if (down) level = max(level, a_neighbour_levels.w);
+    return level;
+}
+//
+void get_vertex(ivec2 local, out vec3 position, out vec3 normal)
+{
+    // position and normal on the grid of the point's level
+    ivec2 p = a_tile.xy + local;
+    height_level = get_level(local);
+    position = get_position(p);
+    normal = get_normal(p, position, 1 << height_level);
+}
+
+void main()
+{
+    int quad = gl_VertexID / 6;
+    int corner = gl_VertexID % 6;
+    // local grid point, collapsed onto the tile border when the tile is smaller than 
+    // u_quads * u_step (giving degenerate triangles)
+    ivec2 q = ivec2(quad % u_quads, quad / u_quads) + quad_offsets[corner];
+    ivec2 local = min(q * u_step, a_tile.zw);
+
+    vec3 position, normal;
+    get_vertex(local, position, normal);
+
+    // stitching: vertices on an edge shared with a coarser tile are moved onto the 
+    // coarser tile's edge, so no cracks can open between LOD levels
+    int coarse = 0;
+    int axis = 0;
+    if (local.x == 0 && a_neighbour_levels.x > u_level)
+        { coarse = 1 << a_neighbour_levels.x; axis = 1; }
+    else if (local.x == a_tile.z && a_neighbour_levels.y > u_level)
+        { coarse = 1 << a_neighbour_levels.y; axis = 1; }
+    else if (local.y == 0 && a_neighbour_levels.z > u_level)
+        { coarse = 1 << a_neighbour_levels.z; axis = 0; }
+    else if (local.y == a_tile.w && a_neighbour_levels.w > u_level)
+        { coarse = 1 << a_neighbour_levels.w; axis = 0; }
+    
+    if (coarse > 0)
+    {
+        int l = local[axis];
+        int a = (l / coarse) * coarse;
+        int b = min(a + coarse, a_tile.zw[axis]);
+        if (l != a)
+        {
+            ivec2 la = local, lb = local;
+            la[axis] = a;
+            lb[axis] = b;
+            vec3 position_a, normal_a, position_b, normal_b;
+            get_vertex(la, position_a, normal_a);
+            get_vertex(lb, position_b, normal_b);
+            float t = float(l - a) / float(b - a);
+            position = mix(position_a, position_b, t);
+            normal = normalize(mix(normal_a, normal_b, t));
+        }
+    }
+
+    v_normal = mat3(transpose(inverse(m_model))) * normal;
+    v_frag_pos = vec3(m_model * vec4(position, 1.0));
+    v_barycentric = barycentric_coords[corner];
+    v_height = position.y;
+    
+    gl_Position = m_proj * m_view * m_model * vec4(position, 1.0);
+
+}
+
@@ -0,0 +1,43 @@
+// Grid generated from gl_VertexID (6 vertices per quad), shared by the programs without
+// vertex attributes, inserted as $grid (see ShaderManager.load_program()). The program
+// defines get_position() of a grid point (column, row) and the u_grid_size uniform.
+
+// (column, row) offsets of the two triangles of a quad, same winding as Func3DMesh
+const ivec2 quad_offsets[6] = ivec2[6](
+    ivec2(0, 0), ivec2(0, 1), ivec2(1, 0),
+    ivec2(1, 0), ivec2(0, 1), ivec2(1, 1)
+);
+const vec3 barycentric_coords[6] = vec3[6](
+    vec3(1, 0, 0), vec3(1, 1, 0), vec3(0, 0, 1),
+    vec3(1, 0, 0), vec3(0, 1, 1), vec3(0, 0, 1)
+);
+
+vec3 get_position(ivec2 p);
+//
+vec3 get_normal(ivec2 p, vec3 P, int step)
+{
+    // central differences, summing the cross products of the available neighbours
+    // step grid points away (clamped to the grid)
+    vec3 LP, PR, UP, PD;
+    ivec2 last = u_grid_size - 1;
+    bool has_L = p.x > 0;
+    bool has_R = p.x < last.x;
+    bool has_U = p.y > 0;
+    bool has_D = p.y < last.y;
+    if (has_L) LP = P - get_position(ivec2(max(p.x - step, 0), p.y));
+    if (has_R) PR = get_position(ivec2(min(p.x + step, last.x), p.y)) - P;
+    if (has_U) UP = P - get_position(ivec2(p.x, max(p.y - step, 0)));
+    if (has_D) PD = get_position(ivec2(p.x, min(p.y + step, last.y))) - P;
+
+    vec3 n = vec3(0.0);
+    if (has_U && has_L) n += cross(UP, LP);
+    if (has_U && has_R) n += cross(UP, PR);
+    if (has_D && has_L) n += cross(PD, LP);
+    if (has_D && has_R) n += cross(PD, PR);
+    return normalize(n);
+}
+//
+vec3 get_normal(ivec2 p, vec3 P)
+{
+    return get_normal(p, P, 1);
+}
@@ -0,0 +1,22 @@
+// Grid points read from the height texture (a ring buffer over z) and the axis
+// textures, shared by the texture and tiled programs, inserted as $height_texture.
+
+uniform sampler2D u_heights;    // (nx, nz) R32F, R16F or R16
+uniform vec2 u_height_range;    // (offset, scale) from texels to heights
+uniform sampler2D u_xcoords;    // (nx, 1) R32F
+uniform sampler2D u_zcoords;    // (nz, 1) R32F
+uniform ivec2 u_grid_size;      // (nx, nz)
+uniform int u_row_offset;       // ring buffer offset of the first grid row
+
+// mip level of u_heights read by get_position(): decimated heights, sample p >> level
+// (set by the tiled program, see Func3DTiledObj)
+int height_level = 0;
+
+//
+vec3 get_position(ivec2 p)
+{
+    ivec2 t = ivec2(p.x, (p.y + u_row_offset) % u_grid_size.y) >> height_level;
+    return vec3(texelFetch(u_xcoords, ivec2(p.x, 0), 0).r,
+                u_height_range.x + u_height_range.y * texelFetch(u_heights, t, height_level).r,
+                texelFetch(u_zcoords, ivec2(p.y, 0), 0).r);
+}
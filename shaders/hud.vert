@@ -0,0 +1,16 @@
+#version 330 core
+
+// screen-aligned quad generated from gl_VertexID (triangle strip, 4 vertices)
+out vec2 v_uv;
+
+uniform vec4 u_rect;    // (left, top, width, height) in normalized device coordinates
+
+void main()
+{
+    vec2 corner = vec2(gl_VertexID & 1, gl_VertexID >> 1);
+    // the texture is uploaded bottom row first
+    v_uv = vec2(corner.x, 1.0 - corner.y);
+    gl_Position = vec4(u_rect.x + corner.x * u_rect.z, u_rect.y - corner.y * u_rect.w, 
+                       0.0, 1.0);
+
+}
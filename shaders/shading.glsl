@@ -0,0 +1,89 @@
+// Colormap lookup, lighting and wireframe of the surface fragment shaders, inserted as
+// $shading (see ShaderManager.load_program()). The program declares the Camera block
+// and the v_normal and v_frag_pos inputs.
+
+uniform bool u_use_wireframe;
+uniform bool u_use_lighting;
+//uniform float u_mesh_alpha;
+uniform vec3 u_Ipos;
+// colormap lookup by height
+uniform sampler2D u_colormap;   // (N, 1) RGB
+uniform float u_vmin;
+uniform float u_vmax;
+uniform float u_gamma;
+// simple lighting constants
+//const vec3 Ipos = vec3(2.5, 5, -2.5);
+const vec3 Ia = vec3(1) * 0.2;
+const vec3 Id = vec3(1) * 0.8;
+const vec3 Is = vec3(1) * 0.3;
+
+// wireframe rendering
+const float line_width = 0.02;
+const vec3 fill_color = vec3(0.9);
+const vec3 stroke_color = vec3(0.0);
+
+//
+vec3 get_color(float height)
+{
+    float t = clamp((height - u_vmin) / (u_vmax - u_vmin), 0.0, 1.0);
+    t = pow(t, u_gamma);
+    int n_colors = textureSize(u_colormap, 0).x;
+    return texelFetch(u_colormap, ivec2(min(int(t * n_colors), n_colors - 1), 0), 0).rgb;
+}
+//
+vec3 apply_lighting(vec3 color)
+{
+    vec3 normal = normalize(v_normal);
+
+    // ambient component
+    vec3 ambient = Ia;
+
+    // diffuse component
+    vec3 light_dir = normalize(u_Ipos - v_frag_pos);
+    float diff = max(0, dot(light_dir, normal));
+    vec3 diffuse = diff * Id;
+
+    // specular component
+    vec3 view_dir = normalize(u_cam_pos - v_frag_pos);
+    vec3 reflect_dir = reflect(-light_dir, normal);
+    float spec = pow(max(dot(view_dir, reflect_dir), 0), 16);
+    vec3 specular = spec * Is;
+
+    return color * (ambient + diffuse + specular);
+}
+//
+float aastep(float threshold, float dist)
+{
+   float afwidth = fwidth(dist) * 0.5;
+   return smoothstep(threshold - afwidth, threshold + afwidth, dist);
+}
+//
+vec4 get_wireframe(float d, vec3 fill_color, vec3 stroke_color)
+{
+   // d: distance to the closest edge, see the program's main()
+   float edge = 1.0 - aastep(line_width, d);
+
+   // now compute the final color of the mesh
+   vec4 outColor = vec4(0.0);
+   vec3 mainStroke = mix(fill_color, stroke_color, edge);
+   outColor.a = 1.0;
+   //outColor.a = 0.6;
+   //outColor.a = u_mesh_alpha;
+   outColor.rgb = mainStroke;
+
+   return outColor;
+}
+//
+vec4 shade(float height, float edge_distance)
+{
+    vec3 color = get_color(height);
+    vec3 fcolor;
+    if (u_use_lighting)
+        fcolor = apply_lighting(color);
+    else
+        fcolor = color;
+
+    if (u_use_wireframe)
+        return get_wireframe(edge_distance, fcolor, stroke_color);
+    return vec4(fcolor, 1.0);
+}
@@ -0,0 +1,27 @@
+import gc, os, sys
+import pytest
+
+# the modules import each other from the repository root, and shaders are loaded from
+# relative paths
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+
+#
+@pytest.fixture
+def app():
+    # headless application without the on-disk mesh cache, skipped without EGL
+    from func3D import Func3D
+    try:
+        app = Func3D((160, 120), headless=True)
+    except Exception as error:
+        pytest.skip(f'no headless OpenGL context: {error}')
+    app.mesh_cache = None
+    yield app
+    app.mesh_builder.shutdown()
+    app.ctx.release()
+    # collected now rather than while the next test's context is current (the EGL
+    # context of a collected app left the next framebuffer incomplete)
+    del app
+    gc.collect()
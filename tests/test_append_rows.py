@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+NZ, NX = 20, 32
+
+
+#
+def get_history():
+    # rows growing in amplitude, all below zero at first
+    rng = np.random.default_rng(2)
+    return (rng.random((30, NX)) - 0.8) * np.linspace(1.0, 40.0, 30)[:, None]
+
+
+#
+@pytest.mark.parametrize('height_format', ('f4', 'u2'))
+def test_scroll_from_flat_history_matches_load(app, height_format):
+    x, z = np.linspace(0.0, 1.0, NX), np.linspace(-1.0, 1.0, NZ)
+    app.load_data(np.zeros((NZ, NX)), x, z, equal_axes=False, as_texture=True, 
+                  height_format=height_format, func_id='scroll')
+    history = get_history()
+    for i0 in range(0, len(history), 3):
+        app.append_rows(history[i0:i0+3])
+    scrolled = app.scene.objects['scroll']
+    heights = scrolled.get_height_grid()
+    app.render()
+    image = np.array(app.read_image())
+
+    app.scene.clear()
+    app.load_data(history[-NZ:], x, z, equal_axes=False, as_texture=True, 
+                  height_format=height_format, func_id='loaded')
+    loaded = app.scene.objects['loaded']
+    app.render()
+    reference = np.array(app.read_image())
+    assert np.isclose(scrolled.mesh.y_norm, loaded.mesh.y_norm)
+    assert np.allclose(scrolled.mesh.ylim, loaded.mesh.ylim)
+    assert np.allclose((scrolled.vmin, scrolled.vmax), loaded.mesh.ylim)
+    assert np.allclose(heights, loaded.get_height_grid(), atol=4 * loaded.mesh.heights.span / 65535)
+    assert (reference != reference[0, 0]).any()
+    assert np.count_nonzero(image != reference) <= 0.001 * image.size
+
+
+#
+def test_adjusted_color_range_is_kept(app):
+    ramp = np.linspace(0.0, 1.0, NX) * np.ones((NZ, 1))
+    app.load_data(ramp, equal_axes=False, as_texture=True, func_id='scroll')
+    obj = app.scene.objects['scroll']
+    obj.adjust_range(dmin=0.5)
+    vmin, vmax = obj.vmin, obj.vmax
+    app.append_rows(np.full((1, NX), 4.0))
+    # the heights are scaled by 1/4, the color range with them
+    assert np.allclose((obj.vmin, obj.vmax), (vmin / 4.0, vmax / 4.0))
+
+
+#
+def test_append_rows_needs_a_texture_surface(app):
+    app.load_data(np.zeros((NZ, NX)), equal_axes=False, func_id='vbo')
+    with pytest.raises(ValueError, match='as_texture=True'):
+        app.append_rows(np.ones((1, NX)))
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+# Tolerance of compact against float32 vertices when shaded. The 16-bit x/z move the
+# rasterized positions by up to 1/65535 of the axis range and the octahedral normals
+# shift the lighting by a level or two, so some pixels differ slightly. The interpolated
+# height moves with the positions, so a few pixels on colormap band edges and silhouettes
+# flip to the neighbouring color, with differences up to the full channel range.
+MAX_FLIPPED = 0.005         # fraction of surface pixels differing by more than 8 levels
+MAX_MEAN_DIFFERENCE = 0.5   # mean channel difference over the image (levels of 255)
+# positions and normals of the vertex data
+MAX_POSITION_ERROR = 1.0 / 65535
+MAX_NORMAL_ERROR = 0.05     # degrees
+
+
+#
+def get_noisy_surface(n=128, noise=0.1):
+    x, z = np.linspace(-3.0, 3.0, n), np.linspace(-2.0, 2.0, n)
+    y = np.sin(x[None, :]) * np.cos(1.5 * z[:, None])
+    y += noise * np.random.default_rng(0).standard_normal((n, n))
+    return x, y, z
+
+
+#
+@pytest.mark.parametrize('indexed', (False, True))
+def test_compact_shading_matches_float(app, indexed):
+    x, y, z = get_noisy_surface()
+    images = []
+    for compact in (False, True):
+        app.scene.clear()
+        app.load_data(y, x, z, equal_axes=False, func_id='f', indexed=indexed,
+                      compact=compact)
+        app.render()
+        images.append(np.array(app.read_image()).astype(int))
+    reference, image = images
+    surface = (reference != reference[0, 0]).any(axis=2)
+    difference = np.abs(image - reference)
+    flipped = np.count_nonzero(difference.max(axis=2) > 8)
+    assert surface.sum() > 0.2 * surface.size
+    assert flipped <= MAX_FLIPPED * surface.sum()
+    assert difference.mean() <= MAX_MEAN_DIFFERENCE
+
+#
+def test_compact_vertex_accuracy():
+    from OpenGLAPI.mesh import Func3DMesh
+    x, y, z = get_noisy_surface(64)
+    reference = Func3DMesh(x, y, z, False, backend='numpy', indexed=True, max_resolution=None)
+    mesh = Func3DMesh(x, y, z, False, backend='numpy', indexed=True, max_resolution=None,
+                      compact=True)
+    data = mesh.vertex_data.view(mesh.compact_dtype)
+    vertices = reference.vertex_data.reshape(-1, 6)
+    (x0, x1), (z0, z1) = mesh.get_xz_range()
+    xz = data['xz'] / 65535.0
+    assert np.abs(x0 + xz[:, 0] * (x1 - x0) - vertices[:, 0]).max() <= \
+           MAX_POSITION_ERROR * (x1 - x0)
+    assert np.abs(z0 + xz[:, 1] * (z1 - z0) - vertices[:, 2]).max() <= \
+           MAX_POSITION_ERROR * (z1 - z0)
+    assert np.array_equal(data['height'], vertices[:, 1])
+
+    # inverse of Func3DMesh.encode_octahedral(), as in func3D_compact.vert
+    n = data['normal']
+    p = np.stack([n & 0xFFFF, n >> 16], axis=1) / 65535.0 * 2.0 - 1.0
+    ny = 1.0 - np.abs(p).sum(axis=1)
+    folded = (1.0 - np.abs(p[:, ::-1])) * np.where(p >= 0.0, 1.0, -1.0)
+    p = np.where((ny < 0.0)[:, None], folded, p)
+    normals = np.stack([p[:, 0], ny, p[:, 1]], axis=1)
+    normals /= np.linalg.norm(normals, axis=1, keepdims=True)
+    cos = np.clip(np.sum(normals * vertices[:, 3:6], axis=1), -1.0, 1.0)
+    assert np.degrees(np.arccos(cos)).max() <= MAX_NORMAL_ERROR
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from expression import Expression
+
+# heights of get_height() in func3D_expression.vert, captured with transform feedback
+VERTEX_SHADER = '''
+#version 330 core
+in vec2 in_xz;
+out float height;
+
+float get_height(float x, float z, float t)
+{
+    return $expression;
+}
+
+void main()
+{
+    height = get_height(in_xz.x, in_xz.y, 0.0);
+}
+'''
+# integer powers of negative bases, GLSL pow() is undefined there
+EXPRESSIONS = ('x ** 3', 'pow(x, 3)', 'pow(x, 2.0) - pow(z, 5)', 'pow(x, -3)',
+               'pow(x - z, 7)', 'x ** -6 + pow(z, 4.0)')
+
+
+#
+def evaluate_glsl(ctx, expression, x, z):
+    source = VERTEX_SHADER.replace('$expression', expression.glsl)
+    program = ctx.program(vertex_shader=source, varyings=['height'])
+    xz = np.stack([x, z], axis=1).astype('f4')
+    vbo = ctx.buffer(xz.tobytes())
+    result = ctx.buffer(reserve=4 * len(xz))
+    vao = ctx.vertex_array(program, [(vbo, '2f', 'in_xz')])
+    vao.transform(result, vertices=len(xz))
+    heights = np.frombuffer(result.read(), dtype='f4')
+    for obj in (vao, result, vbo, program):
+        obj.release()
+    return heights
+
+
+#
+@pytest.mark.parametrize('source', EXPRESSIONS)
+def test_negative_bases_match_numpy(app, source):
+    # no zeros, for the negative exponents
+    x, z = np.meshgrid(np.linspace(-2.5, 1.5, 16), np.linspace(-1.75, 2.25, 16))
+    x, z = x.ravel(), z.ravel()
+    expression = Expression(source)
+    heights = evaluate_glsl(app.ctx, expression, x, z)
+    expected = expression.evaluate(x.astype('f4'), z.astype('f4'))
+    assert np.isfinite(heights).all()
+    assert np.allclose(heights, expected, rtol=1e-5, atol=1e-5)
+
+
+#
+def test_pow_writes_out_integer_powers():
+    assert Expression('pow(x, 3)').glsl == '(x * x * x)'
+    assert Expression('pow(x, 2.0)').glsl == Expression('x ** 2').glsl
+    assert 'sign(' in Expression('pow(x, 7)').glsl
+    # non-integer powers of negative bases are nan in numpy and undefined in GLSL
+    assert Expression('pow(x, 0.5)').glsl == 'pow(x, 0.5)'
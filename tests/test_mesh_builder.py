@@ -0,0 +1,100 @@
+import threading, time
+import numpy as np
+#
+from mesh_builder import BackgroundMeshBuilder
+
+
+#
+def wait_for(builder, timeout=10.0):
+    # polls until no job is in flight, returns the number of meshes handed back
+    n_done, t_end = 0, time.perf_counter() + timeout
+    while builder.is_busy():
+        assert time.perf_counter() < t_end, 'background build did not finish'
+        n_done += builder.poll()
+        time.sleep(0.001)
+    return n_done
+
+#
+def blocking_build(started, release, result):
+    # build(progress) that reports progress until released
+    def build(progress):
+        started.set()
+        while not release.wait(0.001):
+            progress(0.5, 'building')
+        progress(1.0, 'done')
+        return result
+    return build
+
+
+#
+def test_newer_submission_aborts_running_build():
+    builder = BackgroundMeshBuilder()
+    done = []
+    started, release = threading.Event(), threading.Event()
+    builder.submit('f', blocking_build(started, release, 'old'),
+                   lambda mesh, t: done.append(mesh))
+    assert started.wait(5.0)
+    builder.submit('f', lambda progress: 'new', lambda mesh, t: done.append(mesh))
+    release.set()
+    assert wait_for(builder) == 1
+    assert done == ['new']
+    builder.shutdown()
+
+#
+def test_newer_submission_cancels_queued_build():
+    builder = BackgroundMeshBuilder()
+    done, ran = [], []
+    started, release = threading.Event(), threading.Event()
+    # keeps the single worker busy, so the next job stays queued
+    builder.submit('busy', blocking_build(started, release, 'busy'),
+                   lambda mesh, t: done.append(mesh))
+    assert started.wait(5.0)
+    queued = builder.submit('f', lambda progress: ran.append('queued') or 'queued',
+                            lambda mesh, t: done.append(mesh))
+    builder.submit('f', lambda progress: 'new', lambda mesh, t: done.append(mesh))
+    assert queued.future.cancelled()
+    release.set()
+    assert wait_for(builder) == 2
+    assert sorted(done) == ['busy', 'new'] and ran == []
+    builder.shutdown()
+
+#
+def test_other_keys_are_not_cancelled():
+    builder = BackgroundMeshBuilder()
+    done = []
+    for key in ('a', 'b'):
+        builder.submit(key, lambda progress, key=key: key, lambda mesh, t: done.append(mesh))
+    assert wait_for(builder) == 2
+    assert sorted(done) == ['a', 'b']
+    builder.shutdown()
+
+#
+def test_failed_build_is_not_handed_back(capsys):
+    builder = BackgroundMeshBuilder()
+    done = []
+    def build(progress):
+        raise ValueError('bad data')
+    builder.submit('f', build, lambda mesh, t: done.append(mesh))
+    assert wait_for(builder) == 0
+    assert done == [] and 'background build of f failed' in capsys.readouterr().out
+    builder.shutdown()
+
+#
+def test_headless_background_load_is_swapped_in(app, tmp_path):
+    x, z = np.linspace(-1, 1, 40), np.linspace(-1, 1, 30)
+    y = np.sin(3 * x[None, :]) * np.cos(2 * z[:, None])
+    app.load_data(y, x, z, equal_axes=False, func_id='f', background=True)
+    t_end = time.perf_counter() + 10.0
+    while 'f' not in app.scene.objects:
+        assert time.perf_counter() < t_end, 'background build did not finish'
+        # update() polls the builder, and must not read input devices when headless
+        app.update()
+        time.sleep(0.001)
+    # a replacement is swapped in by render_image()
+    app.load_data(2 * y, x, z, equal_axes=False, func_id='f', background=True)
+    while app.mesh_builder.is_busy():
+        assert time.perf_counter() < t_end, 'background build did not finish'
+        app.render_image(str(tmp_path / 'frame.png'))
+        time.sleep(0.001)
+    assert np.isclose(app.scene.objects['f'].mesh.y_norm, 2 * np.max(np.abs(y)))
+    assert (tmp_path / 'frame.png').exists()
@@ -0,0 +1,29 @@
+import numpy as np
+
+
+#
+def test_multiples_are_not_pickable(app, capsys):
+    x, z = np.linspace(-2.0, 2.0, 32), np.linspace(-1.0, 1.0, 24)
+    stack = np.sin(x[None, None, :] + np.arange(4)[:, None, None]) * np.cos(z[None, :, None])
+    app.load_multiples(stack, x, z, func_id='multiples')
+    app.render()
+    assert app.pick((80, 60)) is None
+    # picking is not enabled, mouse motion does not pick
+    app.toggle_picking()
+    assert not app.picking
+    app.pick_pos = (80, 60)
+    app.update()
+    assert capsys.readouterr().out.count('WARNING: picking is not supported') == 2
+
+
+#
+def test_pick_surface(app):
+    x, z = np.linspace(-2.0, 2.0, 32), np.linspace(-1.0, 1.0, 24)
+    y = np.sin(x[None, :]) * np.cos(z[:, None])
+    app.load_data(y, x, z, equal_axes=False, func_id='f')
+    app.render()
+    app.toggle_picking()
+    assert app.picking
+    result = app.pick((80, 60))
+    assert result is not None
+    assert np.isclose(result['value'], y[result['row'], result['col']])
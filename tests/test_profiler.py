@@ -0,0 +1,130 @@
+import csv, json
+import numpy as np
+import pytest
+#
+import profiler
+from profiler import FrameProfiler
+
+
+#
+class FakeClock:
+    # perf_counter_ns() advanced by the test
+    def __init__(self):
+        self.ns = 10**9
+
+    def perf_counter_ns(self):
+        return self.ns
+
+#
+class FakeQuery:
+    # timer query whose elapsed time (ns) is taken from a list when it ends
+    def __init__(self, gpu_times):
+        self.gpu_times = gpu_times
+        self.elapsed = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.elapsed = self.gpu_times.pop(0)
+
+#
+class FakeContext:
+    def __init__(self, gpu_times):
+        self.gpu_times = gpu_times
+
+    def query(self, time=False):
+        return FakeQuery(self.gpu_times)
+
+
+#
+@pytest.fixture
+def profiled(monkeypatch):
+    # 50 frames of synthetic phase times (ns), profiled through a fake clock and fake
+    # GPU timer queries
+    clock = FakeClock()
+    monkeypatch.setattr(profiler, 'time', clock)
+    rng = np.random.default_rng(0)
+    n = 50
+    times = {'events' : rng.integers(10**5, 10**6, n), 'update' : rng.integers(10**5, 10**6, n),
+             'render' : rng.integers(10**6, 10**7, n), 'gpu' : rng.integers(10**6, 10**7, n)}
+    prof = FrameProfiler(FakeContext(list(times['gpu'])), enabled=True)
+    for i in range(n):
+        prof.begin_frame()
+        for phase in ('events', 'update'):
+            clock.ns += int(times[phase][i])
+            prof.mark(phase)
+        with prof.gpu_timer('surface'):
+            clock.ns += int(times['render'][i])
+        prof.mark('render')
+        prof.end_frame()
+    prof.flush()
+    return prof, times
+
+
+#
+def test_percentiles(profiled):
+    prof, times = profiled
+    stats = prof.get_stats()
+    ms = {name : values / 1e6 for name, values in times.items()}
+    for phase in ('events', 'update', 'render'):
+        assert stats['cpu ' + phase] == pytest.approx(np.percentile(ms[phase], (50, 95, 99)))
+    frame = ms['events'] + ms['update'] + ms['render']
+    assert stats['cpu frame'] == pytest.approx(np.percentile(frame, (50, 95, 99)))
+    # query results are read PROFILER_QUERY_LATENCY frames late, but all of them count
+    assert stats['gpu surface'] == pytest.approx(np.percentile(ms['gpu'], (50, 95, 99)))
+    assert [row[0] for row in prof.get_rows()] == ['(ms)'] + sorted(stats)
+
+#
+def test_rolling_window(monkeypatch):
+    monkeypatch.setattr(profiler, 'PROFILER_WINDOW', 10)
+    prof = FrameProfiler(FakeContext([]), enabled=True)
+    for dt in range(1, 31):
+        prof.add_sample('cpu render', dt * 10**6)
+    assert prof.get_stats()['cpu render'] == pytest.approx(
+        np.percentile(np.arange(21, 31), (50, 95, 99)))
+
+#
+def test_disabled_profiler_records_nothing():
+    prof = FrameProfiler(FakeContext([]), enabled=False)
+    prof.begin_frame()
+    prof.mark('events')
+    prof.end_frame()
+    assert prof.get_stats() == {} and len(prof.records) == 0
+
+#
+def test_export_csv(profiled, tmp_path):
+    prof, times = profiled
+    path = tmp_path / 'profile.csv'
+    prof.export_csv(path)
+    with open(path) as file:
+        rows = list(csv.DictReader(file))
+    assert len(rows) == 50
+    for i, row in enumerate(rows):
+        assert int(row['frame']) == i
+        for phase in ('events', 'update', 'render'):
+            assert float(row['cpu ' + phase]) == pytest.approx(times[phase][i] / 1e6, abs=1e-3)
+        assert float(row['gpu surface']) == pytest.approx(times['gpu'][i] / 1e6, abs=1e-3)
+    # frame start times follow the sum of the phases
+    starts = np.array([float(row['start_ms']) for row in rows])
+    totals = (times['events'] + times['update'] + times['render']) / 1e6
+    assert starts[1:] == pytest.approx(np.cumsum(totals)[:-1], abs=1e-3)
+
+#
+def test_export_trace(profiled, tmp_path):
+    prof, times = profiled
+    path = tmp_path / 'trace.json'
+    prof.export_trace(path)
+    with open(path) as file:
+        events = json.load(file)['traceEvents']
+    spans = [event for event in events if event['ph'] == 'X']
+    cpu = [event for event in spans if event['tid'] == 0]
+    gpu = [event for event in spans if event['tid'] == 1]
+    assert len(cpu) == 3 * 50 and len(gpu) == 50
+    renders = [event for event in cpu if event['name'] == 'render']
+    for i, (render, event) in enumerate(zip(renders, gpu)):
+        # microseconds, GPU time laid out from the start of the render phase
+        assert render['dur'] == pytest.approx(times['render'][i] / 1e3)
+        assert event['dur'] == pytest.approx(times['gpu'][i] / 1e3)
+        assert event['ts'] == pytest.approx(render['ts'])
+        assert event['args']['frame'] == i
@@ -0,0 +1,104 @@
+import numpy as np
+import moderngl as mgl
+import pytest
+from resample import ResamplingPyramid
+
+NZ, NX = 37, 45         # partial tiles on the right and bottom
+TILE_SIZE = 8
+
+
+#
+def get_tiled(app):
+    from OpenGLAPI.object import Func3DTiledObj
+    rng = np.random.default_rng(3)
+    x, z = np.linspace(-2.0, 2.0, NX), np.linspace(-1.5, 1.5, NZ)
+    y = rng.standard_normal((NZ, NX))
+    y[NZ // 2 + 1, NX // 2 + 1] = 10.0     # single peak at odd indices
+    return Func3DTiledObj(app, x, y, z, equal_axes=False, shader='func3D', 
+                          tile_size=TILE_SIZE, max_resolution=None)
+
+#
+def test_levels_hold_decimated_heights(app):
+    obj = get_tiled(app)
+    heights = obj.mesh.heights.decode(obj.mesh.height_data)
+    pyramid = ResamplingPyramid(heights, obj.mesh.x_data, obj.mesh.z_data)
+    (w, h), peak = obj.get_texture_size(), heights.max()
+    for level in range(obj.n_levels):
+        expected = pyramid.get_level(level, level, 'max')
+        data = np.frombuffer(obj.height_tex.read(level=level), dtype='f4')
+        data = data.reshape(h >> level, w >> level)[:expected.shape[0], :expected.shape[1]]
+        assert np.array_equal(data, expected)
+        assert data.max() == peak
+
+
+#
+def capture_tiles(app, obj, instance_data, level):
+    # model space vertices of tiles drawn at level, with transform feedback
+    with open('shaders/func3D_tiled.vert') as file:
+        source = app.shader_manager.expand(file.read())
+    program = app.ctx.program(vertex_shader=source, varyings=['v_frag_pos'])
+    quads = -(-obj.tile_size // (1 << level))
+    uniforms = {'u_heights' : 1, 'u_xcoords' : 2, 'u_zcoords' : 3, 
+                'u_grid_size' : tuple(obj.grid_size), 'u_row_offset' : 0,
+                'u_height_range' : tuple(obj.height_range), 'u_level' : level, 
+                'u_step' : 1 << level, 'u_quads' : quads}
+    for name, value in uniforms.items():
+        if name in program:
+            program[name].value = value
+    if 'm_model' in program:
+        program['m_model'].write(np.eye(4, dtype='f4'))
+    obj.height_tex.use(location=1)
+    obj.x_tex.use(location=2)
+    obj.z_tex.use(location=3)
+    vbo = app.ctx.buffer(np.ascontiguousarray(instance_data))
+    vao = app.ctx.vertex_array(program, [(vbo, '4i 4i 4i /i', 'a_tile', 'a_neighbour_levels', 
+                                          'a_corner_levels')], skip_errors=True)
+    vertices = 6 * quads * quads
+    result = app.ctx.buffer(reserve=len(instance_data) * vertices * 12)
+    vao.transform(result, mode=mgl.POINTS, vertices=vertices, instances=len(instance_data))
+    positions = np.frombuffer(result.read(), dtype='f4').reshape(len(instance_data), -1, 3)
+    for resource in (vao, result, vbo, program):
+        resource.release()
+    return positions
+
+#
+def get_edge(positions, axis, value):
+    # (along, height) of the vertices on the line where coordinate axis equals value,
+    # sorted along the line
+    on_edge = np.abs(positions[:, axis] - value) < 1e-5
+    along = positions[on_edge, 2 - axis]
+    order = np.argsort(along, kind='stable')
+    return along[order], positions[on_edge, 1][order]
+
+#
+@pytest.mark.parametrize('seed', range(4))
+def test_tile_edges_match_between_levels(app, seed):
+    # every vertex on an edge shared by two tiles lies on the other tile's edge, so 
+    # there are no cracks, for random LOD levels
+    obj = get_tiled(app)
+    levels = np.random.default_rng(seed).integers(0, obj.n_levels, obj.n_tiles)
+    instance_data = obj.get_instance_data(levels)
+    tiles = {}
+    for level in range(obj.n_levels):
+        index = np.flatnonzero(levels == level)
+        if index.size > 0:
+            for t, positions in zip(index, capture_tiles(app, obj, instance_data[index], level)):
+                tiles[t] = positions
+    x, z = obj.mesh.x_data, obj.mesh.z_data
+    n_edges = 0
+    for r in range(obj.tile_rows):
+        for c in range(obj.tile_cols):
+            t = r * obj.tile_cols + c
+            j0, i0, cw, ch = obj.tiles[t]
+            pairs = []
+            if c + 1 < obj.tile_cols:
+                pairs.append((t + 1, 0, x[j0 + cw]))
+            if r + 1 < obj.tile_rows:
+                pairs.append((t + obj.tile_cols, 2, z[i0 + ch]))
+            for other, axis, value in pairs:
+                a, b = get_edge(tiles[t], axis, value), get_edge(tiles[other], axis, value)
+                assert a[0].size > 0 and b[0].size > 0
+                for (along, y), (along_ref, y_ref) in ((a, b), (b, a)):
+                    assert np.allclose(y, np.interp(along, along_ref, y_ref), atol=1e-5)
+                n_edges += 1
+    assert n_edges == (obj.tile_rows - 1) * obj.tile_cols + obj.tile_rows * (obj.tile_cols - 1)
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+#
+from OpenGLAPI.mesh import Func3DMesh
+
+NZ, NX = 24, 30
+PEAK = (15, 20)     # largest |y|, outside every patch so the y scaling is unchanged
+
+# (i0, j0, rows, columns)
+PATCHES = {'interior' : (5, 7, 4, 3),
+           'top edge' : (0, 10, 3, 5),
+           'left edge' : (8, 0, 4, 2),
+           'right edge' : (3, NX - 3, 5, 3),
+           'bottom edge' : (NZ - 2, 12, 2, 6),
+           'top left corner' : (0, 0, 3, 4),
+           'bottom right corner' : (NZ - 3, NX - 4, 3, 4),
+           'whole rows' : (2, 0, 2, NX),
+           'single point' : (10, 11, 1, 1)}
+LAYOUTS = {'unrolled' : dict(), 'indexed' : dict(indexed=True), 
+           'compact' : dict(compact=True), 'compact indexed' : dict(indexed=True, compact=True)}
+
+
+#
+def get_data():
+    rng = np.random.default_rng(1)
+    x, z = np.linspace(-2.0, 3.0, NX), np.linspace(-1.0, 1.5, NZ)
+    y = 0.9 * np.sin(x[None, :]) * np.cos(2.0 * z[:, None]) + 0.05 * rng.standard_normal((NZ, NX))
+    y[PEAK] = 1.0
+    return x, y, z
+
+#
+def build(x, y, z, layout):
+    return Func3DMesh(x, y, z, equal_axes=False, backend='numpy', max_resolution=None,
+                      **LAYOUTS[layout])
+
+
+#
+@pytest.mark.parametrize('layout', LAYOUTS)
+@pytest.mark.parametrize('patch_name', PATCHES)
+def test_update_region_matches_rebuild(layout, patch_name):
+    x, y, z = get_data()
+    mesh = build(x, y, z, layout)
+    # the vertex buffer, as uploaded before the update
+    buffer = bytearray(mesh.vertex_data.tobytes())
+
+    i0, j0, m, n = PATCHES[patch_name]
+    patch = np.random.default_rng(2).uniform(-0.8, 0.8, (m, n))
+    ranges = mesh.update_region(i0, j0, patch)
+    for offset, data in ranges:
+        data = data.tobytes()
+        buffer[offset:offset+len(data)] = data
+
+    y[i0:i0+m, j0:j0+n] = patch
+    rebuilt = build(x, y, z, layout)
+    assert bytes(buffer) == rebuilt.vertex_data.tobytes()
+    assert mesh.vertex_data.tobytes() == rebuilt.vertex_data.tobytes()
+    # only the patch and its halo are written
+    assert sum(data.nbytes for _, data in ranges) < mesh.vertex_data.nbytes or \
+           patch_name == 'whole rows'
+
+#
+def test_update_region_outside_the_grid():
+    x, y, z = get_data()
+    mesh = build(x, y, z, 'unrolled')
+    with pytest.raises(ValueError):
+        mesh.update_region(NZ - 1, 0, np.zeros((2, 2)))